@@ -526,6 +526,31 @@ def bench_prune(n, key_serializer='str', value_serializer='str',
         os.unlink(path)
 
 
+def bench_import_time(repeats=5):
+    """
+    Time `import booklet` in fresh interpreters (best of repeats), and list any
+    optional serializer backends it pulled in (there should be none).
+    """
+    import subprocess
+
+    repo_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    code = ("import sys, time; t = time.perf_counter(); import booklet; "
+            "print(time.perf_counter() - t); "
+            "print(','.join(m for m in ('numpy', 'pandas', 'geopandas', 'pyarrow', 'shapely', 'zstandard', 'msgpack') if m in sys.modules))")
+    env = dict(os.environ, PYTHONPATH=repo_root)
+
+    times = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, env=env).stdout.split('\n')
+        times.append(float(out[0]))
+
+    return {
+        'op': 'import_time',
+        'elapsed': min(times),
+        'backends_loaded': out[1],
+    }
+
+
 # ---------------------------------------------------------------------------
 # Runner
 # ---------------------------------------------------------------------------
@@ -653,6 +678,10 @@ if __name__ == '__main__':
 
     random.seed(42)  # Reproducible dataset generation
 
+    imp = bench_import_time()
+    print(f"\n  import booklet: {imp['elapsed'] * 1000:.1f} ms"
+          f" (backends loaded: {imp['backends_loaded'] or 'none'})")
+
     results = run_suite(sizes=args.sizes, repeats=args.repeats)
 
     if args.save_baseline:
@@ -1,8 +1,8 @@
-from booklet.main import open, VariableLengthValue, FixedLengthValue
+from booklet.main import open, from_arrow, VariableLengthValue, FixedLengthValue, DenseFixedLengthValue
 from booklet.utils import make_timestamp_int, LockTimeoutError
 from booklet import serializers, utils
 
 available_serializers = list(serializers.serial_dict.keys())
 
-__all__ = ["open", "available_serializers", 'VariableLengthValue', 'FixedLengthValue', 'make_timestamp_int', 'LockTimeoutError']
+__all__ = ["open", "from_arrow", "available_serializers", 'VariableLengthValue', 'FixedLengthValue', 'DenseFixedLengthValue', 'make_timestamp_int', 'LockTimeoutError']
 __version__ = '0.12.9'
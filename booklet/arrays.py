@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NumPy helpers for the FixedLengthValue batch API (set_array/get_array) and
+the zero-copy record views (as_numpy).
+
+Imported lazily by those methods, so numpy stays an optional dependency.
+Keys are still serialized and hashed one at a time (blake2s has no vectorized
+form), but bucket selection, chain walks, value gathers and block assembly
+run as array operations over a byte view of the file.
+"""
+import io
+import mmap
+
+import numpy as np
+
+from . import utils
+
+## Keys per vectorized chain-walk batch; bounds the (batch, block_header) gather temporaries
+batch_size = 2**16
+
+header_len = utils.key_hash_len + utils.n_bytes_file + utils.n_bytes_key
+
+
+def file_view(file, mm=None):
+    """
+    A read-only uint8 view of the whole file. The view holds a reference to
+    its mmap, which is released when the view is garbage collected.
+    """
+    if mm is not None:
+        return np.frombuffer(mm, np.uint8)
+    elif isinstance(file, io.BytesIO):
+        return np.frombuffer(file.getvalue(), np.uint8)
+    else:
+        file.flush()
+        return np.frombuffer(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ), np.uint8)
+
+
+def value_rows(values, n, value_len, name='values'):
+    """
+    View values (a (n, value_len) uint8 array, or any C-contiguous array with
+    n rows of value_len bytes such as a structured array) as (n, value_len) uint8.
+    """
+    values = np.asarray(values)
+    if len(values) != n:
+        raise ValueError(f'{name} must have one row per key ({n}), got {len(values)}.')
+    if values.nbytes != n * value_len:
+        raise ValueError(f'Each row of {name} must be exactly {value_len} bytes, got {values.nbytes // max(n, 1)}.')
+    if not values.flags.c_contiguous:
+        raise ValueError(f'{name} must be C-contiguous.')
+
+    return values.view(np.uint8).reshape(n, value_len)
+
+
+def uint_from_bytes(arr):
+    """
+    Little-endian unsigned ints from the rows of a (n, <=8) uint8 array.
+    """
+    n, width = arr.shape
+    padded = np.zeros((n, 8), np.uint8)
+    padded[:, :width] = arr
+    return padded.view('<u8').ravel()
+
+
+def uint_to_bytes(values, width):
+    """
+    The (n, width) little-endian uint8 rows of an unsigned int array.
+    """
+    return np.ascontiguousarray(values, '<u8').view(np.uint8).reshape(-1, 8)[:, :width]
+
+
+def gather(buf, pos, width):
+    """
+    (len(pos), width) array of the width bytes starting at each position.
+    """
+    return buf[pos[:, None] + np.arange(width)]
+
+
+def hash_keys(key_bytes_list):
+    """
+    (n, key_hash_len) uint8 array of the key hashes.
+    """
+    hashes = b''.join([utils.hash_key(key) for key in key_bytes_list])
+    return np.frombuffer(hashes, np.uint8).reshape(-1, utils.key_hash_len)
+
+
+def index_buckets(hashes, n_buckets):
+    """
+    Vectorized get_index_bucket: the 13-byte little-endian hash modulo
+    n_buckets, split as lo (8 bytes) + hi (5 bytes) * 2**64 so every
+    intermediate fits in uint64 (n_buckets < 2**32).
+    """
+    n = np.uint64(n_buckets)
+    lo = np.ascontiguousarray(hashes[:, :8]).view('<u8').ravel()
+    hi = uint_from_bytes(hashes[:, 8:])
+    r = np.uint64(pow(2, 64, n_buckets))
+
+    return (lo % n + ((hi % n) * r) % n) % n
+
+
+def find_value_positions(buf, hashes, n_buckets, index_offset):
+    """
+    Vectorized chain walk. Returns the value position of every hash (0 where
+    the key is not in the file). All chains advance one hop per iteration.
+    """
+    n = len(hashes)
+    value_pos = np.zeros(n, np.int64)
+
+    bucket_pos = index_offset + index_buckets(hashes, n_buckets).astype(np.int64) * utils.n_bytes_file
+    pos = uint_from_bytes(gather(buf, bucket_pos, utils.n_bytes_file)).astype(np.int64)
+
+    active = np.flatnonzero(pos > 1)
+    while active.size:
+        p = pos[active]
+        header = gather(buf, p, header_len)
+        next_pos = uint_from_bytes(header[:, utils.key_hash_len:utils.key_hash_len + utils.n_bytes_file]).astype(np.int64)
+        match = (header[:, :utils.key_hash_len] == hashes[active]).all(axis=1) & (next_pos != 0)
+
+        key_len = uint_from_bytes(header[match, utils.key_hash_len + utils.n_bytes_file:]).astype(np.int64)
+        value_pos[active[match]] = p[match] + header_len + key_len
+
+        pos[active] = next_pos
+        active = active[~match & (next_pos > 1)]
+
+    return value_pos
+
+
+def find_all_value_positions(buf, hashes, n_buckets, index_offset=utils.sub_index_init_pos):
+    """
+    find_value_positions over any number of hashes, in batch_size batches.
+    """
+    value_pos = np.zeros(len(hashes), np.int64)
+    for start in range(0, len(hashes), batch_size):
+        value_pos[start:start + batch_size] = find_value_positions(buf, hashes[start:start + batch_size], n_buckets, index_offset)
+
+    return value_pos
+
+
+def get_array_fixed(buf, key_bytes_list, out_rows, n_buckets, value_len, index_offset=utils.sub_index_init_pos):
+    """
+    Fill out_rows with the values of the keys. Returns the boolean found mask;
+    rows of missing keys are left untouched.
+    """
+    n = len(key_bytes_list)
+    found = np.zeros(n, bool)
+
+    for start in range(0, n, batch_size):
+        end = min(start + batch_size, n)
+        hashes = hash_keys(key_bytes_list[start:end])
+        value_pos = find_value_positions(buf, hashes, n_buckets, index_offset)
+        hit = value_pos > 0
+        out_rows[start:end][hit] = gather(buf, value_pos[hit], value_len)
+        found[start:end] = hit
+
+    return found
+
+
+def dedupe_last(keys):
+    """
+    Indexes of the last occurrence of every distinct key (rows of a 2-d array
+    count as one key), in file order of those occurrences - so duplicate keys
+    within a batch resolve like sequential set() calls: the last value wins.
+    """
+    n = len(keys)
+    if keys.ndim == 2:
+        keys = np.ascontiguousarray(keys).view(f'V{keys.shape[1]}').ravel()
+    _, rev_idx = np.unique(keys[::-1], return_index=True)
+
+    return np.sort(n - 1 - rev_idx)
+
+
+def set_array_fixed(file, key_bytes_list, hashes, value_pos, rows, n_buckets, value_len, index_offset=utils.sub_index_init_pos):
+    """
+    Write a deduplicated batch into a FixedLengthValue file whose write buffer
+    is empty. value_pos comes from find_all_value_positions (data blocks never
+    move on reindex, so it stays valid across a pre-grow reindex). Existing
+    keys are overwritten in place. New keys are assembled into one block
+    array, appended with a single write and linked at the head of their bucket
+    chains (blocks of one bucket chain to each other, the last to the old
+    head) with a single write of the bucket index. Returns the number of new keys.
+    """
+    ## In-place overwrites, in file order
+    existing = np.flatnonzero(value_pos)
+    for i in existing[np.argsort(value_pos[existing])]:
+        file.seek(int(value_pos[i]))
+        file.write(rows[i].tobytes())
+
+    new = np.flatnonzero(value_pos == 0)
+    n_new = len(new)
+    if n_new == 0:
+        return 0
+
+    new_keys = [key_bytes_list[i] for i in new]
+    new_hashes = hashes[new]
+    new_rows = rows[new]
+    key_lens = np.array([len(key) for key in new_keys], np.int64)
+    block_lens = header_len + key_lens + value_len
+
+    file_len = file.seek(0, 2)
+    block_pos = file_len + np.concatenate(([0], np.cumsum(block_lens)[:-1]))
+
+    ## Link: sort the new blocks by bucket; each points at the next block of its
+    ## bucket, the last of a bucket at the old head (or 1), and the head at the first.
+    file.seek(index_offset)
+    index = np.frombuffer(bytearray(file.read(n_buckets * utils.n_bytes_file)), np.uint8).reshape(n_buckets, utils.n_bytes_file)
+    heads = uint_from_bytes(index).astype(np.int64)
+
+    buckets = index_buckets(new_hashes, n_buckets).astype(np.int64)
+    by_bucket = np.argsort(buckets, kind='stable')
+    sorted_buckets = buckets[by_bucket]
+    boundary = sorted_buckets[1:] != sorted_buckets[:-1]
+    first_of_bucket = np.concatenate(([True], boundary))
+    last_of_bucket = np.concatenate((boundary, [True]))
+
+    next_pos = np.empty(n_new, np.int64)
+    next_pos[by_bucket[:-1]] = block_pos[by_bucket[1:]]
+    old_heads = heads[sorted_buckets[last_of_bucket]]
+    next_pos[by_bucket[last_of_bucket]] = np.where(old_heads > 1, old_heads, 1)
+
+    index[sorted_buckets[first_of_bucket]] = uint_to_bytes(block_pos[by_bucket[first_of_bucket]], utils.n_bytes_file)
+
+    ## Assemble the blocks
+    next_bytes = uint_to_bytes(next_pos, utils.n_bytes_file)
+    if (key_lens == key_lens[0]).all():
+        key_len = int(key_lens[0])
+        blocks = np.empty((n_new, int(block_lens[0])), np.uint8)
+        blocks[:, :utils.key_hash_len] = new_hashes
+        blocks[:, utils.key_hash_len:utils.key_hash_len + utils.n_bytes_file] = next_bytes
+        blocks[:, utils.key_hash_len + utils.n_bytes_file:header_len] = uint_to_bytes(key_lens, utils.n_bytes_key)
+        blocks[:, header_len:header_len + key_len] = np.frombuffer(b''.join(new_keys), np.uint8).reshape(n_new, key_len)
+        blocks[:, header_len + key_len:] = new_rows
+        block_bytes = blocks.data
+    else:
+        block_bytes = bytearray()
+        for i, key in enumerate(new_keys):
+            block_bytes.extend(new_hashes[i].tobytes() + next_bytes[i].tobytes() + utils.int_to_bytes(len(key), utils.n_bytes_key) + key + new_rows[i].tobytes())
+
+    ## Data first, then the index that makes it reachable
+    file.seek(file_len)
+    file.write(block_bytes)
+    file.seek(index_offset)
+    file.write(index.data)
+
+    return n_new
+
+
+def dense_keys(keys, max_key):
+    """
+    The keys as an int64 array, validated against the key serializer's range.
+    """
+    keys = np.asarray(keys)
+    if keys.dtype.kind not in 'iu':
+        raise TypeError('Dense keys must be integers.')
+    if keys.size and (keys.min() < 0 or keys.max() > max_key):
+        raise OverflowError(f'Dense keys must be between 0 and {max_key}.')
+
+    return keys.astype(np.uint64)
+
+
+def get_array_dense(buf, keys, out_rows, value_len):
+    """
+    Fill out_rows with the values of the dense keys. Returns the found mask.
+    """
+    record_len = 1 + value_len
+    ## Bound the keys before multiplying, as the uint64 product can wrap
+    n_records = max(len(buf) - utils.sub_index_init_pos, 0) // record_len
+    in_file = keys < np.uint64(n_records)
+    pos = utils.sub_index_init_pos + keys[in_file].astype(np.int64) * record_len
+
+    found = np.zeros(len(keys), bool)
+    found[in_file] = buf[pos] == 1
+    out_rows[found] = gather(buf, pos[found[in_file]] + 1, value_len)
+
+    return found
+
+
+def set_array_dense(file, keys, rows, value_len):
+    """
+    Write a batch of dense records. When the keys span a compact range, the
+    whole range is read, patched in memory and written back with one write;
+    sparse batches write record by record. Returns the number of new keys.
+    """
+    keep = dedupe_last(keys)
+    keys = keys[keep]
+    rows = rows[keep]
+    n = len(keys)
+    if n == 0:
+        return 0
+
+    record_len = 1 + value_len
+    kmin = int(keys.min())
+    span = int(keys.max()) - kmin + 1
+
+    if span <= 4 * n + 1024:
+        start = utils.sub_index_init_pos + kmin * record_len
+        file.seek(start)
+        region = bytearray(file.read(span * record_len))
+        region.extend(bytes(span * record_len - len(region)))
+        records = np.frombuffer(region, np.uint8).reshape(span, record_len)
+
+        idx = (keys - np.uint64(kmin)).astype(np.int64)
+        n_new = int((records[idx, 0] != 1).sum())
+        records[idx, 0] = 1
+        records[idx, 1:] = rows
+
+        file.seek(start)
+        file.write(region)
+    else:
+        n_new = 0
+        for key, row in zip(keys.tolist(), rows):
+            n_new += utils.write_value_dense(file, utils.sub_index_init_pos + key * record_len, row.tobytes())
+
+    return n_new
+
+
+## Numpy dtypes of the fixed-width integer key serializers, for as_numpy's key field
+key_serializer_dtypes = {
+    'uint1': '<u1', 'int1': '<i1', 'uint2': '<u2', 'int2': '<i2', 'uint4': '<u4',
+    'int4': '<i4', 'uint8': '<u8', 'int8': '<i8',
+    }
+
+
+def key_dtype(key_serializer, key_len):
+    """
+    The numpy dtype of a key field: the matching integer type for the integer
+    key serializers, else raw bytes.
+    """
+    for name, dtype in key_serializer_dtypes.items():
+        if utils.serializers.serial_dict[name] is key_serializer:
+            return np.dtype(dtype)
+
+    return np.dtype(f'V{key_len}')
+
+
+def fixed_record_dtype(key_dtype, value_dtype):
+    """
+    The structured dtype of a fixed-length data block.
+    """
+    return np.dtype([
+        ('key_hash', f'V{utils.key_hash_len}'),
+        ('next_ptr', np.uint8, (utils.n_bytes_file,)),
+        ('key_len', '<u2'),
+        ('key', key_dtype),
+        ('value', value_dtype),
+        ])
+
+
+def fixed_data_regions(n_buckets, index_offset, first_data_block_pos, file_end):
+    """
+    The [start, end) byte ranges holding data blocks, as scanned by
+    iter_keys_values_fixed (two ranges once the index has been relocated).
+    """
+    if index_offset != utils.sub_index_init_pos:
+        return [(first_data_block_pos, index_offset), (index_offset + (n_buckets * utils.n_bytes_file), file_end)]
+    else:
+        return [(first_data_block_pos, file_end)]
+
+
+def first_live_key_len(buf, regions, value_len):
+    """
+    The key_len of the first live block, or None if there is none.
+    """
+    for start, end in regions:
+        pos = start
+        while pos < end:
+            header = buf[pos:pos + header_len].tobytes()
+            key_len = utils.bytes_to_int(header[utils.key_hash_len + utils.n_bytes_file:])
+            if utils.bytes_to_int(header[utils.key_hash_len:utils.key_hash_len + utils.n_bytes_file]):
+                return key_len
+            pos += header_len + key_len + value_len
+
+    return None
+
+
+def fixed_record_segments(buf, regions, dtype, value_len):
+    """
+    Structured views over the runs of uniform blocks in the data regions.
+    Blocks whose key_len differs from the dtype's key field (reindex skip
+    blocks, keys of another length) end a run and are stepped over.
+    """
+    key_len = dtype['key'].itemsize
+    stride = dtype.itemsize
+    segments = []
+
+    for start, end in regions:
+        pos = start
+        while pos < end:
+            n = (end - pos) // stride
+            view = buf[pos:pos + n * stride].view(dtype)
+            bad = np.flatnonzero(view['key_len'] != key_len)
+            n_good = bad[0] if bad.size else n
+            if n_good:
+                segments.append(view[:n_good])
+                pos += n_good * stride
+            if pos < end:
+                ## Step over the odd block
+                header = buf[pos:pos + header_len].tobytes()
+                pos += header_len + utils.bytes_to_int(header[utils.key_hash_len + utils.n_bytes_file:]) + value_len
+
+    return segments
@@ -11,13 +11,17 @@ import pathlib
 from collections.abc import MutableMapping
 from typing import Union, Any, Optional, Iterator, Iterable, Tuple
 from datetime import datetime
+from itertools import islice, chain, repeat
 # from threading import Lock
 import portalocker
 # from itertools import count
 # from collections import Counter, defaultdict, deque
 import orjson
 import weakref
+import threading
 import multiprocessing
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
 
 # try:
 #     import fcntl
@@ -28,10 +32,10 @@ import multiprocessing
 
 # import utils
 from . import utils
-from .parallel import _map_worker
+from .parallel import _Items, _init_map_worker, _map_task, _run_map_task, _open_map_task, _open_reader, _executor_map, Partition
 
 # import serializers
-# from . import serializers
+from . import serializers
 
 
 # page_size = mmap.ALLOCATIONGRANULARITY
@@ -53,6 +57,22 @@ class Booklet(MutableMapping):
     """
     Base class
     """
+    ## Whether the value serializer decodes from a buffer without copying
+    _zero_copy = False
+    ## Values of at least this many bytes are deduplicated (None is off)
+    _dedup_threshold = None
+    ## Values of at least this many bytes go to the blob file (None is off)
+    _blob_threshold = None
+    ## Whether stored values can be dedup content keys or blob pointers
+    _indirect_values = False
+    ## Whether a read-only open takes the shared OS file lock; map() workers
+    ## read without it, as the file may be held by a write-mode handle
+    _shared_lock = True
+    ## The change index file (None when the file keeps no change index) and
+    ## the positions of blocks changed in place since its last update
+    _changes_path = None
+    _changed_positions = None
+
     def _set_file_timestamp(self, timestamp: Optional[Union[int, str, datetime]] = None):
         """
         Set the timestamp on the file.
@@ -90,17 +110,7 @@ class Booklet(MutableMapping):
             A specific timestamp to associate with the metadata. 
             If None (default), the current time is used.
         """
-        if self.writable:
-            self.sync()
-            with self._thread_lock:
-                self._mutation_count += 1
-                _ = utils.write_data_blocks(self._file,  utils.metadata_key_bytes, utils.encode_metadata(data), self._n_buckets, self._buffer_data, self._buffer_index, self._buffer_index_set, self._write_buffer_size, timestamp, self._ts_bytes_len, self._index_offset)
-                if self._buffer_index:
-                    utils.flush_data_buffer(self._file, self._buffer_data, self._file.seek(0, 2))
-                _ = utils.update_index(self._file, self._buffer_index, self._buffer_index_set, self._n_buckets, self._index_offset)
-                self._file.flush()
-        else:
-            raise ValueError('File is open for read only.')
+        self._write_reserved_key(utils.metadata_key_bytes, utils.encode_metadata(data), timestamp)
 
     def get_metadata(self, include_timestamp: bool = False) -> Optional[Union[Any, Tuple[Any, int]]]:
         """
@@ -118,19 +128,14 @@ class Booklet(MutableMapping):
             The metadata object. If include_timestamp is True, returns (metadata, timestamp). 
             Returns None if no metadata is set.
         """
-        if self._mmap is not None:
-            output = utils.mmap_get_value_ts(self._mmap, utils.metadata_key_hash, self._n_buckets, True, include_timestamp, self._ts_bytes_len, self._index_offset)
-        else:
-            output = utils.get_value_ts(self._file, utils.metadata_key_hash, self._n_buckets, True, include_timestamp, self._ts_bytes_len, self._index_offset)
+        output = self._read_reserved_key(utils.metadata_key_hash, include_timestamp)
 
-        if output:
-            value, ts_int = output
-            if ts_int is not None:
-                return orjson.loads(value), ts_int
-            else:
-                return orjson.loads(value)
-        else:
+        if output is None:
             return None
+        elif include_timestamp and isinstance(output, tuple):
+            return orjson.loads(output[0]), output[1]
+        else:
+            return orjson.loads(output)
 
     def set_reserved(self, slot: int, data: bytes, timestamp: Optional[Union[int, str, datetime]] = None):
         """
@@ -155,20 +160,7 @@ class Booklet(MutableMapping):
             raise ValueError(f'slot must be one of {sorted(utils.reserved_slot_key_bytes)}, not {slot!r}.')
         if not isinstance(data, bytes):
             raise TypeError('data must be bytes - reserved slots are serialization-agnostic.')
-        if self.writable:
-            ## The pre-sync is mandatory: a reserved key must never sit in the
-            ## shared write buffer, or a later buffer flush would count it into
-            ## n_keys (same discipline as set_metadata).
-            self.sync()
-            with self._thread_lock:
-                self._mutation_count += 1
-                _ = utils.write_data_blocks(self._file, utils.reserved_slot_key_bytes[slot], data, self._n_buckets, self._buffer_data, self._buffer_index, self._buffer_index_set, self._write_buffer_size, timestamp, self._ts_bytes_len, self._index_offset)
-                if self._buffer_index:
-                    utils.flush_data_buffer(self._file, self._buffer_data, self._file.seek(0, 2))
-                _ = utils.update_index(self._file, self._buffer_index, self._buffer_index_set, self._n_buckets, self._index_offset)
-                self._file.flush()
-        else:
-            raise ValueError('File is open for read only.')
+        self._write_reserved_key(utils.reserved_slot_key_bytes[slot], data, timestamp)
 
     def get_reserved(self, slot: int, include_timestamp: bool = False) -> Optional[Union[bytes, Tuple[bytes, int]]]:
         """
@@ -189,11 +181,46 @@ class Booklet(MutableMapping):
         """
         if slot not in utils.reserved_slot_key_hashes:
             raise ValueError(f'slot must be one of {sorted(utils.reserved_slot_key_hashes)}, not {slot!r}.')
-        key_hash = utils.reserved_slot_key_hashes[slot]
-        if self._mmap is not None:
-            output = utils.mmap_get_value_ts(self._mmap, key_hash, self._n_buckets, True, include_timestamp, self._ts_bytes_len, self._index_offset)
+        return self._read_reserved_key(utils.reserved_slot_key_hashes[slot], include_timestamp)
+
+    def _write_reserved_key(self, key_bytes: bytes, data: bytes, timestamp: Optional[Union[int, str, datetime]] = None):
+        """
+        Write one of the hidden reserved keys (metadata, app slots,
+        compression dictionary) and index it immediately.
+        """
+        self._write_reserved_keys([(key_bytes, data)], timestamp)
+
+    def _write_reserved_keys(self, items: list, timestamp: Optional[Union[int, str, datetime]] = None):
+        """
+        Write (key_bytes, data) pairs of hidden reserved keys and index them
+        immediately, in one pass.
+        """
+        if self.writable:
+            ## The pre-sync is mandatory: a reserved key must never sit in the
+            ## shared write buffer, or a later buffer flush would count it into
+            ## n_keys.
+            self.sync()
+            with self._thread_lock:
+                self._mutation_count += 1
+                for key_bytes, data in items:
+                    _ = utils.write_data_blocks(self._file, key_bytes, data, self._n_buckets, self._buffer_data, self._buffer_index, self._buffer_index_set, self._write_buffer_size, timestamp, self._ts_bytes_len, self._index_offset)
+                if self._buffer_index:
+                    utils.flush_data_buffer(self._file, self._buffer_data, self._file.seek(0, 2))
+                _ = utils.update_index(self._file, self._buffer_index, self._buffer_index_set, self._n_buckets, self._index_offset)
+                self._file.flush()
         else:
-            output = utils.get_value_ts(self._file, key_hash, self._n_buckets, True, include_timestamp, self._ts_bytes_len, self._index_offset)
+            raise ValueError('File is open for read only.')
+
+    def _read_reserved_key(self, key_hash: bytes, include_timestamp: bool = False) -> Optional[Union[bytes, Tuple[bytes, int]]]:
+        """
+        Read one of the hidden reserved keys; (value, timestamp) if
+        include_timestamp and the file has timestamps, else the value.
+        """
+        with self._thread_lock:
+            if self._mmap is not None:
+                output = self._mmap_read(utils.mmap_get_value_ts, key_hash, self._n_buckets, True, include_timestamp, self._ts_bytes_len, self._index_offset)
+            else:
+                output = utils.get_value_ts(self._file, key_hash, self._n_buckets, True, include_timestamp, self._ts_bytes_len, self._index_offset)
 
         if output:
             value, ts_int = output
@@ -233,11 +260,73 @@ class Booklet(MutableMapping):
 
     def _post_value(self, value: bytes) -> Any:
 
+        if self._indirect_values:
+            value = self._resolve_value(value)
+
         ## Serialize from bytes
         value = self._value_serializer.loads(value)
 
         return value
 
+    def _pre_values(self, values: list) -> list:
+        """
+        Serialize a batch of values with the serializer's dumps_many.
+        """
+        return self._codec_map(serializers.dumps_many, values)
+
+    def _post_values(self, values: list) -> list:
+        """
+        Deserialize a batch of values with the serializer's loads_many.
+        """
+        if self._indirect_values:
+            values = [self._resolve_value(value) for value in values]
+        return self._codec_map(serializers.loads_many, values)
+
+    def _codec_map(self, func, values: list) -> list:
+        """
+        Run func(value_serializer, values) directly, or with codec_threads
+        split into one contiguous chunk per thread so results stay in order.
+        The codecs that do the heavy lifting (zstd, orjson, pyarrow feather)
+        release the GIL, so the chunks run in parallel.
+        """
+        n_threads = self._codec_threads
+        if not n_threads or n_threads < 2 or len(values) < utils.codec_min_chunk * 2:
+            return func(self._value_serializer, values)
+
+        if self._codec_pool is None:
+            with self._thread_lock:
+                if self._codec_pool is None:
+                    self._codec_pool = ThreadPoolExecutor(n_threads, thread_name_prefix='booklet-codec')
+
+        n_chunks = min(n_threads, len(values) // utils.codec_min_chunk)
+        chunk_len = -(-len(values) // n_chunks)
+        chunks = [values[i:i + chunk_len] for i in range(0, len(values), chunk_len)]
+        out = []
+        for chunk_out in self._codec_pool.map(func, [self._value_serializer] * len(chunks), chunks):
+            out.extend(chunk_out)
+
+        return out
+
+    def _post_keys(self, keys: list) -> list:
+        """
+        Deserialize a batch of keys with the serializer's loads_many.
+        """
+        return serializers.loads_many(self._key_serializer, keys)
+
+    def _make_iter_raw(self, include_key: bool, include_value: bool):
+        """
+        The make_iter (for _iter_locked) of a scan yielding undecoded keys,
+        values or (key, value) pairs.
+        """
+        if self._mmap is not None:
+            def make_iter():
+                return utils.mmap_iter_keys_values(self._mmap, self._n_buckets, include_key, include_value, False, self._ts_bytes_len, self._index_offset, self._first_data_block_pos, dedup=self._dedup_threshold is not None)
+        else:
+            def make_iter():
+                return utils.iter_keys_values(self._file, self._n_buckets, include_key, include_value, False, self._ts_bytes_len, self._index_offset, self._first_data_block_pos, dedup=self._dedup_threshold is not None)
+
+        return make_iter
+
     def _iter_locked(self, make_iter) -> Iterator[Any]:
         """
         Advance a utils iterator one step at a time under _thread_lock,
@@ -277,6 +366,28 @@ class Booklet(MutableMapping):
                     return
             yield item
 
+    def _iter_locked_batches(self, make_iter, batch_size: int) -> Iterator[list]:
+        """
+        Like _iter_locked, but advance the utils iterator batch_size steps per
+        lock acquisition and yield lists. The mutation check runs once per
+        batch, so a mutation raises RuntimeError at the next batch.
+        """
+        if self._buffer_index_set:
+            self.sync()
+
+        with self._thread_lock:
+            mut0 = self._mutation_count
+            it = make_iter()
+
+        while True:
+            with self._thread_lock:
+                if self._mutation_count != mut0:
+                    raise RuntimeError('booklet mutated during iteration')
+                batch = list(islice(it, batch_size))
+            if not batch:
+                return
+            yield batch
+
     def keys(self) -> Iterator[Any]:
         """
         Return an iterator over the booklet's keys.
@@ -292,10 +403,10 @@ class Booklet(MutableMapping):
         """
         if self._mmap is not None:
             def make_iter():
-                return utils.mmap_iter_keys_values(self._mmap, self._n_buckets, True, False, False, self._ts_bytes_len, self._index_offset, self._first_data_block_pos)
+                return utils.mmap_iter_keys_values(self._mmap, self._n_buckets, True, False, False, self._ts_bytes_len, self._index_offset, self._first_data_block_pos, dedup=self._dedup_threshold is not None)
         else:
             def make_iter():
-                return utils.iter_keys_values(self._file, self._n_buckets, True, False, False, self._ts_bytes_len, self._index_offset, self._first_data_block_pos)
+                return utils.iter_keys_values(self._file, self._n_buckets, True, False, False, self._ts_bytes_len, self._index_offset, self._first_data_block_pos, dedup=self._dedup_threshold is not None)
 
         for key in self._iter_locked(make_iter):
             yield self._post_key(key)
@@ -309,10 +420,15 @@ class Booklet(MutableMapping):
         """
         if self._mmap is not None:
             def make_iter():
-                return utils.mmap_iter_keys_values(self._mmap, self._n_buckets, True, True, False, self._ts_bytes_len, self._index_offset, self._first_data_block_pos)
+                return utils.mmap_iter_keys_values(self._mmap, self._n_buckets, True, True, False, self._ts_bytes_len, self._index_offset, self._first_data_block_pos, dedup=self._dedup_threshold is not None)
         else:
             def make_iter():
-                return utils.iter_keys_values(self._file, self._n_buckets, True, True, False, self._ts_bytes_len, self._index_offset, self._first_data_block_pos)
+                return utils.iter_keys_values(self._file, self._n_buckets, True, True, False, self._ts_bytes_len, self._index_offset, self._first_data_block_pos, dedup=self._dedup_threshold is not None)
+
+        if self._codec_threads:
+            for batch in self.iter_batches(utils.codec_batch_size, 'items'):
+                yield from batch
+            return
 
         for key, value in self._iter_locked(make_iter):
             yield self._post_key(key), self._post_value(value)
@@ -324,16 +440,160 @@ class Booklet(MutableMapping):
         Same iteration semantics as keys(): interleaved reads are allowed,
         any mutation raises RuntimeError at the next step.
         """
+        if self._codec_threads:
+            for batch in self.iter_batches(utils.codec_batch_size, 'values'):
+                yield from batch
+            return
+
         if self._mmap is not None:
             def make_iter():
-                return utils.mmap_iter_keys_values(self._mmap, self._n_buckets, False, True, False, self._ts_bytes_len, self._index_offset, self._first_data_block_pos)
+                return utils.mmap_iter_keys_values(self._mmap, self._n_buckets, False, True, False, self._ts_bytes_len, self._index_offset, self._first_data_block_pos, dedup=self._dedup_threshold is not None)
         else:
             def make_iter():
-                return utils.iter_keys_values(self._file, self._n_buckets, False, True, False, self._ts_bytes_len, self._index_offset, self._first_data_block_pos)
+                return utils.iter_keys_values(self._file, self._n_buckets, False, True, False, self._ts_bytes_len, self._index_offset, self._first_data_block_pos, dedup=self._dedup_threshold is not None)
 
         for value in self._iter_locked(make_iter):
             yield self._post_value(value)
 
+    def iter_batches(self, batch_size: int = 1000, what: str = 'items', as_numpy: bool = False) -> Iterator[list]:
+        """
+        Return an iterator over the booklet in lists of up to batch_size
+        items. Each batch is read from the file under one lock acquisition
+        and decoded with one call of the serializer's batch protocol
+        (loads_many), which saves the per-item locking and decode overhead
+        of keys()/items()/values().
+
+        Same iteration semantics as keys(), checked once per batch: a
+        mutation raises RuntimeError at the next batch.
+
+        Parameters
+        ----------
+        batch_size : int
+            The maximum number of items per list.
+        what : str
+            'items' for (key, value) pairs, 'keys' or 'values', or 'raw' for
+            (key, value) pairs of the serialized bytes (deduplicated and blob
+            values are resolved; dense keys are ints).
+        as_numpy : bool
+            Fixed-length booklets only; requires numpy. The values of a batch
+            come as one (n, value_len) uint8 array of the stored bytes, so
+            'values' yields arrays and 'items'/'raw' yield (keys, array)
+            tuples. Keys are lists, or a uint64 array for dense booklets.
+
+        Yields
+        ------
+        list, numpy.ndarray or tuple
+        """
+        if what not in ('items', 'keys', 'values', 'raw'):
+            raise ValueError("what must be 'items', 'keys', 'values' or 'raw'.")
+        if batch_size < 1:
+            raise ValueError('batch_size must be at least 1.')
+        value_len = getattr(self, '_value_len', None)
+        if as_numpy:
+            if value_len is None:
+                raise ValueError('as_numpy is only for fixed-length booklets.')
+            if what == 'keys':
+                raise ValueError("as_numpy needs the values, so what cannot be 'keys'.")
+            from . import arrays
+
+            np = arrays.np
+
+        for batch in self._iter_locked_batches(self._make_iter_raw(what != 'values', what != 'keys'), batch_size):
+            if what == 'keys':
+                yield self._post_keys(batch)
+                continue
+
+            if what == 'values':
+                keys, values = None, batch
+            else:
+                keys, values = zip(*batch)
+                keys = list(keys) if what == 'raw' else self._post_keys(list(keys))
+
+            if as_numpy:
+                values = np.frombuffer(b''.join(values), np.uint8).reshape(len(values), value_len)
+                if keys is None:
+                    yield values
+                else:
+                    if isinstance(self, DenseFixedLengthValue):
+                        keys = np.array(keys, np.uint64)
+                    yield keys, values
+            elif what == 'raw':
+                if self._indirect_values:
+                    values = [self._resolve_value(value) for value in values]
+                yield list(zip(keys, values))
+            elif keys is None:
+                yield self._post_values(values)
+            else:
+                yield list(zip(keys, self._post_values(list(values))))
+
+    def to_arrow(self, batch_size: int = 100000, decode_values: bool = True):
+        """
+        Return a pyarrow RecordBatchReader over the booklet with a key, a
+        value and (if the file has timestamps) a timestamp column. The data
+        blocks are scanned in batch_size rows at a time and each batch is
+        decoded with the serializers' batch protocol, so the reader can be
+        streamed straight into e.g. a pyarrow.parquet.ParquetWriter.
+
+        Same iteration semantics as keys(). The first batch is read when
+        to_arrow is called.
+
+        Parameters
+        ----------
+        batch_size : int
+            The maximum number of rows per record batch.
+        decode_values : bool
+            Whether to decode the values with the value_serializer. If False,
+            the value column holds the stored (serialized) bytes.
+
+        Returns
+        -------
+        pyarrow.RecordBatchReader
+        """
+        pa = serializers.pa
+        if batch_size < 1:
+            raise ValueError('batch_size must be at least 1.')
+
+        include_ts = bool(self._init_timestamps)
+        names = ['key', 'value', 'timestamp'] if include_ts else ['key', 'value']
+        if include_ts:
+            if self._mmap is not None:
+                def make_iter():
+                    return utils.mmap_iter_keys_values(self._mmap, self._n_buckets, True, True, True, self._ts_bytes_len, self._index_offset, self._first_data_block_pos, dedup=self._dedup_threshold is not None)
+            else:
+                def make_iter():
+                    return utils.iter_keys_values(self._file, self._n_buckets, True, True, True, self._ts_bytes_len, self._index_offset, self._first_data_block_pos, dedup=self._dedup_threshold is not None)
+        else:
+            make_iter = self._make_iter_raw(True, True)
+
+        it = self._iter_locked_batches(make_iter, batch_size)
+
+        def make_batch(rows, schema=None):
+            columns = list(zip(*rows))
+            keys = self._post_keys(list(columns[0]))
+            values = list(columns[-1])
+            if decode_values:
+                values = self._post_values(values)
+            elif self._indirect_values:
+                values = [self._resolve_value(value) for value in values]
+            types = [None, None if decode_values else pa.large_binary(), pa.timestamp('us', tz='UTC')] if schema is None else schema.types
+            arrays = [pa.array(keys, types[0]), pa.array(values, types[1])]
+            if include_ts:
+                arrays.append(pa.array(columns[1], types[2]))
+            return pa.RecordBatch.from_arrays(arrays, names)
+
+        first = next(it, None)
+        if first is None:
+            types = [pa.binary(), pa.large_binary(), pa.timestamp('us', tz='UTC')]
+            return pa.RecordBatchReader.from_batches(pa.schema(list(zip(names, types))), [])
+
+        first = make_batch(first)
+
+        def batches():
+            for rows in it:
+                yield make_batch(rows, first.schema)
+
+        return pa.RecordBatchReader.from_batches(first.schema, chain([first], batches()))
+
     def timestamps(self, include_value: bool = False, decode_value: bool = True) -> Iterator[Union[Tuple[Any, int], Tuple[Any, int, Any]]]:
         """
         Return an iterator for timestamps for all keys.
@@ -361,15 +621,17 @@ class Booklet(MutableMapping):
         if self._init_timestamps:
             if self._mmap is not None:
                 def make_iter():
-                    return utils.mmap_iter_keys_values(self._mmap, self._n_buckets, True, include_value, True, self._ts_bytes_len, self._index_offset, self._first_data_block_pos)
+                    return utils.mmap_iter_keys_values(self._mmap, self._n_buckets, True, include_value, True, self._ts_bytes_len, self._index_offset, self._first_data_block_pos, dedup=self._dedup_threshold is not None)
             else:
                 def make_iter():
-                    return utils.iter_keys_values(self._file, self._n_buckets, True, include_value, True, self._ts_bytes_len, self._index_offset, self._first_data_block_pos)
+                    return utils.iter_keys_values(self._file, self._n_buckets, True, include_value, True, self._ts_bytes_len, self._index_offset, self._first_data_block_pos, dedup=self._dedup_threshold is not None)
 
             if include_value:
                 for key, ts_int, value in self._iter_locked(make_iter):
                     if decode_value:
                         value = self._post_value(value)
+                    elif self._indirect_values:
+                        value = self._resolve_value(value)
                     yield self._post_key(key), ts_int, value
             else:
                 for key, ts_int in self._iter_locked(make_iter):
@@ -377,6 +639,76 @@ class Booklet(MutableMapping):
         else:
             raise ValueError('timestamps were not initialized with this file.')
 
+    def raw_items(self, key_prefix: Optional[bytes] = None, key_filter=None, since_ts: Optional[Union[int, str, datetime]] = None, until_ts: Optional[Union[int, str, datetime]] = None, decode: bool = False) -> Iterator[Tuple[Any, Any]]:
+        """
+        Return an iterator over the (key, value) pairs whose serialized key
+        and timestamp match the filters. The filters are tested inside the
+        scan on the block's key bytes and timestamp field, and only the
+        values of matching blocks are read, so a selective filter skips
+        almost all of the read and decode work.
+
+        Same iteration semantics as keys().
+
+        Parameters
+        ----------
+        key_prefix : bytes, optional
+            Only keys whose serialized bytes start with key_prefix.
+        key_filter : callable, optional
+            Called with the serialized key bytes; only keys for which it
+            returns True. It runs without the booklet's lock held, so it may
+            read the booklet (e.g. ``lambda k: k in other``).
+        since_ts, until_ts : int, str, datetime or None, optional
+            Only blocks with since_ts <= timestamp < until_ts. Requires
+            timestamps.
+        decode : bool
+            Whether to decode the matching keys and values. If False
+            (default), yields the serialized bytes (deduplicated and blob
+            values are resolved).
+
+        Yields
+        ------
+        tuple
+            (key, value)
+        """
+        if (since_ts is not None or until_ts is not None) and not self._init_timestamps:
+            raise ValueError('timestamps were not initialized with this file.')
+        if key_prefix is not None:
+            key_prefix = bytes(key_prefix)
+        if since_ts is not None:
+            since_ts = utils.make_timestamp_int(since_ts)
+        if until_ts is not None:
+            until_ts = utils.make_timestamp_int(until_ts)
+        value_len = getattr(self, '_value_len', None)
+        ts_bytes_len = 0 if value_len is not None else self._ts_bytes_len
+
+        def make_iter():
+            file = self._mmap if self._mmap is not None else self._file
+            unlocked_filter = None
+            if key_filter is not None:
+                mut0 = self._mutation_count
+
+                def unlocked_filter(key):
+                    ## The scan steps under _thread_lock; release it while the
+                    ## user's filter runs, so the filter may use the booklet
+                    self._thread_lock.release()
+                    try:
+                        result = key_filter(key)
+                    finally:
+                        self._thread_lock.acquire()
+                    if self._mutation_count != mut0:
+                        raise RuntimeError('booklet mutated during iteration')
+                    return result
+
+            return utils.iter_filtered(file, self._n_buckets, ts_bytes_len, value_len, self._index_offset, self._first_data_block_pos, key_prefix, unlocked_filter, since_ts, until_ts, dedup=self._dedup_threshold is not None)
+
+        for key, ts_int, value in self._iter_locked(make_iter):
+            if decode:
+                yield self._post_key(key), self._post_value(value)
+            else:
+                if self._indirect_values:
+                    value = self._resolve_value(value)
+                yield key, value
+
     def locations(self) -> Iterator[Tuple[Any, Optional[int], int, int]]:
         """
         Return an iterator of (key, timestamp, value_offset, value_len) for
@@ -415,14 +747,76 @@ class Booklet(MutableMapping):
         """
         if self._mmap is not None:
             def make_iter():
-                return utils.mmap_iter_locations(self._mmap, self._n_buckets, self._ts_bytes_len, self._index_offset, self._first_data_block_pos)
+                return utils.mmap_iter_locations(self._mmap, self._n_buckets, self._ts_bytes_len, self._index_offset, self._first_data_block_pos, dedup=self._dedup_threshold is not None)
         else:
             def make_iter():
-                return utils.iter_locations(self._file, self._n_buckets, self._ts_bytes_len, self._index_offset, self._first_data_block_pos)
+                return utils.iter_locations(self._file, self._n_buckets, self._ts_bytes_len, self._index_offset, self._first_data_block_pos, dedup=self._dedup_threshold is not None)
 
         for key, ts_int, value_offset, value_len in self._iter_locked(make_iter):
             yield self._post_key(key), ts_int, value_offset, value_len
 
+    def partitions(self, n: int) -> list:
+        """
+        Split the data blocks of the file into n partitions of about equal
+        byte size, cut at block boundaries found by a walk of the block
+        headers. Each partition is a picklable descriptor that opens the file
+        read-only on its own and iterates its keys(), items() or values(),
+        so a full scan can be spread across threads or processes. Together
+        the partitions cover every live item once; some may be empty.
+
+        Buffered writes are flushed first. Like locations(), partitions
+        describe the file layout when they were made: prune() and clear()
+        invalidate them (opening one then raises ValueError), and items
+        written afterwards may be missed. A write-mode booklet holds an
+        exclusive lock, so scan partitions after closing it or reopening it
+        in read mode.
+
+        Parameters
+        ----------
+        n : int
+            The number of partitions.
+
+        Returns
+        -------
+        list of Partition
+        """
+        if not isinstance(n, int) or n < 1:
+            raise ValueError('n must be a positive int.')
+        if isinstance(self._file, io.BytesIO):
+            raise ValueError('partitions() needs a file path, not a BytesIO.')
+
+        self.sync()
+        value_len = getattr(self, '_value_len', None)
+        with self._thread_lock:
+            source = self._mmap if self._mmap is not None else self._file
+            compactions = utils.read_file_compactions(source)
+            file_end = source.seek(0, 2) if self._mmap is None else len(source)
+            if self._index_offset != utils.sub_index_init_pos:
+                regions = [(self._first_data_block_pos, self._index_offset), (self._index_offset + (self._n_buckets * utils.n_bytes_file), file_end)]
+            else:
+                regions = [(self._first_data_block_pos, file_end)]
+            regions = [(start, end) for start, end in regions if end > start]
+            total = sum(end - start for start, end in regions)
+
+            parts = []
+            spans = []
+            data_pos = 0
+            for start, end in regions:
+                targets = [start + (k * total // n) - data_pos for k in range(1, n) if data_pos <= k * total // n < data_pos + (end - start)]
+                pos = start
+                for cut in utils.block_boundaries(source, start, end, targets, self._ts_bytes_len, value_len):
+                    spans.append((pos, cut))
+                    parts.append(spans)
+                    spans = []
+                    pos = cut
+                spans.append((pos, end))
+                data_pos += end - start
+            parts.append(spans)
+
+        parts += [[]] * (n - len(parts))
+
+        return [Partition(str(self._file_path), tuple(span for span in spans if span[1] > span[0]), value_len is not None, file_end, compactions) for spans in parts]
+
     @property
     def compaction_count(self) -> int:
         """
@@ -454,7 +848,7 @@ class Booklet(MutableMapping):
 
         with self._thread_lock:
             if self._mmap is not None:
-                check = utils.mmap_contains_key(self._mmap, key_hash, self._n_buckets, self._index_offset)
+                check = self._mmap_read(utils.mmap_contains_key, key_hash, self._n_buckets, self._index_offset)
             else:
                 check = utils.contains_key(self._file, key_hash, self._n_buckets, self._index_offset)
         return check
@@ -475,6 +869,19 @@ class Booklet(MutableMapping):
         any
             The value associated with the key, or the default value.
         """
+        value = self._get_bytes(key)
+
+        if value is not None:
+            return self._post_value(value)
+        else:
+            return default
+
+    def _get_bytes(self, key: Any) -> Optional[bytes]:
+        """
+        The undecoded value of key, or None if the key is not found. For a
+        zero-copy value serializer on the mmap path, the value is a
+        memoryview over the mmap.
+        """
         key_bytes = self._pre_key(key)
         key_hash = utils.hash_key(key_bytes)
 
@@ -483,19 +890,22 @@ class Booklet(MutableMapping):
 
         with self._thread_lock:
             if self._mmap is not None:
-                value = utils.mmap_get_value(self._mmap, key_hash, self._n_buckets, self._ts_bytes_len, self._index_offset)
+                value = self._mmap_read(utils.mmap_get_value, key_hash, self._n_buckets, self._ts_bytes_len, self._index_offset, self._zero_copy)
             else:
                 value = utils.get_value(self._file, key_hash, self._n_buckets, self._ts_bytes_len, self._index_offset)
 
-        if isinstance(value, bytes):
-            return self._post_value(value)
+        if value is False:
+            return None
         else:
-            return default
+            return value
 
     def get_items(self, keys: Iterable[Any], default: Any = None) -> Iterator[Tuple[Any, Any]]:
         """
         Return an iterator of (key, value) pairs for the given keys.
 
+        The keys are looked up in batches and the values of each batch are
+        decoded with one call of the serializer's batch protocol (loads_many).
+
         Parameters
         ----------
         keys : iterable
@@ -508,9 +918,18 @@ class Booklet(MutableMapping):
         tuple
             (key, value) pairs.
         """
-        for key in keys:
-            value = self.get(key, default=default)
-            yield key, value
+        keys = iter(keys)
+        while True:
+            batch = list(islice(keys, utils.codec_batch_size if self._codec_threads else utils.value_batch_size))
+            if not batch:
+                return
+            raw = [self._get_bytes(key) for key in batch]
+            decoded = iter(self._post_values([value for value in raw if value is not None]))
+            for key, value in zip(batch, raw):
+                if value is None:
+                    yield key, default
+                else:
+                    yield key, next(decoded)
 
     def get_timestamp(self, key: Any, include_value: bool = False, decode_value: bool = True, default: Any = None) -> Union[int, Tuple[int, Any], Any]:
         """
@@ -543,7 +962,7 @@ class Booklet(MutableMapping):
 
             with self._thread_lock:
                 if self._mmap is not None:
-                    output = utils.mmap_get_value_ts(self._mmap, key_hash, self._n_buckets, include_value, True, self._ts_bytes_len, self._index_offset)
+                    output = self._mmap_read(utils.mmap_get_value_ts, key_hash, self._n_buckets, include_value, True, self._ts_bytes_len, self._index_offset)
                 else:
                     output = utils.get_value_ts(self._file, key_hash, self._n_buckets, include_value, True, self._ts_bytes_len, self._index_offset)
 
@@ -553,6 +972,8 @@ class Booklet(MutableMapping):
                 if include_value:
                     if decode_value:
                         value = self._post_value(value)
+                    elif self._indirect_values:
+                        value = self._resolve_value(value)
 
                     return ts_int, value
                 else:
@@ -586,9 +1007,11 @@ class Booklet(MutableMapping):
                 timestamp = utils.make_timestamp_int(timestamp)
 
                 with self._thread_lock:
-                    success = utils.set_timestamp(self._file, key_hash, self._n_buckets, timestamp, self._index_offset)
+                    data_block_pos = utils.set_timestamp(self._file, key_hash, self._n_buckets, timestamp, self._index_offset)
+                    if data_block_pos and self._changed_positions is not None:
+                        self._changed_positions.append(data_block_pos)
 
-                if not success:
+                if not data_block_pos:
                     raise KeyError(key)
             else:
                 raise ValueError('File is open for read only.')
@@ -618,11 +1041,7 @@ class Booklet(MutableMapping):
                 value = self._pre_value(value)
             elif not isinstance(value, bytes):
                 raise TypeError('If encode_value is False, then value must be a bytes object.')
-            with self._thread_lock:
-                self._mutation_count += 1
-                n_extra_keys = utils.write_data_blocks(self._file,  self._pre_key(key), value, self._n_buckets, self._buffer_data, self._buffer_index, self._buffer_index_set, self._write_buffer_size, timestamp, self._ts_bytes_len, self._index_offset)
-                self._n_keys += n_extra_keys
-                # self._check_auto_reindex()
+            self._store_values([self._pre_key(key)], [value], timestamp)
         else:
             raise ValueError('File is open for read only.')
 
@@ -637,16 +1056,224 @@ class Booklet(MutableMapping):
             A mapping of key/value pairs to add to the booklet.
         """
         if self.writable:
+            items = list(key_value.items())
+            value_bytes = self._pre_values([value for key, value in items])
+            self._store_values([self._pre_key(key) for key, _ in items], value_bytes)
+
+        else:
+            raise ValueError('File is open for read only.')
+
+
+    def _store_values(self, key_bytes: list, value_bytes: list, timestamp: Optional[Union[int, str, datetime]] = None):
+        """
+        Write serialized keys and values, deduplicating them and moving them
+        to the blob file as the file is set up to. timestamp applies to every
+        value, or is a list with one timestamp per value.
+        """
+        if self._dedup_threshold is not None:
+            with self._dedup_lock:
+                value_bytes, old_refs = self._dedup_values(key_bytes, value_bytes)
+                self._write_values(key_bytes, value_bytes, timestamp)
+                self._dedup_pending.extend(old_refs)
+        else:
+            if self._blob_threshold is not None:
+                value_bytes = [self._blob_value(value) for value in value_bytes]
+            self._write_values(key_bytes, value_bytes, timestamp)
+
+    def _write_values(self, key_bytes: list, value_bytes: list, timestamp: Optional[Union[int, str, datetime]] = None):
+        """
+        Write serialized keys and values through the write buffer.
+        """
+        timestamps = timestamp if isinstance(timestamp, list) else repeat(timestamp)
+        with self._thread_lock:
+            self._mutation_count += 1
+            for key, value, ts in zip(key_bytes, value_bytes, timestamps):
+                n_extra_keys = utils.write_data_blocks(self._file, key, value, self._n_buckets, self._buffer_data, self._buffer_index, self._buffer_index_set, self._write_buffer_size, ts, self._ts_bytes_len, self._index_offset, self._overwrite_in_place, self._changed_positions)
+                self._n_keys += n_extra_keys
+
+            # self._check_auto_reindex()
+
+    def _dedup_values(self, key_bytes: list, value_bytes: list) -> Tuple[list, list]:
+        """
+        Replace the values at or above the dedup threshold with their content
+        keys, storing each new content once and counting a reference for
+        every value. Returns the values to write and the content keys of the
+        values they replace, whose references are released at the next sync
+        (once the new values are on disk).
+        """
+        threshold = self._dedup_threshold
+        previous = {}
+        new_content = {}
+        old_refs = []
+        out = []
+        for key, value in zip(key_bytes, value_bytes):
+            old = previous[key] if key in previous else self._get_stored(key)
+            if old is not None and utils.is_dedup_key(old):
+                old_refs.append(old)
+
+            ## Values that look like a content key are always stored by content, so
+            ## any stored value of that form is a reference
+            if len(value) >= threshold or utils.is_dedup_key(value):
+                ref = utils.dedup_key(value)
+                self._add_reference(ref, value, new_content)
+                value = ref
+            elif self._blob_threshold is not None:
+                value = self._blob_value(value)
+
+            previous[key] = value
+            out.append(value)
+
+        if new_content:
+            self._write_content(new_content)
+
+        return out, old_refs
+
+    def _get_stored(self, key_bytes: bytes) -> Optional[bytes]:
+        """
+        The stored (possibly content key) value of key_bytes, or None.
+        """
+        key_hash = utils.hash_key(key_bytes)
+        if key_hash in self._buffer_index_set:
+            self.sync()
+
+        with self._thread_lock:
+            value = utils.get_value(self._file, key_hash, self._n_buckets, self._ts_bytes_len, self._index_offset)
+
+        if value is False:
+            return None
+        else:
+            return value
+
+    def _add_reference(self, ref: bytes, value: bytes, new_content: dict):
+        """
+        Count one more reference to the content ref. Content the file does
+        not have yet is counted in new_content (ref -> [refcount, value]),
+        which _write_content() writes once the whole batch is deduplicated.
+        """
+        if ref in new_content:
+            new_content[ref][0] += 1
+            return
+
+        with self._thread_lock:
+            offset = self._dedup_offset(ref)
+            if offset:
+                utils.add_dedup_refcount(self._file, offset, 1)
+                return
+
+        new_content[ref] = [1, value]
+
+    def _write_content(self, new_content: dict):
+        """
+        Write and index the content blocks of a deduplicated batch in one
+        pass, before the values that reference them.
+        """
+        items = []
+        for ref, (refcount, value) in new_content.items():
+            if self._blob_threshold is not None:
+                value = self._blob_value(value)
+            items.append((ref, utils.int_to_bytes(refcount, utils.dedup_refcount_len) + value))
+
+        self._write_reserved_keys(items)
+
+    def _dedup_offset(self, ref: bytes) -> Union[int, bool]:
+        """
+        The file offset of the content block value of ref (refcount + value),
+        or False. Must be called under _thread_lock.
+        """
+        offset = self._dedup_offsets.get(ref)
+        if offset is None:
+            offset = utils.get_value_offset(self._file, utils.hash_key(ref), self._n_buckets, self._ts_bytes_len, self._index_offset)
+            if offset:
+                self._dedup_offsets[ref] = offset
+
+        return offset
+
+    def _release_references(self):
+        """
+        Apply the pending reference releases of overwritten and deleted
+        values. Content whose refcount reaches 0 is dropped by prune().
+        """
+        old_refs, self._dedup_pending = self._dedup_pending, []
+        with self._thread_lock:
+            for ref in old_refs:
+                offset = self._dedup_offset(ref)
+                if offset:
+                    utils.add_dedup_refcount(self._file, offset, -1)
+            self._file.flush()
+
+    def _blob_value(self, value: bytes) -> bytes:
+        """
+        The stored form of a serialized value: a pointer if it is large enough
+        for the blob file. Values shaped like a pointer always go there, so any
+        stored value of that form is a pointer.
+        """
+        if len(value) >= self._blob_threshold or utils.is_blob_pointer(value):
             with self._thread_lock:
-                self._mutation_count += 1
-                for key, value in key_value.items():
-                    n_extra_keys = utils.write_data_blocks(self._file, self._pre_key(key), self._pre_value(value), self._n_buckets, self._buffer_data, self._buffer_index, self._buffer_index_set, self._write_buffer_size, None, self._ts_bytes_len, self._index_offset)
-                    self._n_keys += n_extra_keys
+                file = self._blob_file(self._blob_gen)
+                offset = file.seek(0, 2)
+                file.write(value)
+            return utils.blob_pointer(self._blob_gen, offset, len(value))
+        return value
+
+    def _blob_file(self, gen: int):
+        """
+        The open file of blob generation gen; the current generation is
+        opened for appending when writable. Must be called under _thread_lock.
+        """
+        file = self._blob_files.get(gen)
+        if file is None:
+            path = utils.blob_path(self._file_path, gen)
+            if self.writable and gen == self._blob_gen:
+                file = io.open(path, 'a+b', buffering=0)
+            else:
+                file = io.open(path, 'rb')
+            self._blob_files[gen] = file
+        return file
 
-                # self._check_auto_reindex()
+    def _blob_mmap(self, gen: int, end: int) -> mmap.mmap:
+        """
+        The read-mode mmap of a blob file, covering at least its first end
+        bytes. The file is mapped again when another handle has appended past
+        the map (the parent writing while map() or partition workers read);
+        the old map is left to the garbage collector as zero-copy values may
+        still view it. Must be called under _thread_lock.
+        """
+        mm = self._blob_mmaps.get(gen)
+        if mm is None or end > len(mm):
+            mm = self._blob_mmaps[gen] = mmap.mmap(self._blob_file(gen).fileno(), 0, access=mmap.ACCESS_READ)
+            if end > len(mm):
+                raise ValueError('A blob pointer points past the end of its blob file; the file may be corrupt.')
+        return mm
+
+    def _read_blob(self, pointer: bytes) -> bytes:
+        """
+        The value a blob pointer points to. In read mode it is sliced from an
+        mmap of the blob file (a memoryview for zero-copy serializers).
+        """
+        gen, offset, length = utils.read_blob_pointer(pointer)
+        with self._thread_lock:
+            file = self._blob_file(gen)
+            if self._mmap is not None:
+                mm = self._blob_mmap(gen, offset + length)
 
+        if self._mmap is None:
+            return utils.pread(file, length, offset, self._thread_lock)
+        elif self._zero_copy:
+            return memoryview(mm)[offset:offset + length]
         else:
-            raise ValueError('File is open for read only.')
+            return mm[offset:offset + length]
+
+    def _resolve_value(self, value: bytes) -> bytes:
+        """
+        The value bytes behind a stored value, following a content key and
+        then a blob pointer.
+        """
+        if self._dedup_threshold is not None and utils.is_dedup_key(value):
+            content = self._read_reserved_key(utils.hash_key(bytes(value)))
+            value = content[utils.dedup_refcount_len:]
+        if self._blob_threshold is not None and utils.is_blob_pointer(value):
+            value = self._read_blob(value)
+        return value
 
 
     def prune(self, timestamp: Optional[Union[int, str, datetime]] = None, keep_keys: Iterable[Any] = ()) -> int:
@@ -687,7 +1314,8 @@ class Booklet(MutableMapping):
             with self._thread_lock:
                 self._mutation_count += 1
                 self._compaction_count += 1
-                n_keys, removed_count, new_index_offset = utils.prune_file(self._file, timestamp, self._n_buckets, self._n_bytes_file, self._n_bytes_key, self._n_bytes_value, self._write_buffer_size, self._ts_bytes_len, self._buffer_data, self._buffer_index, self._buffer_index_set, self._index_offset, self._first_data_block_pos, keep_hashes)
+                utils.bump_file_compactions(self._file)
+                n_keys, removed_count, new_index_offset = utils.prune_file(self._file, timestamp, self._n_buckets, self._n_bytes_file, self._n_bytes_key, self._n_bytes_value, self._write_buffer_size, self._ts_bytes_len, self._buffer_data, self._buffer_index, self._buffer_index_set, self._index_offset, self._first_data_block_pos, keep_hashes, dedup=self._dedup_threshold is not None)
                 self._n_keys = n_keys
                 self._file.seek(self._n_keys_pos)
                 self._file.write(utils.int_to_bytes(self._n_keys, 4))
@@ -740,10 +1368,14 @@ class Booklet(MutableMapping):
             key_bytes = self._pre_key(key)
             key_hash = utils.hash_key(key_bytes)
 
+            old = self._get_stored(key_bytes) if self._dedup_threshold is not None else None
+
             with self._thread_lock:
                 del_bool = utils.assign_delete_flag(self._file, key_hash, self._n_buckets, self._index_offset)
                 if del_bool:
                     self._mutation_count += 1
+                    if old is not None and utils.is_dedup_key(old):
+                        self._dedup_pending.append(old)
                     ## Reserved keys (metadata + app slots) never incremented
                     ## n_keys at write time, so deleting one must not decrement
                     ## it either (previously skewed the count down by one).
@@ -770,6 +1402,11 @@ class Booklet(MutableMapping):
             with self._thread_lock:
                 self._mutation_count += 1
                 self._compaction_count += 1
+                utils.bump_file_compactions(self._file)
+                ## Drop pending writes too, or the next flush would resurrect them
+                self._buffer_data.clear()
+                self._buffer_index.clear()
+                self._buffer_index_set.clear()
                 utils.clear(self._file, self._n_buckets, self._n_keys_pos, self._write_buffer_size)
                 self._n_keys = 0
                 self._index_offset = utils.sub_index_init_pos
@@ -785,8 +1422,17 @@ class Booklet(MutableMapping):
         """
         self.sync()
         if self._mmap is not None:
-            self._mmap.close()
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Arrays from as_numpy or the numpy serializer still export
+                # the map; it is unmapped when the last of them is garbage
+                # collected.
+                pass
             self._mmap = None
+        if self._codec_pool is not None:
+            self._codec_pool.shutdown()
+            self._codec_pool = None
         # self._finalizer()
         # Tolerate an already-closed/None file so a defunct object (e.g. after a
         # failed reopen, or a double close()) is always safely closeable.
@@ -830,7 +1476,8 @@ class Booklet(MutableMapping):
         elif flag == 'r':
             self._file = io.open(self._file_path, 'rb')
             try:
-                utils._acquire_lock(self._file, portalocker.LOCK_SH, lock_timeout, self._file_path)
+                if self._shared_lock:
+                    utils._acquire_lock(self._file, portalocker.LOCK_SH, lock_timeout, self._file_path)
             except BaseException:
                 self._file.close()
                 self.writable = False
@@ -849,7 +1496,35 @@ class Booklet(MutableMapping):
         self._finalizer = weakref.finalize(self, utils.close_files, self._file, utils.n_keys_crash, self._n_keys_pos, self.writable, self._mmap)
 
 
-    def sync(self):
+    def _remap(self):
+        """
+        Map the file again if another handle has grown it since it was mapped
+        (the parent writing while map() workers read). The old map is left to
+        the garbage collector as zero-copy values may still view it. Returns
+        True if the file was remapped.
+        """
+        if os.fstat(self._file.fileno()).st_size <= len(self._mmap):
+            return False
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(self._mmap, 'madvise') and hasattr(mmap, 'MADV_RANDOM'):
+            self._mmap.madvise(mmap.MADV_RANDOM)
+        return True
+
+
+    def _mmap_read(self, func, *args):
+        """
+        Call an mmap chain lookup, remapping when the chain leads past the end
+        of the map. Must be called under _thread_lock.
+        """
+        output = func(self._mmap, *args)
+        while output is None:
+            if not self._remap():
+                raise ValueError('A hash chain points past the end of the file; the file may be corrupt.')
+            output = func(self._mmap, *args)
+        return output
+
+
+    def sync(self):
         """
         Sync the data buffers to disk, ensuring all changes are persisted.
         """
@@ -858,26 +1533,41 @@ class Booklet(MutableMapping):
                 if self._buffer_index:
                     utils.flush_data_buffer(self._file, self._buffer_data, self._file.seek(0, 2))
                     self._sync_index()
-                    self._file.seek(self._n_keys_pos)
-                    self._file.write(utils.int_to_bytes(self._n_keys, 4))
+
+                # Always persist n_keys: some writes change it without going
+                # through the append buffer (recycled or dense fixed-length slots).
+                self._file.seek(self._n_keys_pos)
+                self._file.write(utils.int_to_bytes(self._n_keys, 4))
 
                 # Check for auto-reindex even when buffer is empty
                 # (keys may have been flushed during write_data_blocks)
                 self._check_auto_reindex()
                 self._file.flush()
 
+            if self._dedup_threshold is not None and self._dedup_pending:
+                self._release_references()
+
     def _sync_index(self):
         n_extra_keys = utils.update_index(self._file, self._buffer_index, self._buffer_index_set, self._n_buckets, self._index_offset)
         self._n_keys += n_extra_keys
 
         self._check_auto_reindex()
 
-    def _check_auto_reindex(self):
+    def _check_auto_reindex(self, n_keys=None):
         if self._defer_reindex:
             return
+        if n_keys is None:
+            n_keys = self._n_keys
         # Auto-reindex when load factor > 1.0
-        if self._n_keys > self._n_buckets:
+        if n_keys > self._n_buckets:
             new_n_buckets = utils.get_new_n_buckets(self._n_buckets)
+            # Jump straight to a size that fits (set_array can add millions of
+            # keys at once) rather than reindexing once per step.
+            while new_n_buckets is not None and n_keys > new_n_buckets:
+                next_n_buckets = utils.get_new_n_buckets(new_n_buckets)
+                if next_n_buckets is None:
+                    break
+                new_n_buckets = next_n_buckets
             if new_n_buckets is not None:
                 # Bare increment - the caller (sync/_sync_index) already holds
                 # the non-reentrant lock; taking it again would self-deadlock.
@@ -955,26 +1645,48 @@ class Booklet(MutableMapping):
                 if key_bytes is not None and key_bytes not in utils.reserved_key_bytes:
                     yield self._post_key(key_bytes), self._post_value(value_bytes)
 
-    def map(self, func, keys=None, n_workers=None):
+    def map(self, func, keys=None, n_workers=None, executor='process', chunksize=None, ordered=False):
         """
-        Apply func to items in parallel using multiprocessing.
+        Apply func to items in parallel using multiprocessing or threads.
+
+        The workers read the items themselves: each opens the file read-only
+        (without the shared OS lock, so a write-mode handle can map too) and
+        processes a partition of the file (see partitions()), or a chunk of
+        keys when keys are given. With the default process pool, func is sent
+        once per worker and only the results come back through the pool. For
+        a BytesIO booklet the items are read here and sent to the workers.
 
         Parameters
         ----------
         func : callable
-            A picklable function: func(key, value) -> (new_key, new_value) or None.
+            func(key, value) -> (new_key, new_value) or None.
             Return a (key, value) tuple to yield the result. The output key can
             differ from the input key. Return None to skip (item not yielded).
-            Must be a top-level function (not a lambda or closure).
+            For process executors it must be picklable, i.e. a top-level
+            function (not a lambda or closure).
         keys : iterable, optional
             Specific keys to process. If None, iterates all keys in the booklet.
         n_workers : int, optional
-            Number of worker processes. Defaults to os.cpu_count().
+            Number of workers. Defaults to os.cpu_count(). Ignored when an
+            Executor is passed.
+        executor : str or concurrent.futures.Executor
+            'process' (a multiprocessing.Pool per call), 'thread' (a thread
+            pool per call, with no pickling; best for funcs that release the
+            GIL) or an Executor of the caller, which is reused across calls
+            and left running. Workers of a caller's executor open the file
+            and receive func per task.
+        chunksize : int, optional
+            The number of items per task. Defaults to splitting the work into
+            about 4 tasks per worker. Larger tasks cut the per-task overhead
+            for cheap funcs.
+        ordered : bool
+            Yield the results in task order (file order for a full scan, the
+            order of keys otherwise) rather than as tasks complete.
 
         Yields
         ------
         tuple
-            (key, value) pairs produced by func, as they complete.
+            (key, value) pairs produced by func, a task at a time.
 
         Notes
         -----
@@ -982,28 +1694,134 @@ class Booklet(MutableMapping):
         keys()/items()/values() provide: plain writes (set/del) ARE allowed
         while a map() is running (auto-reindex is deferred for its duration).
         Only prune()/clear() invalidate a running map(), raising RuntimeError.
+        Items written after map() starts may or may not be seen by it.
         """
         if self._buffer_index_set:
             self.sync()
 
         if n_workers is None:
             n_workers = os.cpu_count() or 4
+        if isinstance(executor, Executor):
+            pass
+        elif executor not in ('process', 'thread'):
+            raise ValueError("executor must be 'process', 'thread' or a concurrent.futures.Executor.")
+        if chunksize is not None and chunksize < 1:
+            raise ValueError('chunksize must be a positive int.')
 
         self._defer_reindex = True
         try:
-            if keys is not None:
-                item_iter = ((k, self.get(k)) for k in keys)
-            else:
-                item_iter = self._iter_items_unlocked()
-
-            with multiprocessing.Pool(processes=n_workers) as pool:
-                work_iter = ((func, k, v) for k, v in item_iter if v is not None)
-                for result in pool.imap_unordered(_map_worker, work_iter):
-                    if result is not None:
-                        yield result
+            comp0 = self._compaction_count
+            tasks = self._map_tasks(keys, n_workers, chunksize)
+            for results in self._run_map_tasks(func, tasks, n_workers, executor, ordered):
+                if self._compaction_count != comp0:
+                    raise RuntimeError('booklet compacted (prune/clear) during map()')
+                yield from results
         finally:
             self._defer_reindex = False
 
+    def _map_tasks(self, keys, n_workers: int, chunksize: Optional[int]) -> list:
+        """
+        The work of a map(): partitions of the file, or chunks of keys when
+        keys are given (or the file cannot be partitioned). A BytesIO booklet
+        has no file for the workers to open, so its chunks hold the items.
+        """
+        in_memory = isinstance(self._file, io.BytesIO)
+        if keys is None:
+            if in_memory:
+                items = list(self._iter_items_unlocked())
+                size = chunksize or max(1, -(-len(items) // (n_workers * 4)))
+                return [_Items(items[i:i + size]) for i in range(0, len(items), size)]
+            try:
+                n_tasks = n_workers * 4 if chunksize is None else max(1, -(-self._n_keys // chunksize))
+                return self.partitions(n_tasks)
+            except NotImplementedError:
+                keys = self.keys()
+
+        keys = list(keys)
+        size = chunksize or max(1, -(-len(keys) // (n_workers * 4)))
+        chunks = [keys[i:i + size] for i in range(0, len(keys), size)]
+        if in_memory:
+            return [_Items((key, value) for key, value in self.get_items(chunk) if value is not None) for chunk in chunks]
+
+        return chunks
+
+    def _run_map_tasks(self, func, tasks: list, n_workers: int, executor, ordered: bool):
+        """
+        Run the map() tasks on the executor, yielding a list of results per task.
+        """
+        file_path = None if isinstance(self._file, io.BytesIO) else str(self._file_path)
+        cls = type(self)
+
+        if executor == 'process':
+            with multiprocessing.Pool(processes=n_workers, initializer=_init_map_worker, initargs=(func, cls, file_path)) as pool:
+                if ordered:
+                    yield from pool.imap(_map_task, tasks)
+                else:
+                    yield from pool.imap_unordered(_map_task, tasks)
+
+        elif executor == 'thread':
+            ## The threads share one read-only handle
+            reader = None if file_path is None else _open_reader(cls, file_path)
+            pool = ThreadPoolExecutor(n_workers)
+            try:
+                yield from _executor_map(pool, partial(_run_map_task, func, reader), tasks, ordered)
+            finally:
+                pool.shutdown(cancel_futures=True)
+                if reader is not None:
+                    reader.close()
+
+        else:
+            yield from _executor_map(executor, partial(_open_map_task, func, cls, file_path), tasks, ordered)
+
+    def map_update(self, func, keys=None, n_workers=None, executor='process', chunksize=None, compact=False) -> int:
+        """
+        Apply func to items in parallel with map() and write the results back
+        into the booklet.
+
+        The results are written as the tasks complete, a batch at a time
+        through update(): one lock acquisition and one batched encode per
+        batch, with the index updates left in the write buffer and the
+        auto-reindex deferred until the end.
+
+        Parameters
+        ----------
+        func : callable
+            func(key, value) -> (new_key, new_value) or None, as in map().
+            A result key other than an input key must not be a key that the
+            map has yet to read.
+        keys : iterable, optional
+            Specific keys to process. If None, processes all keys in the booklet.
+        n_workers, executor, chunksize
+            As in map().
+        compact : bool
+            Run prune() at the end to reclaim the blocks of the replaced values.
+
+        Returns
+        -------
+        int
+            The number of results written.
+        """
+        if not self.writable:
+            raise ValueError('File is open for read only.')
+
+        n = 0
+        batch = []
+        for result in self.map(func, keys, n_workers, executor, chunksize):
+            batch.append(result)
+            if len(batch) >= utils.codec_batch_size:
+                self.update(dict(batch))
+                n += len(batch)
+                batch = []
+        if batch:
+            self.update(dict(batch))
+            n += len(batch)
+
+        self.sync()
+        if compact:
+            self.prune()
+
+        return n
+
 
 #######################################################
 ### Variable length value Booklet
@@ -1025,8 +1843,9 @@ class VariableLengthValue(Booklet):
         The serializer to use to convert the input value to bytes. Run the booklet.available_serializers to determine the internal serializers that are available. None will require bytes as input. A custom serializer class can also be used. If the objects can be serialized to json, then use orjson or msgpack. They are super fast and you won't have the pickle issues.
         If a custom class is passed, then it must have dumps and loads methods.
 
-    value_serializer : str, class, or None
+    value_serializer : str, class, tuple, or None
         Similar to the key_serializer, except for the values.
+        Either serializer can also be a (name, options) tuple for the configurable serializers, e.g. ('zstd', {'level': 9, 'threads': 4}) or ('msgpack', {'use_single_float': True}). The zstd family takes level and threads; msgpack takes use_bin_type, use_single_float, datetime, use_list, raw, strict_map_key and timestamp. The options are stored in the file and restored on reopen, where they take precedence over any passed options.
 
     n_buckets : int
         The number of hash buckets to using in the indexing. Generally use the same number of buckets as you expect for the total number of keys.
@@ -1035,6 +1854,21 @@ class VariableLengthValue(Booklet):
         The buffer memory size in bytes used for writing. Writes are first written to a block of memory, then once the buffer if filled up it writes to disk. This is to reduce the number of writes to disk and consequently the CPU write overhead.
         This is only used when the file is open for writing.
 
+    overwrite_in_place : bool
+        When True, overwriting an existing key with a value no larger than the stored one rewrites the value inside the existing block instead of appending a new block. Trailing slack is covered by a dead skip block that prune reclaims. This is a per-handle write mode (nothing is stored in the file); it gives up the locations() guarantee that captured offsets survive overwrites.
+
+    codec_threads : int or None
+        When set, value serialization in update() and deserialization in items(), values(), get_items() and iter_batches() run in batches split across a pool of this many threads, with the order preserved. This pays off for serializers whose codecs release the GIL (the zstd variants, orjson, pd_zstd, gpd_zstd). items() and values() then read a batch ahead, so a mutation during iteration is detected at the next batch rather than the next item.
+
+    dedup_threshold : int or None
+        When set on a new file, serialized values of at least this many bytes are stored once per distinct content in a hidden content block, and the keys holding them store a small reference to it. Each content block carries a reference count that overwrites and deletes release; prune removes the content no key refers to anymore. Worth it when many keys share a few large values. The threshold is stored in the file. locations() of a deduplicated value addresses the reference, not the value.
+
+    blob_threshold : int or None
+        When set on a new file, serialized values of at least this many bytes are appended to a companion blob file (<name>.<gen>.blob next to the booklet) and the data block stores a small pointer to them, so key-only operations (keys(), prune, reindexing) run over a small file. Overwritten and deleted blobs are reclaimed by compact_blobs(). Must be larger than the 23-byte pointer; not available for BytesIO. The threshold is stored in the file. locations() of a blob value addresses the pointer, not the value.
+
+    change_index : bool
+        When True, keep a timestamp-ordered index of the data blocks in a companion file (<name>.changes next to the booklet), so changed_since() finds the keys changed since a time without scanning the file. It can be turned on for an existing file (the first sync indexes it) and the setting is stored in the file. Requires timestamps; not available for BytesIO.
+
     Returns
     -------
     Booklet
@@ -1058,7 +1892,7 @@ class VariableLengthValue(Booklet):
     +---------+-------------------------------------------+
 
     """
-    def __init__(self, file_path: Union[str, pathlib.Path, io.BytesIO], flag: str = "r", key_serializer: Optional[Union[str, Any]] = None, value_serializer: Optional[Union[str, Any]] = None, n_buckets: int=12007, buffer_size: int = 2**22, init_timestamps: bool = True, init_bytes: Optional[bytes] = None, timeout: Optional[float] = None):
+    def __init__(self, file_path: Union[str, pathlib.Path, io.BytesIO], flag: str = "r", key_serializer: Optional[Union[str, Tuple[str, dict], Any]] = None, value_serializer: Optional[Union[str, Tuple[str, dict], Any]] = None, n_buckets: int=12007, buffer_size: int = 2**22, init_timestamps: bool = True, init_bytes: Optional[bytes] = None, timeout: Optional[float] = None, overwrite_in_place: bool = False, codec_threads: Optional[int] = None, dedup_threshold: Optional[int] = None, blob_threshold: Optional[int] = None, change_index: bool = False):
         """
         Initialize a VariableLengthValue booklet.
 
@@ -1068,10 +1902,10 @@ class VariableLengthValue(Booklet):
             Path to the booklet file or a BytesIO object.
         flag : str, optional
             Mode to open the file ('r', 'w', 'c', 'n'). Defaults to 'r'.
-        key_serializer : str, class, or None, optional
-            Serializer for keys. Defaults to None (bytes).
-        value_serializer : str, class, or None, optional
-            Serializer for values. Defaults to None (bytes).
+        key_serializer : str, class, tuple, or None, optional
+            Serializer for keys, or a (name, options) tuple. Defaults to None (bytes).
+        value_serializer : str, class, tuple, or None, optional
+            Serializer for values, or a (name, options) tuple. Defaults to None (bytes).
         n_buckets : int, optional
             Initial number of hash buckets. Defaults to 12007.
         buffer_size : int, optional
@@ -1084,283 +1918,1452 @@ class VariableLengthValue(Booklet):
             Seconds to wait for the OS file lock. None (default) waits
             indefinitely (warning if the wait is long); a number raises
             LockTimeoutError if the lock isn't acquired in time.
+        overwrite_in_place : bool, optional
+            Rewrite overwrites whose new value fits inside the existing block
+            instead of appending. Defaults to False.
+        codec_threads : int, optional
+            Number of threads for batch value encodes/decodes. Defaults to
+            None (serial).
+        dedup_threshold : int, optional
+            Store serialized values of at least this many bytes once per
+            distinct content. Stored in the file on creation. Defaults to
+            None (off).
+        blob_threshold : int, optional
+            Store serialized values of at least this many bytes in a
+            companion blob file. Stored in the file on creation. Defaults to
+            None (off).
+        change_index : bool, optional
+            Keep a timestamp-ordered change index for changed_since(). Stored
+            in the file. Defaults to False.
         """
         self._defer_reindex = False
+        self._overwrite_in_place = overwrite_in_place
+        self._codec_threads = codec_threads
+        self._codec_pool = None
+        key_serializer, key_options = serializers.split_options(key_serializer)
+        value_serializer, value_options = serializers.split_options(value_serializer)
         utils.init_files_variable(self, file_path, flag, key_serializer, value_serializer, n_buckets, buffer_size, init_timestamps, init_bytes, timeout)
+        self._bind_serializer_options(key_options, value_options)
+        self._bind_compression_dictionary()
+        self._bind_dedup(dedup_threshold)
+        self._bind_blob(blob_threshold)
+        self._bind_changes(change_index)
+        self._indirect_values = self._dedup_threshold is not None or self._blob_threshold is not None
+        self._zero_copy = getattr(self._value_serializer, 'zero_copy', False)
+
+
+    def _bind_serializer_options(self, key_options=None, value_options=None):
+        # Configure the serializers with the options stored in the file. Options
+        # passed to a file without stored options are validated and stored (by
+        # the first writer); stored options win over passed ones, like the
+        # serializer codes in the header.
+        payload = self._read_reserved_key(utils.serializer_options_key_hash)
+        if payload is not None:
+            options = orjson.loads(payload)
+        else:
+            options = {}
+            if key_options:
+                options['key'] = key_options
+            if value_options:
+                options['value'] = value_options
+
+        key_serializer = getattr(self._key_serializer, 'serializer', self._key_serializer)
+        value_serializer = getattr(self._value_serializer, 'serializer', self._value_serializer)
+        self._key_serializer = serializers.configure(key_serializer, options['key']) if 'key' in options else key_serializer
+        self._value_serializer = serializers.configure(value_serializer, options['value']) if 'value' in options else value_serializer
+
+        if payload is None and options and self.writable:
+            self._write_reserved_key(utils.serializer_options_key_bytes, orjson.dumps(options))
+        self._serializer_options = options
+
+
+    def _bind_dedup(self, dedup_threshold=None):
+        # The threshold stored in the file wins; a new file stores the passed one.
+        payload = self._read_reserved_key(utils.dedup_threshold_key_hash)
+        if payload is not None:
+            dedup_threshold = utils.bytes_to_int(payload)
+        elif dedup_threshold is not None:
+            if not isinstance(dedup_threshold, int) or dedup_threshold < 0:
+                raise ValueError('dedup_threshold must be a non-negative int.')
+            if not self.writable:
+                dedup_threshold = None
+            elif self._n_keys:
+                raise ValueError('dedup_threshold can only be set on an empty file.')
+            else:
+                self._write_reserved_key(utils.dedup_threshold_key_bytes, utils.int_to_bytes(dedup_threshold, 4))
+
+        self._dedup_threshold = dedup_threshold
+        self._dedup_lock = threading.Lock()
+        self._dedup_pending = []
+        self._dedup_offsets = {}
+
+
+    def _bind_blob(self, blob_threshold=None):
+        # The threshold and current generation stored in the file win; a new
+        # file stores the passed threshold.
+        payload = self._read_reserved_key(utils.blob_key_hash)
+        blob_gen = 0
+        if payload is not None:
+            blob_threshold = utils.bytes_to_int(payload[:4])
+            blob_gen = utils.bytes_to_int(payload[4:])
+        elif blob_threshold is not None:
+            if not isinstance(blob_threshold, int) or blob_threshold <= utils.blob_pointer_len:
+                raise ValueError(f'blob_threshold must be an int larger than {utils.blob_pointer_len}.')
+            if isinstance(self._file, io.BytesIO):
+                raise ValueError('blob_threshold needs a file path, not a BytesIO.')
+            if not self.writable:
+                blob_threshold = None
+            elif self._n_keys:
+                raise ValueError('blob_threshold can only be set on an empty file.')
+            else:
+                self._write_reserved_key(utils.blob_key_bytes, utils.int_to_bytes(blob_threshold, 4) + utils.int_to_bytes(blob_gen, 2))
+
+        self._blob_threshold = blob_threshold
+        self._blob_gen = blob_gen
+        self._blob_files = {}
+        self._blob_mmaps = {}
+
+
+    def _bind_changes(self, change_index=False):
+        # The hidden key marks a booklet that keeps a change index; it can be
+        # turned on for any file, as the first update indexes the whole file.
+        enabled = self._read_reserved_key(utils.change_index_key_hash) is not None
+        if change_index and not enabled:
+            if not self._init_timestamps:
+                raise ValueError('timestamps were not initialized with this file.')
+            if isinstance(self._file, io.BytesIO):
+                raise ValueError('change_index needs a file path, not a BytesIO.')
+            if self.writable:
+                self._write_reserved_key(utils.change_index_key_bytes, b'\x01')
+                enabled = True
 
-
-### Alias
-# VariableValue = Booklet
-
-
-#######################################################
-### Fixed length value Booklet
+        if enabled:
+            self._changes_path = utils.changes_path(self._file_path)
+            self._changed_positions = []
+        else:
+            self._changes_path = None
+        self._changes_watermark = None
 
 
-class FixedLengthValue(Booklet):
-    """
-    Open a persistent dictionary for reading and writing. This class required a globally fixed value length. For example, this can be used for fixed length hashes or timestamps. On creation of the file, the serializers will be written to the file. Any subsequent reads and writes do not need to be opened with any parameters other than file_path and flag.
+    def _data_regions(self, start: int, end: int) -> list:
+        """
+        The (start, end) regions of data blocks between the file positions
+        start and end, skipping the bucket index.
+        """
+        first_data_block_pos = self._first_data_block_pos or utils.sub_index_init_pos + (self._n_buckets * utils.n_bytes_file)
+        if self._index_offset != utils.sub_index_init_pos:
+            regions = [(first_data_block_pos, self._index_offset), (self._index_offset + (self._n_buckets * utils.n_bytes_file), end)]
+        else:
+            regions = [(first_data_block_pos, end)]
 
-    Parameters
-    -----------
-    file_path : str or pathlib.Path
-        It must be a path to a local file location. If you want to use a tempfile, then use the name from the NamedTemporaryFile initialized class.
+        return [(max(region_start, start), region_end) for region_start, region_end in regions if max(region_start, start) < region_end]
 
-    flag : str
-        Flag associated with how the file is opened according to the dbm style. See below for details.
 
-    key_serializer : str, class, or None
-        The serializer to use to convert the input value to bytes. Run the booklet.available_serializers to determine the internal serializers that are available. None will require bytes as input. A custom serializer class can also be used. If the objects can be serialized to json, then use orjson or msgpack. They are super fast and you won't have the pickle issues.
-        If a custom class is passed, then it must have dumps and loads methods.
+    def _update_changes(self, reset: bool = False):
+        # Index the blocks appended past the watermark and the blocks changed
+        # in place since the last update. Must be called under _thread_lock.
+        file_end = self._file.seek(0, 2)
+        if not reset and self._changes_watermark == file_end and not self._changed_positions:
+            return
 
-    value_len : int
-        The number of bytes that all values will have.
+        uuid_bytes = self.uuid.bytes
+        mode = 'r+b' if self._changes_path.exists() else 'w+b'
+        with io.open(self._changes_path, mode) as f:
+            state = None if reset else utils.read_change_runs(f, uuid_bytes)
+            if state is None:
+                state = utils.reset_change_index(f, uuid_bytes)
+                self._changed_positions.clear()
+            watermark, runs, end = state
 
-    buffer_size : int
-        The buffer memory size in bytes used for writing. Writes are first written to a block of memory, then once the buffer if filled up it writes to disk. This is to reduce the number of writes to disk and consequently the CPU write overhead.
-        This is only used when the file is open for writing.
+            entries = []
+            for start, region_end in self._data_regions(watermark, file_end):
+                entries.extend(utils.iter_block_timestamps(self._file, start, region_end, self._ts_bytes_len, dedup=self._dedup_threshold is not None))
+            for data_block_pos in set(self._changed_positions):
+                if data_block_pos < watermark:
+                    block = utils.read_block_key_timestamp(self._file, data_block_pos, self._ts_bytes_len, dedup=self._dedup_threshold is not None)
+                    if block is not None:
+                        entries.append((block[1], data_block_pos))
 
-    Returns
-    -------
-    Booklet
+            utils.write_change_run(f, entries, file_end, runs, end)
 
-    The optional *flag* argument can be:
+        self._changed_positions.clear()
+        self._changes_watermark = file_end
 
-    +---------+-------------------------------------------+
-    | Value   | Meaning                                   |
-    +=========+===========================================+
-    | ``'r'`` | Open existing database for reading only   |
-    |         | (default)                                 |
-    +---------+-------------------------------------------+
-    | ``'w'`` | Open existing database for reading and    |
-    |         | writing                                   |
-    +---------+-------------------------------------------+
-    | ``'c'`` | Open database for reading and writing,    |
-    |         | creating it if it doesn't exist           |
-    +---------+-------------------------------------------+
-    | ``'n'`` | Always create a new, empty database, open |
-    |         | for reading and writing                   |
-    +---------+-------------------------------------------+
 
-    """
-    def __init__(self, file_path: Union[str, pathlib.Path, io.BytesIO], flag: str = "r", key_serializer: Optional[Union[str, Any]] = None, value_len: Optional[int] = None, n_buckets: int=12007, buffer_size: int = 2**22, init_bytes: Optional[bytes] = None, timeout: Optional[float] = None):
+    def changed_since(self, timestamp: Union[int, str, datetime]) -> list:
         """
-        Initialize a FixedLengthValue booklet.
+        The keys whose timestamp is at or after timestamp, in timestamp
+        order, found with the change index (see change_index) rather than a
+        scan of the file. Deleted keys are not included.
 
         Parameters
         ----------
-        file_path : str, pathlib.Path, or io.BytesIO
-            Path to the booklet file or a BytesIO object.
-        flag : str, optional
-            Mode to open the file ('r', 'w', 'c', 'n'). Defaults to 'r'.
-        key_serializer : str, class, or None, optional
-            Serializer for keys. Defaults to None (bytes).
-        value_len : int, optional
-            Fixed length of values in bytes. Required for new files.
-        n_buckets : int, optional
-            Initial number of hash buckets. Defaults to 12007.
-        buffer_size : int, optional
-            Write buffer size in bytes. Defaults to 4MB (2**22).
-        init_bytes : bytes, optional
-            Initial bytes to write to a new file. Defaults to None.
-        timeout : float, optional
-            Seconds to wait for the OS file lock. None (default) waits
-            indefinitely (warning if the wait is long); a number raises
-            LockTimeoutError if the lock isn't acquired in time.
+        timestamp : int, str, or datetime
+            An int of microseconds in POSIX UTC time, an ISO 8601 datetime
+            string with timezone, or a datetime object with timezone.
+
+        Returns
+        -------
+        list
         """
-        self._defer_reindex = False
-        utils.init_files_fixed(self, file_path, flag, key_serializer, value_len, n_buckets, buffer_size, init_bytes, timeout)
+        if not self._init_timestamps:
+            raise ValueError('timestamps were not initialized with this file.')
+        if self._changes_path is None:
+            raise ValueError('This booklet keeps no change index (open it with change_index=True).')
 
+        ts_int = utils.make_timestamp_int(timestamp)
+        self.sync()
 
-    def set_metadata(self, data: Any, timestamp: Optional[Union[int, str, datetime]] = None):
-        """
-        Not supported on fixed-length booklets.
-        """
-        # The base-class metadata write goes through the variable-length block
-        # writer, whose framing (per-entry value length) fixed-stride iteration
-        # cannot parse - a single metadata write silently corrupts keys()/items()
-        # for the whole file. Fail loud instead.
-        raise NotImplementedError(
-            'Metadata is not supported on fixed-length booklets: the metadata write '
-            'path would corrupt fixed-stride iteration. Use a variable-length booklet '
-            'if you need metadata.'
-        )
+        with self._thread_lock:
+            file = self._mmap if self._mmap is not None else self._file
+            file_end = len(file) if self._mmap is not None else file.seek(0, 2)
 
-    def set_reserved(self, slot: int, data: bytes, timestamp: Optional[Union[int, str, datetime]] = None):
-        """
-        Not supported on fixed-length booklets.
-        """
-        # Same reason as set_metadata: the variable-length block framing would
-        # corrupt fixed-stride iteration. (get_reserved stays inherited - it
-        # harmlessly returns None on a file that can never hold a slot.)
-        raise NotImplementedError(
-            'Reserved slots are not supported on fixed-length booklets: the write '
-            'path would corrupt fixed-stride iteration. Use a variable-length booklet.'
-        )
+            candidates = []
+            watermark = 0
+            try:
+                with io.open(self._changes_path, 'rb') as f:
+                    state = utils.read_change_runs(f, self.uuid.bytes)
+                    if state is not None:
+                        watermark, runs, end = state
+                        for offset, count in runs:
+                            candidates.extend(utils.iter_change_run_since(f, offset, count, ts_int))
+            except FileNotFoundError:
+                pass
 
-    def locations(self) -> Iterator[Tuple[Any, Optional[int], int, int]]:
+            ## Blocks a writer appended after the last index update
+            for start, end in self._data_regions(watermark, file_end):
+                candidates.extend(entry for entry in utils.iter_block_timestamps(file, start, end, self._ts_bytes_len, dedup=self._dedup_threshold is not None) if entry[0] >= ts_int)
+
+            keys = []
+            seen = set()
+            for entry_ts, data_block_pos in sorted(candidates):
+                if data_block_pos in seen or data_block_pos >= file_end:
+                    continue
+                block = utils.read_block_key_timestamp(file, data_block_pos, self._ts_bytes_len, dedup=self._dedup_threshold is not None)
+                ## An entry only counts while its block is live and still carries its timestamp
+                if block is not None and block[1] == entry_ts:
+                    seen.add(data_block_pos)
+                    keys.append(block[0])
+
+        return [self._post_key(key) for key in keys]
+
+
+    def sync(self):
         """
-        Not implemented for fixed-length booklets.
+        Sync the data buffers to disk, ensuring all changes are persisted,
+        and bring the change index up to date.
         """
-        # The fixed-length block framing has no per-item value_len or
-        # timestamp (block layout: key_hash | next_ptr | key_len | key |
-        # value), so the variable-length header scan does not apply. Nothing
-        # needs it yet - implement with fixed framing if that changes.
-        # (compaction_count stays inherited and is meaningful here.)
-        raise NotImplementedError('locations() is not implemented for fixed-length booklets.')
+        super().sync()
+        if self._changes_path is not None and self.writable and self._file is not None and not self._file.closed:
+            with self._thread_lock:
+                self._update_changes()
 
 
-    def _pre_value(self, value: Any) -> bytes:
-        # Fixed-stride iteration derives every block boundary from value_len -
-        # a value of any other length silently corrupts the whole scan, so
-        # validate centrally for every write entry point that serializes.
-        value = super()._pre_value(value)
-        if len(value) != self._value_len:
-            raise ValueError(f'Value must serialize to exactly {self._value_len} bytes, got {len(value)}.')
-        return value
+    def _close_blobs(self):
+        if self._blob_threshold is None:
+            return
+        for mm in self._blob_mmaps.values():
+            try:
+                mm.close()
+            except BufferError:
+                # Zero-copy values still export the map; it is unmapped with
+                # the last of them.
+                pass
+        for file in self._blob_files.values():
+            file.close()
+        self._blob_mmaps = {}
+        self._blob_files = {}
 
 
-    def set(self, key: Any, value: Any, timestamp: Optional[Union[int, str, datetime]] = None, encode_value: bool = True):
+    def _bind_compression_dictionary(self):
+        # Bind a *_zstd_dict value serializer to the file's trained dictionary,
+        # or back to its plain (dictionary-less) form if there is none.
+        serializer = getattr(self._value_serializer, 'serializer', self._value_serializer)
+        if serializer not in serializers.dict_serializers:
+            return
+
+        payload = self._read_reserved_key(utils.compression_dict_key_hash)
+        if payload is None:
+            self._value_serializer = serializer
+        else:
+            level = int.from_bytes(payload[:1], 'little', signed=True)
+            self._value_serializer = serializers.BoundZstdDict(serializer, payload[1:], level)
+
+
+    def train_compression_dictionary(self, sample_size: int = 10000, dict_size: int = 2**16, level: int = 3, recompress: bool = False) -> int:
         """
-        Set a key/value pair.
+        Train a zstd dictionary on a sample of the stored values and use it
+        for every value written from now on. Requires one of the dictionary
+        value serializers ('zstd_dict', 'orjson_zstd_dict', 'msgpack_zstd_dict'
+        or 'pickle_zstd_dict'). Small, similar values (e.g. ~200-byte JSON
+        records) compress several times better with a dictionary than alone.
+
+        The dictionary and level are stored in a hidden key of the file and
+        picked up transparently on reopen. A file has one dictionary: values
+        written before training stay readable (as plain zstd frames), and
+        recompress=True rewrites them with the dictionary (run prune()
+        afterwards to reclaim the old blocks).
 
         Parameters
         ----------
-        key : any
-            The key to set.
-        value : any
-            The value to set. It must serialize to exactly value_len bytes.
-        timestamp : None
-            Fixed-length booklets do not support per-key timestamps; anything
-            other than None raises ValueError.
-        encode_value : bool, optional
-            Whether to encode the value using the value_serializer.
-            Defaults to True. If False, value must be bytes.
+        sample_size : int
+            The maximum number of values to train on, spread evenly over the file.
+        dict_size : int
+            The maximum dictionary size in bytes.
+        level : int
+            The zstd compression level used with the dictionary.
+        recompress : bool
+            Rewrite the existing values with the new dictionary.
+
+        Returns
+        -------
+        int
+            The dictionary id.
         """
-        # The inherited Booklet.set writes variable-length framing (a value_len
-        # field + optional timestamp bytes) that fixed-stride iteration cannot
-        # parse - it would silently corrupt the file (same family as the
-        # set_metadata guard above).
-        if self.writable:
-            if timestamp is not None:
-                raise ValueError('Fixed-length booklets do not support timestamps.')
-            if encode_value:
-                value = self._pre_value(value)
-            else:
-                if not isinstance(value, bytes):
-                    raise TypeError('If encode_value is False, then value must be a bytes object.')
-                if len(value) != self._value_len:
-                    raise ValueError(f'Value must be exactly {self._value_len} bytes, got {len(value)}.')
-            with self._thread_lock:
-                self._mutation_count += 1
-                n_extra_keys = utils.write_data_blocks_fixed(self._file, self._pre_key(key), value, self._n_buckets, self._buffer_data, self._buffer_index, self._buffer_index_set, self._write_buffer_size, self._index_offset)
-                self._n_keys += n_extra_keys
-        else:
+        if not self.writable:
             raise ValueError('File is open for read only.')
+        if self._value_serializer not in serializers.dict_serializers:
+            if isinstance(self._value_serializer, serializers.BoundZstdDict):
+                raise ValueError('This file already has a compression dictionary.')
+            raise ValueError('A compression dictionary requires a *_zstd_dict value serializer.')
 
+        ## An even stride over the values, decompressed to the inner serializer's bytes
+        stride = max(1, len(self) // sample_size)
+        samples = []
+        for i, value in enumerate(self._iter_locked(self._make_iter_raw(False, True))):
+            if i % stride == 0:
+                if self._indirect_values:
+                    value = self._resolve_value(value)
+                samples.append(serializers.zstd.decompress(value))
+                if len(samples) == sample_size:
+                    break
 
-    def keys(self) -> Iterator[Any]:
-        """
-        Return an iterator over the booklet's keys.
+        if len(samples) < 8:
+            raise ValueError('At least 8 values are needed to train a compression dictionary.')
 
-        Same iteration semantics as the variable-length class: interleaved
-        reads are allowed, any mutation raises RuntimeError at the next step.
-        """
-        if self._mmap is not None:
-            def make_iter():
-                return utils.mmap_iter_keys_values_fixed(self._mmap, self._n_buckets, True, False, self._value_len, self._index_offset, self._first_data_block_pos)
-        else:
-            def make_iter():
-                return utils.iter_keys_values_fixed(self._file, self._n_buckets, True, False, self._value_len, self._index_offset, self._first_data_block_pos)
+        dict_data = serializers.zstd.train_dictionary(dict_size, samples, level=level)
+        self._write_reserved_key(utils.compression_dict_key_bytes, int(level).to_bytes(1, 'little', signed=True) + dict_data.as_bytes())
+        self._bind_compression_dictionary()
 
-        for key in self._iter_locked(make_iter):
-            yield self._post_key(key)
+        if recompress:
+            keys = list(self.keys())
+            for i in range(0, len(keys), utils.codec_batch_size):
+                batch = keys[i:i + utils.codec_batch_size]
+                self.update(dict(self.get_items(batch)))
 
-    def items(self) -> Iterator[Tuple[Any, Any]]:
-        """
-        Return an iterator over the booklet's (key, value) pairs.
+        return dict_data.dict_id()
 
-        Same iteration semantics as the variable-length class: interleaved
-        reads are allowed, any mutation raises RuntimeError at the next step.
-        """
-        if self._mmap is not None:
-            def make_iter():
-                return utils.mmap_iter_keys_values_fixed(self._mmap, self._n_buckets, True, True, self._value_len, self._index_offset, self._first_data_block_pos)
-        else:
-            def make_iter():
-                return utils.iter_keys_values_fixed(self._file, self._n_buckets, True, True, self._value_len, self._index_offset, self._first_data_block_pos)
 
-        for key, value in self._iter_locked(make_iter):
-            yield self._post_key(key), self._post_value(value)
+    def open_value(self, key: Any) -> io.RawIOBase:
+        """
+        Open the stored (serialized) value of key as a read-only, seekable
+        binary file object. Reads come straight from the mmap in read mode,
+        and from positional reads of the file otherwise, so the value is never
+        loaded whole. Deduplicated and blob values are followed to their
+        bytes. Raises KeyError if the key is not found.
 
-    def values(self) -> Iterator[Any]:
+        Like locations(), the object addresses the value in place: it stays
+        valid across writes to the booklet, and is invalidated by prune(),
+        clear(), compact_blobs() and closing the booklet.
         """
-        Return an iterator over the booklet's values.
+        [(gen, offset, length)] = self._value_locations([key])
+
+        with self._thread_lock:
+            if gen is None:
+                if self._mmap is not None and offset + length > len(self._mmap):
+                    self._remap()
+                    if offset + length > len(self._mmap):
+                        raise ValueError('A value lies past the end of the file; the file may be corrupt.')
+                source = self._file if self._mmap is None else self._mmap
+            elif self._mmap is None:
+                source = self._blob_file(gen)
+            else:
+                source = self._blob_mmap(gen, offset + length)
+
+        if isinstance(source, mmap.mmap):
+            def read_at(pos, n):
+                return source[pos:pos + n]
+        elif isinstance(source, io.BytesIO):
+            def read_at(pos, n):
+                with self._thread_lock:
+                    source.seek(pos)
+                    return source.read(n)
+        else:
+            def read_at(pos, n):
+                return utils.pread(source, n, pos, self._thread_lock)
+
+        return utils.ValueReader(read_at, offset, length)
+
+
+    def send_value(self, key: Any, sock_or_fd, offset: int = 0, count: Optional[int] = None) -> int:
+        """
+        Send the stored (serialized) value of key to a socket or file
+        descriptor with os.sendfile, straight from the booklet's file, so the
+        value bytes never enter Python. Deduplicated and blob values are
+        followed to their bytes. Falls back to reads and writes where
+        sendfile is not available (BytesIO booklets, platforms without it).
+        Raises KeyError if the key is not found.
+
+        Parameters
+        ----------
+        key : any
+            The key of the value to send.
+        sock_or_fd : socket or int
+            A connected socket, a file object or a file descriptor.
+        offset : int, optional
+            The position in the value to start from. Defaults to 0.
+        count : int or None, optional
+            The number of bytes to send. None (default) sends the rest of
+            the value.
+
+        Returns
+        -------
+        int
+            The number of bytes sent.
+        """
+        [location] = self._value_locations([key])
+        gen, value_offset, length = location
+        if offset < 0 or offset > length:
+            raise ValueError(f'offset must be between 0 and the value length ({length}).')
+        if count is None or count > length - offset:
+            count = length - offset
+
+        return self._send_locations([(gen, value_offset + offset, count)], sock_or_fd)
+
+
+    def send_values(self, keys: Iterable[Any], sock_or_fd) -> int:
+        """
+        Send the stored (serialized) values of keys back to back to a socket
+        or file descriptor, like send_value. All keys are looked up before
+        anything is sent, so a missing key raises KeyError without sending.
+
+        Returns
+        -------
+        int
+            The number of bytes sent.
+        """
+        return self._send_locations(self._value_locations(keys), sock_or_fd)
+
+
+    def _send_locations(self, locations: list, sock_or_fd) -> int:
+        sent = 0
+        for gen, offset, count in locations:
+            with self._thread_lock:
+                file = self._file if gen is None else self._blob_file(gen)
+            sent += utils.send_file_range(file, sock_or_fd, offset, count, self._thread_lock)
+
+        return sent
+
+
+    def _value_locations(self, keys: Iterable[Any]) -> list:
+        """
+        The (blob gen, value_offset, value_len) of the stored bytes of each
+        key, following content keys and blob pointers. The gen is None for
+        values in the booklet file. Raises KeyError if a key is not found.
+        """
+        key_hashes = [(key, utils.hash_key(self._pre_key(key))) for key in keys]
+        if any(key_hash in self._buffer_index_set for key, key_hash in key_hashes):
+            self.sync()
+
+        locations = []
+        with self._thread_lock:
+            source = self._mmap if self._mmap is not None else self._file
+            for key, key_hash in key_hashes:
+                location = utils.get_value_location(source, key_hash, self._n_buckets, self._ts_bytes_len, self._index_offset)
+                if location is False:
+                    raise KeyError(key)
+                gen = None
+                offset, length = location
+
+                if self._dedup_threshold is not None and length == utils.dedup_key_len:
+                    source.seek(offset)
+                    value = source.read(length)
+                    if utils.is_dedup_key(value):
+                        offset, length = utils.get_value_location(source, utils.hash_key(value), self._n_buckets, self._ts_bytes_len, self._index_offset)
+                        offset += utils.dedup_refcount_len
+                        length -= utils.dedup_refcount_len
+
+                if self._blob_threshold is not None and length == utils.blob_pointer_len:
+                    source.seek(offset)
+                    value = source.read(length)
+                    if utils.is_blob_pointer(value):
+                        gen, offset, length = utils.read_blob_pointer(value)
+
+                locations.append((gen, offset, length))
+
+        return locations
+
+
+    def set_stream(self, key: Any, fileobj, length: Optional[int] = None, timestamp: Optional[Union[int, str, datetime]] = None) -> int:
+        """
+        Set the value of key from a binary file object, read and written in
+        chunks so that the value is never in memory whole. The bytes are
+        stored as they are, like set() with encode_value=False, so they must
+        be in the form the value serializer reads.
+
+        Values larger than a chunk (utils.stream_chunk_size) are written
+        straight to the end of the file once the write buffer is flushed, and
+        then linked into the index; a booklet with a blob file writes them to
+        the blob file instead, which also lifts the 4 GB value size limit.
+        Streamed values are not deduplicated. Smaller values go through set().
+
+        Parameters
+        ----------
+        key : any
+            The key to set.
+        fileobj : binary file object
+            The object to read the value from, from its current position.
+        length : int or None, optional
+            The number of bytes to read. None (default) reads to the end of
+            fileobj. A stream that ends early raises ValueError.
+        timestamp : int, str, datetime, or None, optional
+            A specific timestamp to associate with the key/value pair.
+            If None (default), the current time is used.
+
+        Returns
+        -------
+        int
+            The length of the value.
+        """
+        if not self.writable:
+            raise ValueError('File is open for read only.')
+        if length is not None and (not isinstance(length, int) or length < 0):
+            raise ValueError('length must be a non-negative int or None.')
+
+        chunk_size = utils.stream_chunk_size
+        first = utils.read_chunk(fileobj, chunk_size if length is None else min(length, chunk_size))
+        if len(first) < chunk_size or length == chunk_size:
+            if length is not None and len(first) < length:
+                raise ValueError(f'The stream ended after {len(first)} of {length} bytes.')
+            self.set(key, first, timestamp, encode_value=False)
+            return len(first)
+
+        key_bytes = self._pre_key(key)
+        if self._dedup_threshold is not None:
+            with self._dedup_lock:
+                old = self._get_stored(key_bytes)
+                value_len = self._write_stream(key_bytes, first, fileobj, length, timestamp)
+                if old is not None and utils.is_dedup_key(old):
+                    self._dedup_pending.append(old)
+        else:
+            value_len = self._write_stream(key_bytes, first, fileobj, length, timestamp)
+
+        self.sync()
+
+        return value_len
+
+
+    def _write_stream(self, key_bytes: bytes, first: bytes, fileobj, length: Optional[int] = None, timestamp: Optional[Union[int, str, datetime]] = None) -> int:
+        """
+        Write a streamed value to the blob file or a new data block and link
+        it to key_bytes. Partly written values are truncated away on error.
+        """
+        if self._blob_threshold is not None:
+            with self._thread_lock:
+                gen = self._blob_gen
+                file = self._blob_file(gen)
+                offset = file.seek(0, 2)
+                try:
+                    value_len = utils.write_stream(file, first, fileobj, length)
+                except BaseException:
+                    file.truncate(offset)
+                    raise
+            self._write_values([key_bytes], [utils.blob_pointer(gen, offset, value_len)], timestamp)
+            return value_len
+
+        self.sync()
+        with self._thread_lock:
+            self._mutation_count += 1
+            file_end = self._file.seek(0, 2)
+            try:
+                data_block_pos, value_len = utils.write_data_block_stream(self._file, key_bytes, first, fileobj, length, timestamp, self._ts_bytes_len)
+            except BaseException:
+                self._file.truncate(file_end)
+                raise
+            self._buffer_index.extend(utils.hash_key(key_bytes) + utils.int_to_bytes(data_block_pos, utils.n_bytes_file))
+            self._buffer_index_set.add(utils.hash_key(key_bytes))
+            self._sync_index()
+
+        return value_len
+
+
+    def clear(self):
+        """
+        Remove all keys and values from the booklet, including any trained
+        compression dictionary and the blob files. Serializer options are
+        kept.
+        """
+        super().clear()
+        if self._serializer_options:
+            self._write_reserved_key(utils.serializer_options_key_bytes, orjson.dumps(self._serializer_options))
+        self._bind_compression_dictionary()
+        self._dedup_pending = []
+        self._dedup_offsets = {}
+        if self._dedup_threshold is not None:
+            self._write_reserved_key(utils.dedup_threshold_key_bytes, utils.int_to_bytes(self._dedup_threshold, 4))
+        if self._blob_threshold is not None:
+            with self._thread_lock:
+                self._close_blobs()
+                self._remove_blob_files()
+            self._write_reserved_key(utils.blob_key_bytes, utils.int_to_bytes(self._blob_threshold, 4) + utils.int_to_bytes(self._blob_gen, 2))
+        if self._changes_path is not None:
+            self._write_reserved_key(utils.change_index_key_bytes, b'\x01')
+            self.sync()
+            with self._thread_lock:
+                self._update_changes(reset=True)
+
+
+    def prune(self, timestamp: Optional[Union[int, str, datetime]] = None, keep_keys: Iterable[Any] = ()) -> int:
+        """
+        Prune old keys and values from the booklet. See Booklet.prune.
+        Deduplicated contents are kept while referenced, whatever their age,
+        and removed once no key references them. The change index is
+        rebuilt, as compaction moves the data blocks.
+        """
+        if self._dedup_threshold is None:
+            removed_count = super().prune(timestamp, keep_keys)
+        else:
+            with self._dedup_lock:
+                removed_count = super().prune(timestamp, keep_keys)
+                ## Compaction moved the content blocks
+                self._dedup_offsets = {}
+
+        if self._changes_path is not None:
+            with self._thread_lock:
+                self._update_changes(reset=True)
+
+        return removed_count
+
+
+    def compact_blobs(self) -> int:
+        """
+        Reclaim the blob file space of overwritten and deleted values. The
+        values still referenced are copied to a new generation of the blob
+        file, their pointers are rewritten in place, and the old blob files
+        are removed. prune() does not touch the blob files.
+
+        Returns
+        -------
+        int
+            The number of blob file bytes reclaimed.
+        """
+        if not self.writable:
+            raise ValueError('File is open for read only.')
+        if self._blob_threshold is None:
+            raise ValueError('This booklet has no blob file.')
+
+        self.sync()
+        with self._thread_lock:
+            self._mutation_count += 1
+            old_size = sum(path.stat().st_size for path in self._blob_paths())
+            new_gen = (self._blob_gen + 1) % 2**16
+            new_path = utils.blob_path(self._file_path, new_gen)
+
+            ## Pointers are values of exactly the pointer length, or the tail
+            ## of a deduplicated content block
+            value_lens = {utils.blob_pointer_len, utils.dedup_refcount_len + utils.blob_pointer_len}
+            pointers = []
+            for key, value_offset, value in utils.iter_values_by_len(self._file, self._n_buckets, value_lens, self._ts_bytes_len, self._index_offset, self._first_data_block_pos):
+                if len(value) != utils.blob_pointer_len:
+                    if not utils.is_dedup_key(key):
+                        continue
+                    value_offset += utils.dedup_refcount_len
+                    value = value[utils.dedup_refcount_len:]
+                if utils.is_blob_pointer(value):
+                    pointers.append((value_offset, value))
+
+            with io.open(new_path, 'w+b', buffering=0) as new_file:
+                for value_offset, pointer in pointers:
+                    gen, offset, length = utils.read_blob_pointer(pointer)
+                    new_offset = new_file.seek(0, 2)
+                    utils.copy_file_range(self._blob_file(gen), new_file, length, offset, new_offset, self._write_buffer_size)
+                    self._file.seek(value_offset)
+                    self._file.write(utils.blob_pointer(new_gen, new_offset, length))
+                new_size = new_file.seek(0, 2)
+                os.fsync(new_file.fileno())
+
+            ## New values go to the new generation from here on
+            self._close_blobs()
+            self._blob_gen = new_gen
+
+        self._write_reserved_key(utils.blob_key_bytes, utils.int_to_bytes(self._blob_threshold, 4) + utils.int_to_bytes(new_gen, 2))
+        with self._thread_lock:
+            self._remove_blob_files(keep=new_gen)
+
+        return old_size - new_size
+
+
+    def _blob_paths(self):
+        name = self._file_path.name + '.'
+        for path in self._file_path.parent.iterdir():
+            if path.name.startswith(name) and path.name.endswith('.blob') and path.name[len(name):-5].isdigit():
+                yield path
+
+
+    def _remove_blob_files(self, keep=None):
+        # Must be called under _thread_lock.
+        for gen in [gen for gen in self._blob_files if gen != keep]:
+            mm = self._blob_mmaps.pop(gen, None)
+            if mm is not None:
+                mm.close()
+            self._blob_files.pop(gen).close()
+        keep_path = None if keep is None else utils.blob_path(self._file_path, keep)
+        for path in list(self._blob_paths()):
+            if path != keep_path:
+                path.unlink()
+
+
+    def close(self):
+        """
+        Sync and close the booklet file and its blob files.
+        """
+        super().close()
+        self._close_blobs()
+
+
+### Alias
+# VariableValue = Booklet
+
+
+#######################################################
+### Fixed length value Booklet
+
+
+class FixedLengthValue(Booklet):
+    """
+    Open a persistent dictionary for reading and writing. This class required a globally fixed value length. For example, this can be used for fixed length hashes or timestamps. On creation of the file, the serializers will be written to the file. Any subsequent reads and writes do not need to be opened with any parameters other than file_path and flag.
+
+    Parameters
+    -----------
+    file_path : str or pathlib.Path
+        It must be a path to a local file location. If you want to use a tempfile, then use the name from the NamedTemporaryFile initialized class.
+
+    flag : str
+        Flag associated with how the file is opened according to the dbm style. See below for details.
+
+    key_serializer : str, class, or None
+        The serializer to use to convert the input value to bytes. Run the booklet.available_serializers to determine the internal serializers that are available. None will require bytes as input. A custom serializer class can also be used. If the objects can be serialized to json, then use orjson or msgpack. They are super fast and you won't have the pickle issues.
+        If a custom class is passed, then it must have dumps and loads methods.
+
+    value_len : int
+        The number of bytes that all values will have.
+
+    buffer_size : int
+        The buffer memory size in bytes used for writing. Writes are first written to a block of memory, then once the buffer if filled up it writes to disk. This is to reduce the number of writes to disk and consequently the CPU write overhead.
+        This is only used when the file is open for writing.
+
+    codec_threads : int or None
+        Number of threads for batch value encodes/decodes. See VariableLengthValue.
+
+    Returns
+    -------
+    Booklet
+
+    The optional *flag* argument can be:
+
+    +---------+-------------------------------------------+
+    | Value   | Meaning                                   |
+    +=========+===========================================+
+    | ``'r'`` | Open existing database for reading only   |
+    |         | (default)                                 |
+    +---------+-------------------------------------------+
+    | ``'w'`` | Open existing database for reading and    |
+    |         | writing                                   |
+    +---------+-------------------------------------------+
+    | ``'c'`` | Open database for reading and writing,    |
+    |         | creating it if it doesn't exist           |
+    +---------+-------------------------------------------+
+    | ``'n'`` | Always create a new, empty database, open |
+    |         | for reading and writing                   |
+    +---------+-------------------------------------------+
+
+    """
+    def __init__(self, file_path: Union[str, pathlib.Path, io.BytesIO], flag: str = "r", key_serializer: Optional[Union[str, Any]] = None, value_len: Optional[int] = None, n_buckets: int=12007, buffer_size: int = 2**22, init_bytes: Optional[bytes] = None, timeout: Optional[float] = None, codec_threads: Optional[int] = None):
+        """
+        Initialize a FixedLengthValue booklet.
+
+        Parameters
+        ----------
+        file_path : str, pathlib.Path, or io.BytesIO
+            Path to the booklet file or a BytesIO object.
+        flag : str, optional
+            Mode to open the file ('r', 'w', 'c', 'n'). Defaults to 'r'.
+        key_serializer : str, class, or None, optional
+            Serializer for keys. Defaults to None (bytes).
+        value_len : int, optional
+            Fixed length of values in bytes. Required for new files.
+        n_buckets : int, optional
+            Initial number of hash buckets. Defaults to 12007.
+        buffer_size : int, optional
+            Write buffer size in bytes. Defaults to 4MB (2**22).
+        init_bytes : bytes, optional
+            Initial bytes to write to a new file. Defaults to None.
+        timeout : float, optional
+            Seconds to wait for the OS file lock. None (default) waits
+            indefinitely (warning if the wait is long); a number raises
+            LockTimeoutError if the lock isn't acquired in time.
+        codec_threads : int, optional
+            Number of threads for batch value encodes/decodes. Defaults to
+            None (serial).
+        """
+        self._defer_reindex = False
+        self._codec_threads = codec_threads
+        self._codec_pool = None
+        utils.init_files_fixed(self, file_path, flag, key_serializer, value_len, n_buckets, buffer_size, init_bytes, timeout)
+
+
+    def set_metadata(self, data: Any, timestamp: Optional[Union[int, str, datetime]] = None):
+        """
+        Not supported on fixed-length booklets.
+        """
+        # The base-class metadata write goes through the variable-length block
+        # writer, whose framing (per-entry value length) fixed-stride iteration
+        # cannot parse - a single metadata write silently corrupts keys()/items()
+        # for the whole file. Fail loud instead.
+        raise NotImplementedError(
+            'Metadata is not supported on fixed-length booklets: the metadata write '
+            'path would corrupt fixed-stride iteration. Use a variable-length booklet '
+            'if you need metadata.'
+        )
+
+    def set_reserved(self, slot: int, data: bytes, timestamp: Optional[Union[int, str, datetime]] = None):
+        """
+        Not supported on fixed-length booklets.
+        """
+        # Same reason as set_metadata: the variable-length block framing would
+        # corrupt fixed-stride iteration. (get_reserved stays inherited - it
+        # harmlessly returns None on a file that can never hold a slot.)
+        raise NotImplementedError(
+            'Reserved slots are not supported on fixed-length booklets: the write '
+            'path would corrupt fixed-stride iteration. Use a variable-length booklet.'
+        )
+
+    def locations(self) -> Iterator[Tuple[Any, Optional[int], int, int]]:
+        """
+        Return an iterator of (key, None, value_offset, value_len) for every
+        live key, from a scan of the block headers and keys (value_len is the
+        file's value_len). Fixed-length files have no timestamps.
+
+        Same contract as Booklet.locations(), except that fixed-length
+        overwrites are always in place: a captured offset addresses the
+        key's current value, and after a delete it may address the value of
+        a new key that recycled the slot. prune() and clear() invalidate it.
+        """
+        if self._mmap is not None:
+            def make_iter():
+                return utils.mmap_iter_locations_fixed(self._mmap, self._n_buckets, self._value_len, self._index_offset, self._first_data_block_pos)
+        else:
+            def make_iter():
+                return utils.iter_locations_fixed(self._file, self._n_buckets, self._value_len, self._index_offset, self._first_data_block_pos)
+
+        for key, ts_int, value_offset, value_len in self._iter_locked(make_iter):
+            yield self._post_key(key), ts_int, value_offset, value_len
+
+
+    def _recyclable_slots(self):
+        # Slot recycling writes new keys into the middle of the data region.
+        # map() scans that region while writing (see _iter_items_unlocked), so
+        # new keys append while it runs - a recycled slot ahead of its cursor
+        # would be handed back to the scan as if it were an original item.
+        if self._defer_reindex:
+            return None
+        return self._free_slots
+
+
+    def _pre_value(self, value: Any) -> bytes:
+        # Fixed-stride iteration derives every block boundary from value_len -
+        # a value of any other length silently corrupts the whole scan, so
+        # validate centrally for every write entry point that serializes.
+        value = super()._pre_value(value)
+        if len(value) != self._value_len:
+            raise ValueError(f'Value must serialize to exactly {self._value_len} bytes, got {len(value)}.')
+        return value
+
+    def _pre_values(self, values: list) -> list:
+        values = super()._pre_values(values)
+        for value in values:
+            if len(value) != self._value_len:
+                raise ValueError(f'Value must serialize to exactly {self._value_len} bytes, got {len(value)}.')
+        return values
+
+    def _make_iter_raw(self, include_key: bool, include_value: bool):
+        if self._mmap is not None:
+            def make_iter():
+                return utils.mmap_iter_keys_values_fixed(self._mmap, self._n_buckets, include_key, include_value, self._value_len, self._index_offset, self._first_data_block_pos)
+        else:
+            def make_iter():
+                return utils.iter_keys_values_fixed(self._file, self._n_buckets, include_key, include_value, self._value_len, self._index_offset, self._first_data_block_pos)
+
+        return make_iter
+
+
+    def set(self, key: Any, value: Any, timestamp: Optional[Union[int, str, datetime]] = None, encode_value: bool = True):
+        """
+        Set a key/value pair.
+
+        Parameters
+        ----------
+        key : any
+            The key to set.
+        value : any
+            The value to set. It must serialize to exactly value_len bytes.
+        timestamp : None
+            Fixed-length booklets do not support per-key timestamps; anything
+            other than None raises ValueError.
+        encode_value : bool, optional
+            Whether to encode the value using the value_serializer.
+            Defaults to True. If False, value must be bytes.
+        """
+        # The inherited Booklet.set writes variable-length framing (a value_len
+        # field + optional timestamp bytes) that fixed-stride iteration cannot
+        # parse - it would silently corrupt the file (same family as the
+        # set_metadata guard above).
+        if self.writable:
+            if timestamp is not None:
+                raise ValueError('Fixed-length booklets do not support timestamps.')
+            if encode_value:
+                value = self._pre_value(value)
+            else:
+                if not isinstance(value, bytes):
+                    raise TypeError('If encode_value is False, then value must be a bytes object.')
+                if len(value) != self._value_len:
+                    raise ValueError(f'Value must be exactly {self._value_len} bytes, got {len(value)}.')
+            with self._thread_lock:
+                self._mutation_count += 1
+                n_extra_keys = utils.write_data_blocks_fixed(self._file, self._pre_key(key), value, self._n_buckets, self._buffer_data, self._buffer_index, self._buffer_index_set, self._write_buffer_size, self._index_offset, self._recyclable_slots())
+                self._n_keys += n_extra_keys
+        else:
+            raise ValueError('File is open for read only.')
+
+
+    def keys(self) -> Iterator[Any]:
+        """
+        Return an iterator over the booklet's keys.
+
+        Same iteration semantics as the variable-length class: interleaved
+        reads are allowed, any mutation raises RuntimeError at the next step.
+        """
+        if self._mmap is not None:
+            def make_iter():
+                return utils.mmap_iter_keys_values_fixed(self._mmap, self._n_buckets, True, False, self._value_len, self._index_offset, self._first_data_block_pos)
+        else:
+            def make_iter():
+                return utils.iter_keys_values_fixed(self._file, self._n_buckets, True, False, self._value_len, self._index_offset, self._first_data_block_pos)
+
+        for key in self._iter_locked(make_iter):
+            yield self._post_key(key)
+
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        """
+        Return an iterator over the booklet's (key, value) pairs.
 
         Same iteration semantics as the variable-length class: interleaved
         reads are allowed, any mutation raises RuntimeError at the next step.
         """
-        if self._mmap is not None:
-            def make_iter():
-                return utils.mmap_iter_keys_values_fixed(self._mmap, self._n_buckets, False, True, self._value_len, self._index_offset, self._first_data_block_pos)
+        if self._mmap is not None:
+            def make_iter():
+                return utils.mmap_iter_keys_values_fixed(self._mmap, self._n_buckets, True, True, self._value_len, self._index_offset, self._first_data_block_pos)
+        else:
+            def make_iter():
+                return utils.iter_keys_values_fixed(self._file, self._n_buckets, True, True, self._value_len, self._index_offset, self._first_data_block_pos)
+
+        if self._codec_threads:
+            for batch in self.iter_batches(utils.codec_batch_size, 'items'):
+                yield from batch
+            return
+
+        for key, value in self._iter_locked(make_iter):
+            yield self._post_key(key), self._post_value(value)
+
+    def values(self) -> Iterator[Any]:
+        """
+        Return an iterator over the booklet's values.
+
+        Same iteration semantics as the variable-length class: interleaved
+        reads are allowed, any mutation raises RuntimeError at the next step.
+        """
+        if self._codec_threads:
+            for batch in self.iter_batches(utils.codec_batch_size, 'values'):
+                yield from batch
+            return
+
+        if self._mmap is not None:
+            def make_iter():
+                return utils.mmap_iter_keys_values_fixed(self._mmap, self._n_buckets, False, True, self._value_len, self._index_offset, self._first_data_block_pos)
+        else:
+            def make_iter():
+                return utils.iter_keys_values_fixed(self._file, self._n_buckets, False, True, self._value_len, self._index_offset, self._first_data_block_pos)
+
+        for value in self._iter_locked(make_iter):
+            yield self._post_value(value)
+
+    def _iter_items_unlocked(self):
+        if self._buffer_index_set:
+            self.sync()
+
+        with self._thread_lock:
+            comp0 = self._compaction_count
+            file_end = self._file.seek(0, 2)
+            n_buckets = self._n_buckets
+            index_offset = self._index_offset
+            first_data_block_pos = self._first_data_block_pos
+            value_len = self._value_len
+
+        if first_data_block_pos == 0:
+            first_data_block_pos = utils.sub_index_init_pos + (n_buckets * utils.n_bytes_file)
+
+        one_extra_index_bytes_len = utils.key_hash_len + utils.n_bytes_file
+        init_data_block_len = one_extra_index_bytes_len + utils.n_bytes_key
+
+        if index_offset != utils.sub_index_init_pos:
+            regions = [
+                (first_data_block_pos, index_offset),
+                (index_offset + n_buckets * utils.n_bytes_file, file_end),
+            ]
+        else:
+            regions = [(first_data_block_pos, file_end)]
+
+        for start, end in regions:
+            pos = start
+            while pos < end:
+                with self._thread_lock:
+                    if self._compaction_count != comp0:
+                        raise RuntimeError('booklet compacted (prune/clear) during map() iteration')
+                    self._file.seek(pos)
+                    header = self._file.read(init_data_block_len)
+                    next_ptr = utils.bytes_to_int(
+                        header[utils.key_hash_len:one_extra_index_bytes_len]
+                    )
+                    key_len = utils.bytes_to_int(header[one_extra_index_bytes_len:])
+
+                    if next_ptr:
+                        kv = self._file.read(key_len + value_len)
+                        key_bytes = kv[:key_len]
+                        value_bytes = kv[key_len:]
+                    else:
+                        key_bytes = None
+                        value_bytes = None
+
+                pos += init_data_block_len + key_len + value_len
+
+                if key_bytes is not None:
+                    yield self._post_key(key_bytes), self._post_value(value_bytes)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """
+        Return the value for key if key is in the booklet, else default.
+
+        Parameters
+        ----------
+        key : any
+            The key to look up.
+        default : any, optional
+            The value to return if the key is not found. Defaults to None.
+
+        Returns
+        -------
+        any
+            The value associated with the key, or the default value.
+        """
+        value = self._get_bytes(key)
+
+        if value is not None:
+            return self._post_value(value)
         else:
-            def make_iter():
-                return utils.iter_keys_values_fixed(self._file, self._n_buckets, False, True, self._value_len, self._index_offset, self._first_data_block_pos)
+            return default
 
-        for value in self._iter_locked(make_iter):
-            yield self._post_value(value)
+    def _get_bytes(self, key: Any) -> Optional[bytes]:
+        key_bytes = self._pre_key(key)
+        key_hash = utils.hash_key(key_bytes)
+
+        if key_hash in self._buffer_index_set:
+            self.sync()
+
+        with self._thread_lock:
+            if self._mmap is not None:
+                value = self._mmap_read(utils.mmap_get_value_fixed, key_hash, self._n_buckets, self._value_len, self._index_offset)
+            else:
+                value = utils.get_value_fixed(self._file, key_hash, self._n_buckets, self._value_len, self._index_offset)
+
+        if isinstance(value, bytes):
+            return value
+        else:
+            return None
+
+    # def __len__(self):
+    #     return self._n_keys
+
+    def update(self, key_value_dict: MutableMapping):
+        """
+        Update the booklet with key/value pairs from another mapping.
+
+        Parameters
+        ----------
+        key_value_dict : MutableMapping
+            A mapping of key/value pairs to add to the booklet.
+        """
+        if self.writable:
+            items = list(key_value_dict.items())
+            value_bytes = self._pre_values([value for key, value in items])
+            with self._thread_lock:
+                self._mutation_count += 1
+                for (key, _), value in zip(items, value_bytes):
+                    n_extra_keys = utils.write_data_blocks_fixed(self._file, self._pre_key(key), value, self._n_buckets, self._buffer_data, self._buffer_index, self._buffer_index_set, self._write_buffer_size, self._index_offset, self._recyclable_slots())
+                    self._n_keys += n_extra_keys
+
+        else:
+            raise ValueError('File is open for read only.')
+
+
+    def get_array(self, keys: Iterable[Any], out=None):
+        """
+        Get the values of many keys into a NumPy array. Requires numpy.
+
+        Bucket selection, chain walks and the value gather are vectorized
+        over a byte view of the file; only key serialization and hashing
+        run per key.
+
+        Parameters
+        ----------
+        keys : iterable
+            The keys to look up.
+        out : numpy.ndarray, optional
+            A preallocated C-contiguous array with one row of value_len bytes
+            per key: a (n, value_len) uint8 array or e.g. a structured array
+            whose itemsize is value_len. Defaults to a new (n, value_len)
+            uint8 array of zeros.
+
+        Returns
+        -------
+        tuple
+            (out, found): the filled array and a boolean mask of the keys that
+            were found. Rows of missing keys are left untouched.
+        """
+        from . import arrays
 
-    def _iter_items_unlocked(self):
         if self._buffer_index_set:
             self.sync()
 
+        key_bytes_list = [self._pre_key(key) for key in keys]
+        n = len(key_bytes_list)
+        if out is None:
+            out = arrays.np.zeros((n, self._value_len), arrays.np.uint8)
+        out_rows = arrays.value_rows(out, n, self._value_len, 'out')
+
         with self._thread_lock:
-            comp0 = self._compaction_count
-            file_end = self._file.seek(0, 2)
-            n_buckets = self._n_buckets
-            index_offset = self._index_offset
-            first_data_block_pos = self._first_data_block_pos
-            value_len = self._value_len
+            buf = arrays.file_view(self._file, self._mmap)
+            found = arrays.get_array_fixed(buf, key_bytes_list, out_rows, self._n_buckets, self._value_len, self._index_offset)
 
-        if first_data_block_pos == 0:
-            first_data_block_pos = utils.sub_index_init_pos + (n_buckets * utils.n_bytes_file)
+        return out, found
+
+
+    def set_array(self, keys: Iterable[Any], values):
+        """
+        Set many keys at once from a NumPy array. Requires numpy.
+
+        Existing keys are overwritten in place. New keys are written as one
+        block array with a single append and linked into the hash index with
+        vectorized operations; the bucket index is grown up front if the
+        batch would overload it. Duplicate keys resolve like sequential
+        set() calls (the last value wins).
+
+        Parameters
+        ----------
+        keys : iterable
+            The keys to set.
+        values : numpy.ndarray
+            A C-contiguous array with one row of value_len bytes per key: a
+            (n, value_len) uint8 array or e.g. a structured array whose
+            itemsize is value_len.
+        """
+        if self.writable:
+            from . import arrays
+
+            key_bytes_list = [self._pre_key(key) for key in keys]
+            rows = arrays.value_rows(values, len(key_bytes_list), self._value_len)
+
+            self.sync()
+
+            with self._thread_lock:
+                self._mutation_count += 1
+
+                hashes = arrays.hash_keys(key_bytes_list)
+                keep = arrays.dedupe_last(hashes)
+                hashes = hashes[keep]
+                key_bytes_list = [key_bytes_list[i] for i in keep]
+                rows = rows[keep]
+
+                buf = arrays.file_view(self._file)
+                value_pos = arrays.find_all_value_positions(buf, hashes, self._n_buckets, self._index_offset)
+                del buf
+
+                ## Data blocks never move on reindex, so value_pos stays valid
+                self._check_auto_reindex(self._n_keys + int((value_pos == 0).sum()))
+
+                self._n_keys += arrays.set_array_fixed(self._file, key_bytes_list, hashes, value_pos, rows, self._n_buckets, self._value_len, self._index_offset)
+
+            self.sync()
+        else:
+            raise ValueError('File is open for read only.')
+
+
+    def as_numpy(self, dtype=None, live_only: bool = False):
+        """
+        A structured NumPy view of the data blocks, straight over the file's
+        mmap (no copy). Requires numpy and a booklet opened in read mode.
+
+        The fields are key_hash (V13), next_ptr ((6,) uint8; a block is live
+        unless all six bytes are zero), key_len (uint16), key and value. All
+        blocks must share one key length, as they do with the fixed-width
+        integer key serializers, whose keys are given their integer dtype.
+
+        Parameters
+        ----------
+        dtype : numpy dtype, optional
+            The dtype of the value field, e.g. '<u8' or a structured dtype;
+            its itemsize must equal value_len. Defaults to (value_len,) uint8.
+        live_only : bool
+            Only return the live blocks. This indexes with the liveness mask,
+            so the result is a copy.
+
+        Returns
+        -------
+        numpy.ndarray
+            The view is read-only and zero-copy when the data blocks form one
+            uniform run; otherwise (a relocated index, or reindex skip blocks
+            in the data region) the runs are concatenated into a copy.
+        """
+        if self._mmap is None:
+            raise ValueError('as_numpy requires the booklet to be opened in read mode.')
+
+        from . import arrays
+
+        np = arrays.np
+
+        if dtype is None:
+            dtype = np.dtype((np.uint8, (self._value_len,)))
+        else:
+            dtype = np.dtype(dtype)
+            if dtype.itemsize != self._value_len:
+                raise ValueError(f'The itemsize of dtype must be value_len ({self._value_len}), got {dtype.itemsize}.')
+
+        buf = arrays.file_view(self._file, self._mmap)
+        regions = arrays.fixed_data_regions(self._n_buckets, self._index_offset, self._first_data_block_pos, len(buf))
+        key_len = arrays.first_live_key_len(buf, regions, self._value_len)
+        if key_len is None:
+            key_len = 0
+
+        record_dtype = arrays.fixed_record_dtype(arrays.key_dtype(self._key_serializer, key_len), dtype)
+        segments = arrays.fixed_record_segments(buf, regions, record_dtype, self._value_len)
+
+        if not segments:
+            arr = np.zeros(0, record_dtype)
+        elif len(segments) == 1:
+            arr = segments[0]
+        else:
+            arr = np.concatenate(segments)
+
+        ## Stepped-over blocks are fine if dead; a live one means mixed key lengths
+        live = arr['next_ptr'].any(axis=1)
+        if int(live.sum()) != self._n_keys:
+            raise ValueError('The data blocks do not share one key length, so they cannot be viewed as a single array.')
+
+        if live_only:
+            return arr[live]
+
+        return arr
+
+
+    def prune(self) -> int:
+        """
+        Prune old keys and values from the booklet.
+
+        This method removes overwritten or deleted entries, potentially reclaiming 
+        disk space and improving performance.
+
+        Returns
+        -------
+        int
+            The number of removed items.
+        """
+        self.sync()
+
+        if self.writable:
+            with self._thread_lock:
+                self._mutation_count += 1
+                self._compaction_count += 1
+                utils.bump_file_compactions(self._file)
+                n_keys, removed_count, new_index_offset = utils.prune_file_fixed(self._file, self._n_buckets, self._n_bytes_file, self._n_bytes_key, self._value_len, self._write_buffer_size, self._buffer_data, self._buffer_index, self._buffer_index_set, self._index_offset, self._first_data_block_pos)
+                self._n_keys = n_keys
+                self._file.seek(self._n_keys_pos)
+                self._file.write(utils.int_to_bytes(self._n_keys, 4))
+
+                self._free_slots.clear()
+
+                # Mirror the post-prune layout written by prune_file_fixed: non-empty -> relocated index
+                # (data at byte 200, index at new_index_offset); empty -> standard cleared layout.
+                if new_index_offset:
+                    self._index_offset = new_index_offset
+                    self._first_data_block_pos = utils.sub_index_init_pos
+                else:
+                    self._index_offset = utils.sub_index_init_pos
+                    self._first_data_block_pos = utils.sub_index_init_pos + (self._n_buckets * utils.n_bytes_file)
+
+                self._file.flush()
+
+                return removed_count
+        else:
+            raise ValueError('File is open for read only.')
+
+
+    def __getitem__(self, key: Any) -> Any:
+        """
+        Return the value for key. Raises KeyError if not found.
+        """
+        value = self.get(key)
+
+        if value is None:
+            raise KeyError(key)
+        else:
+            return value
+
+
+    def __delitem__(self, key: Any):
+        """
+        Remove key from the booklet. Raises KeyError if not found.
+
+        The freed slot goes on a persistent free-list and is reused by the next
+        new key of the same key length, so churn does not grow the file.
+        """
+        if self.writable:
+            if self._buffer_index_set:
+                self.sync()
+
+            key_hash = utils.hash_key(self._pre_key(key))
+
+            with self._thread_lock:
+                data_block_pos = utils.assign_delete_flag(self._file, key_hash, self._n_buckets, self._index_offset)
+                if data_block_pos:
+                    self._mutation_count += 1
+                    utils.push_free_slot_fixed(self._file, self._free_slots, data_block_pos)
+                    self._n_keys -= 1
+                    self._file.seek(self._n_keys_pos)
+                    self._file.write(utils.int_to_bytes(self._n_keys, 4))
+                else:
+                    raise KeyError(key)
+        else:
+            raise ValueError('File is open for read only.')
+
+
+    def clear(self):
+        """
+        Remove all keys and values from the booklet.
+        """
+        super().clear()
+        with self._thread_lock:
+            self._free_slots.clear()
+            utils.write_free_slots_fixed(self._file, self._free_slots)
+
+
+    def __setitem__(self, key: Any, value: Any):
+        """
+        Set key to value.
+        """
+        # Delegates to the fixed-framing set() above (which validates the
+        # value length and bumps the mutation counter).
+        self.set(key, value)
+
+
+#######################################################
+### Dense fixed length value Booklet
+
+
+class DenseFixedLengthValue(FixedLengthValue):
+    """
+    A fixed-length booklet for dense unsigned integer keys. Records are directly addressed: the record of key k (a presence byte followed by the value) sits at a fixed offset of k * (1 + value_len) after the header, so lookups and writes are pure offset arithmetic with no hashing, bucket index or chains. Overwrites and deletes are always in place.
+
+    The file size is proportional to the largest key written, not to the number of keys (unwritten keys are sparse holes on filesystems that support them), so this layout suits keys that are dense from 0 (row ids, sensor indexes, etc).
+
+    Parameters
+    -----------
+    file_path : str or pathlib.Path
+        It must be a path to a local file location. If you want to use a tempfile, then use the name from the NamedTemporaryFile initialized class.
+
+    flag : str
+        Flag associated with how the file is opened according to the dbm style. See FixedLengthValue for details.
+
+    key_serializer : str
+        One of the unsigned integer serializers: 'uint1', 'uint2', 'uint4', 'uint5' or 'uint8'. Defaults to 'uint4'.
+
+    value_len : int
+        The number of bytes that all values will have.
+
+    buffer_size : int
+        The read chunk size in bytes used when iterating.
+
+    Returns
+    -------
+    Booklet
+    """
+    def __init__(self, file_path: Union[str, pathlib.Path, io.BytesIO], flag: str = "r", key_serializer: str = 'uint4', value_len: Optional[int] = None, buffer_size: int = 2**22, init_bytes: Optional[bytes] = None, timeout: Optional[float] = None):
+        """
+        Initialize a DenseFixedLengthValue booklet.
+
+        Parameters
+        ----------
+        file_path : str, pathlib.Path, or io.BytesIO
+            Path to the booklet file or a BytesIO object.
+        flag : str, optional
+            Mode to open the file ('r', 'w', 'c', 'n'). Defaults to 'r'.
+        key_serializer : str, optional
+            Unsigned integer serializer for keys. Defaults to 'uint4'.
+        value_len : int, optional
+            Fixed length of values in bytes. Required for new files.
+        buffer_size : int, optional
+            Read chunk size in bytes for iteration. Defaults to 4MB (2**22).
+        init_bytes : bytes, optional
+            Initial bytes to write to a new file. Defaults to None.
+        timeout : float, optional
+            Seconds to wait for the OS file lock. None (default) waits
+            indefinitely (warning if the wait is long); a number raises
+            LockTimeoutError if the lock isn't acquired in time.
+        """
+        if key_serializer not in utils.dense_key_serializers:
+            raise ValueError('key_serializer must be one of {}.'.format(', '.join(utils.dense_key_serializers)))
 
-        one_extra_index_bytes_len = utils.key_hash_len + utils.n_bytes_file
-        init_data_block_len = one_extra_index_bytes_len + utils.n_bytes_key
+        self._defer_reindex = False
+        self._codec_threads = None
+        self._codec_pool = None
+        utils.init_files_fixed(self, file_path, flag, key_serializer, value_len, 0, buffer_size, init_bytes, timeout, dense=True)
+        self._record_len = 1 + self._value_len
+        self._max_key = 256**len(self._key_serializer.dumps(0)) - 1
+        self._max_record_key = min(self._max_key, utils.dense_max_records - 1)
+
+
+    def _record_pos(self, key: Any, write: bool = False) -> Optional[int]:
+        # The key serializer validates the type and range (e.g. negative keys
+        # raise OverflowError) exactly as for a hashed booklet. Keys past the
+        # record limit raise OverflowError on writes and are absent (None)
+        # otherwise.
+        key_int = int.from_bytes(self._key_serializer.dumps(key), 'little')
+        if key_int > self._max_record_key:
+            if write:
+                raise OverflowError(f'Dense keys must be at most {self._max_record_key}.')
+            return None
+        return utils.sub_index_init_pos + (key_int * self._record_len)
 
-        if index_offset != utils.sub_index_init_pos:
-            regions = [
-                (first_data_block_pos, index_offset),
-                (index_offset + n_buckets * utils.n_bytes_file, file_end),
-            ]
-        else:
-            regions = [(first_data_block_pos, file_end)]
 
-        for start, end in regions:
-            pos = start
-            while pos < end:
-                with self._thread_lock:
-                    if self._compaction_count != comp0:
-                        raise RuntimeError('booklet compacted (prune/clear) during map() iteration')
-                    self._file.seek(pos)
-                    header = self._file.read(init_data_block_len)
-                    next_ptr = utils.bytes_to_int(
-                        header[utils.key_hash_len:one_extra_index_bytes_len]
-                    )
-                    key_len = utils.bytes_to_int(header[one_extra_index_bytes_len:])
+    def _check_auto_reindex(self, n_keys=None):
+        # No bucket index to grow.
+        pass
 
-                    if next_ptr:
-                        kv = self._file.read(key_len + value_len)
-                        key_bytes = kv[:key_len]
-                        value_bytes = kv[key_len:]
-                    else:
-                        key_bytes = None
-                        value_bytes = None
 
-                pos += init_data_block_len + key_len + value_len
+    def __contains__(self, key: Any) -> bool:
+        """
+        Check if key is in the booklet.
+        """
+        return self.get(key) is not None
 
-                if key_bytes is not None:
-                    yield self._post_key(key_bytes), self._post_value(value_bytes)
 
     def get(self, key: Any, default: Any = None) -> Any:
         """
@@ -1378,25 +3381,68 @@ class FixedLengthValue(Booklet):
         any
             The value associated with the key, or the default value.
         """
-        key_bytes = self._pre_key(key)
-        key_hash = utils.hash_key(key_bytes)
+        value = self._get_bytes(key)
 
-        if key_hash in self._buffer_index_set:
-            self.sync()
+        if value is not None:
+            return self._post_value(value)
+        else:
+            return default
+
+
+    def _get_bytes(self, key: Any) -> Optional[bytes]:
+        record_pos = self._record_pos(key)
+        if record_pos is None:
+            return None
 
         with self._thread_lock:
             if self._mmap is not None:
-                value = utils.mmap_get_value_fixed(self._mmap, key_hash, self._n_buckets, self._value_len, self._index_offset)
+                value = utils.mmap_get_value_dense(self._mmap, record_pos, self._value_len)
+                if value is None:
+                    ## Past the end of the map: absent, unless the file has grown
+                    value = self._remap() and utils.mmap_get_value_dense(self._mmap, record_pos, self._value_len)
             else:
-                value = utils.get_value_fixed(self._file, key_hash, self._n_buckets, self._value_len, self._index_offset)
+                value = utils.get_value_dense(self._file, record_pos, self._value_len)
 
         if isinstance(value, bytes):
-            return self._post_value(value)
+            return value
         else:
-            return default
+            return None
+
+
+    def set(self, key: Any, value: Any, timestamp: Optional[Union[int, str, datetime]] = None, encode_value: bool = True):
+        """
+        Set a key/value pair. The record is written in place immediately.
+
+        Parameters
+        ----------
+        key : int
+            The key to set.
+        value : any
+            The value to set. It must serialize to exactly value_len bytes.
+        timestamp : None
+            Fixed-length booklets do not support per-key timestamps; anything
+            other than None raises ValueError.
+        encode_value : bool, optional
+            Whether to encode the value using the value_serializer.
+            Defaults to True. If False, value must be bytes.
+        """
+        if self.writable:
+            if timestamp is not None:
+                raise ValueError('Fixed-length booklets do not support timestamps.')
+            if encode_value:
+                value = self._pre_value(value)
+            else:
+                if not isinstance(value, bytes):
+                    raise TypeError('If encode_value is False, then value must be a bytes object.')
+                if len(value) != self._value_len:
+                    raise ValueError(f'Value must be exactly {self._value_len} bytes, got {len(value)}.')
+            record_pos = self._record_pos(key, True)
+            with self._thread_lock:
+                self._mutation_count += 1
+                self._n_keys += utils.write_value_dense(self._file, record_pos, value)
+        else:
+            raise ValueError('File is open for read only.')
 
-    # def __len__(self):
-    #     return self._n_keys
 
     def update(self, key_value_dict: MutableMapping):
         """
@@ -1408,74 +3454,263 @@ class FixedLengthValue(Booklet):
             A mapping of key/value pairs to add to the booklet.
         """
         if self.writable:
+            items = list(key_value_dict.items())
+            record_positions = [self._record_pos(key, True) for key, value in items]
+            value_bytes = self._pre_values([value for key, value in items])
             with self._thread_lock:
                 self._mutation_count += 1
-                for key, value in key_value_dict.items():
-                    n_extra_keys = utils.write_data_blocks_fixed(self._file, self._pre_key(key), self._pre_value(value), self._n_buckets, self._buffer_data, self._buffer_index, self._buffer_index_set, self._write_buffer_size, self._index_offset)
-                    self._n_keys += n_extra_keys
-
+                for record_pos, value in zip(record_positions, value_bytes):
+                    self._n_keys += utils.write_value_dense(self._file, record_pos, value)
         else:
             raise ValueError('File is open for read only.')
 
 
-    def prune(self) -> int:
+    def __delitem__(self, key: Any):
         """
-        Prune old keys and values from the booklet.
+        Remove key from the booklet. Raises KeyError if not found.
+        """
+        if self.writable:
+            record_pos = self._record_pos(key)
+            with self._thread_lock:
+                if record_pos is not None and utils.delete_value_dense(self._file, record_pos):
+                    self._mutation_count += 1
+                    self._n_keys -= 1
+                    self._file.seek(self._n_keys_pos)
+                    self._file.write(utils.int_to_bytes(self._n_keys, 4))
+                else:
+                    raise KeyError(key)
+        else:
+            raise ValueError('File is open for read only.')
 
-        This method removes overwritten or deleted entries, potentially reclaiming 
-        disk space and improving performance.
+
+    def get_array(self, keys, out=None):
+        """
+        Get the values of many integer keys into a NumPy array with one
+        vectorized gather. Requires numpy. See FixedLengthValue.get_array.
 
         Returns
         -------
-        int
-            The number of removed items.
+        tuple
+            (out, found)
         """
-        self.sync()
+        from . import arrays
+
+        keys = arrays.dense_keys(keys, self._max_key)
+        n = len(keys)
+        if out is None:
+            out = arrays.np.zeros((n, self._value_len), arrays.np.uint8)
+        out_rows = arrays.value_rows(out, n, self._value_len, 'out')
 
+        with self._thread_lock:
+            buf = arrays.file_view(self._file, self._mmap)
+            found = arrays.get_array_dense(buf, keys, out_rows, self._value_len)
+
+        return out, found
+
+
+    def set_array(self, keys, values):
+        """
+        Set many integer keys at once from a NumPy array. Requires numpy.
+        Keys spanning a compact range are written with a single write.
+        See FixedLengthValue.set_array.
+        """
         if self.writable:
+            from . import arrays
+
+            keys = arrays.dense_keys(keys, self._max_record_key)
+            rows = arrays.value_rows(values, len(keys), self._value_len)
+
             with self._thread_lock:
                 self._mutation_count += 1
-                self._compaction_count += 1
-                n_keys, removed_count, new_index_offset = utils.prune_file_fixed(self._file, self._n_buckets, self._n_bytes_file, self._n_bytes_key, self._value_len, self._write_buffer_size, self._buffer_data, self._buffer_index, self._buffer_index_set, self._index_offset, self._first_data_block_pos)
-                self._n_keys = n_keys
-                self._file.seek(self._n_keys_pos)
-                self._file.write(utils.int_to_bytes(self._n_keys, 4))
+                self._n_keys += arrays.set_array_dense(self._file, keys, rows, self._value_len)
+        else:
+            raise ValueError('File is open for read only.')
 
-                # Mirror the post-prune layout written by prune_file_fixed: non-empty -> relocated index
-                # (data at byte 200, index at new_index_offset); empty -> standard cleared layout.
-                if new_index_offset:
-                    self._index_offset = new_index_offset
-                    self._first_data_block_pos = utils.sub_index_init_pos
-                else:
-                    self._index_offset = utils.sub_index_init_pos
-                    self._first_data_block_pos = utils.sub_index_init_pos + (self._n_buckets * utils.n_bytes_file)
 
-                self._file.flush()
+    def as_numpy(self, dtype=None, live_only: bool = False):
+        """
+        A structured NumPy view of the records, straight over the file's mmap
+        (no copy). Requires numpy and a booklet opened in read mode.
 
-                return removed_count
+        Row k is the record of key k, with fields present (uint8, 1 if the
+        key is set) and value. See FixedLengthValue.as_numpy for dtype.
+        live_only returns a copy of only the set records, which drops the
+        row-to-key correspondence (use np.flatnonzero(arr['present']) for
+        the keys).
+        """
+        if self._mmap is None:
+            raise ValueError('as_numpy requires the booklet to be opened in read mode.')
+
+        from . import arrays
+
+        np = arrays.np
+
+        if dtype is None:
+            dtype = np.dtype((np.uint8, (self._value_len,)))
         else:
-            raise ValueError('File is open for read only.')
+            dtype = np.dtype(dtype)
+            if dtype.itemsize != self._value_len:
+                raise ValueError(f'The itemsize of dtype must be value_len ({self._value_len}), got {dtype.itemsize}.')
 
+        buf = arrays.file_view(self._file, self._mmap)
+        n = (len(buf) - utils.sub_index_init_pos) // self._record_len
+        arr = buf[utils.sub_index_init_pos:utils.sub_index_init_pos + n * self._record_len].view(np.dtype([('present', np.uint8), ('value', dtype)]))
 
-    def __getitem__(self, key: Any) -> Any:
+        if live_only:
+            return arr[arr['present'] == 1]
+
+        return arr
+
+
+    def keys(self) -> Iterator[Any]:
         """
-        Return the value for key. Raises KeyError if not found.
+        Return an iterator over the booklet's keys in ascending order.
+
+        Same iteration semantics as FixedLengthValue.keys().
         """
-        value = self.get(key)
+        for key, value in self._iter_dense():
+            yield key
 
-        if value is None:
-            raise KeyError(key)
+
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        """
+        Return an iterator over the booklet's (key, value) pairs in ascending key order.
+        """
+        for key, value in self._iter_dense():
+            yield key, self._post_value(value)
+
+
+    def values(self) -> Iterator[Any]:
+        """
+        Return an iterator over the booklet's values in ascending key order.
+        """
+        for key, value in self._iter_dense():
+            yield self._post_value(value)
+
+
+    def _make_iter_raw(self, include_key: bool, include_value: bool):
+        if self._mmap is not None:
+            def make_iter():
+                return utils.mmap_iter_keys_values_dense(self._mmap, self._value_len, include_key, include_value)
         else:
-            return value
+            def make_iter():
+                return utils.iter_keys_values_dense(self._file, self._value_len, include_key, include_value, self._write_buffer_size)
 
+        return make_iter
 
-    def __setitem__(self, key: Any, value: Any):
+
+    def _post_keys(self, keys: list) -> list:
+        # The dense scan yields keys as ints already
+        return keys
+
+
+    def get_metadata(self, include_timestamp: bool = False):
         """
-        Set key to value.
+        Not supported on dense booklets.
         """
-        # Delegates to the fixed-framing set() above (which validates the
-        # value length and bumps the mutation counter).
-        self.set(key, value)
+        # The inherited read hashes into a bucket index that dense files do
+        # not have (n_buckets is 0) and would fail with ZeroDivisionError.
+        raise NotImplementedError('Metadata is not supported on dense booklets.')
+
+
+    def get_reserved(self, slot: int, include_timestamp: bool = False):
+        """
+        Not supported on dense booklets.
+        """
+        raise NotImplementedError('Reserved slots are not supported on dense booklets.')
+
+
+    def partitions(self, n: int) -> list:
+        """
+        Not implemented for dense booklets.
+        """
+        raise NotImplementedError('partitions() is not implemented for dense booklets.')
+
+
+    def raw_items(self, key_prefix: Optional[bytes] = None, key_filter=None, since_ts=None, until_ts=None, decode: bool = False):
+        """
+        Not implemented for dense booklets, whose keys are record numbers
+        rather than stored bytes.
+        """
+        raise NotImplementedError('raw_items() is not implemented for dense booklets.')
+
+
+    def locations(self) -> Iterator[Tuple[Any, Optional[int], int, int]]:
+        """
+        Return an iterator of (key, None, value_offset, value_len) for every
+        present key in ascending order. Dense files have no timestamps.
+
+        Same signature and contract as Booklet.locations(), except that the
+        record of key k sits at a fixed offset: a captured offset always
+        addresses the key's current value (a deleted key's offset addresses
+        its next value if it is written again) and stays valid until clear().
+        """
+        for key in self._iter_locked(self._make_iter_raw(True, False)):
+            yield key, None, utils.sub_index_init_pos + (key * self._record_len) + 1, self._value_len
+
+
+    def _iter_dense(self):
+        # (key, value) pairs for keys()/items()/values(); values are sliced
+        # from the same chunk read, so there is nothing to save by skipping them.
+        if self._mmap is not None:
+            def make_iter():
+                return utils.mmap_iter_keys_values_dense(self._mmap, self._value_len, True, True)
+        else:
+            def make_iter():
+                return utils.iter_keys_values_dense(self._file, self._value_len, True, True, self._write_buffer_size)
+
+        return self._iter_locked(make_iter)
+
+
+    def _iter_items_unlocked(self):
+        with self._thread_lock:
+            comp0 = self._compaction_count
+            file_end = self._file.seek(0, 2)
+
+        n = (file_end - utils.sub_index_init_pos) // self._record_len
+        for key in range(n):
+            record_pos = utils.sub_index_init_pos + (key * self._record_len)
+            with self._thread_lock:
+                if self._compaction_count != comp0:
+                    raise RuntimeError('booklet compacted (prune/clear) during map() iteration')
+                value = utils.get_value_dense(self._file, record_pos, self._value_len)
+
+            if isinstance(value, bytes):
+                yield key, self._post_value(value)
+
+
+    def prune(self) -> int:
+        """
+        Dense booklets have no dead blocks (overwrites and deletes are in place), so there is nothing to prune.
+
+        Returns
+        -------
+        int
+            Always 0.
+        """
+        if self.writable:
+            self.sync()
+            return 0
+        else:
+            raise ValueError('File is open for read only.')
+
+
+    def clear(self):
+        """
+        Remove all keys and values from the booklet.
+        """
+        if self.writable:
+            with self._thread_lock:
+                self._mutation_count += 1
+                self._compaction_count += 1
+                utils.bump_file_compactions(self._file)
+                self._file.truncate(utils.sub_index_init_pos)
+                self._n_keys = 0
+                self._file.seek(self._n_keys_pos)
+                self._file.write(utils.int_to_bytes(self._n_keys, 4))
+                self._file.flush()
+        else:
+            raise ValueError('File is open for read only.')
 
 
 #####################################################
@@ -1483,7 +3718,7 @@ class FixedLengthValue(Booklet):
 
 
 def open(
-    file_path: Union[str, pathlib.Path, io.BytesIO], flag: str = "r", key_serializer: Optional[Union[str, Any]] = None, value_serializer: Optional[Union[str, Any]] = None, n_buckets: int=12007, buffer_size: int = 2**22, init_timestamps: bool = True, init_bytes: Optional[bytes] = None, timeout: Optional[float] = None) -> VariableLengthValue:
+    file_path: Union[str, pathlib.Path, io.BytesIO], flag: str = "r", key_serializer: Optional[Union[str, Tuple[str, dict], Any]] = None, value_serializer: Optional[Union[str, Tuple[str, dict], Any]] = None, n_buckets: int=12007, buffer_size: int = 2**22, init_timestamps: bool = True, init_bytes: Optional[bytes] = None, timeout: Optional[float] = None, overwrite_in_place: bool = False, codec_threads: Optional[int] = None, dedup_threshold: Optional[int] = None, blob_threshold: Optional[int] = None, change_index: bool = False) -> VariableLengthValue:
     """
     Open a persistent dictionary for reading and writing.
 
@@ -1508,8 +3743,11 @@ def open(
         None (default) will require bytes as input. 
         Supported built-in serializers: 'str', 'pickle', 'json', 'orjson', 
         'uint1', 'int1', etc.
-    value_serializer : str, class, or None, optional
-        Similar to the key_serializer, except for the values.
+    value_serializer : str, class, tuple, or None, optional
+        Similar to the key_serializer, except for the values. Either
+        serializer can also be a (name, options) tuple, e.g.
+        ('zstd', {'level': 9, 'threads': 4}); the options are stored in
+        the file and restored on reopen.
     n_buckets : int, optional
         The number of hash buckets to use in the indexing. 
         Defaults to 12007.
@@ -1523,10 +3761,94 @@ def open(
         Seconds to wait for the OS file lock. None (default) waits
         indefinitely (warning if the wait is long); a number raises
         LockTimeoutError if the lock isn't acquired in time.
+    overwrite_in_place : bool, optional
+        Rewrite overwrites whose new value is no larger than the stored one
+        inside the existing block instead of appending a new block.
+        Defaults to False.
+    codec_threads : int, optional
+        Number of threads for batch value encodes (update) and decodes
+        (items, values, get_items, iter_batches), for serializers whose
+        codecs release the GIL. Defaults to None (serial).
+    dedup_threshold : int, optional
+        Store serialized values of at least this many bytes once per
+        distinct content, with the keys holding a reference to it. Set on
+        file creation and stored in the file. Defaults to None (off).
+    blob_threshold : int, optional
+        Store serialized values of at least this many bytes in a companion
+        blob file, with the booklet holding a pointer to them. Set on file
+        creation and stored in the file. Defaults to None (off).
+    change_index : bool, optional
+        Keep a timestamp-ordered index of the data blocks in a companion
+        file for changed_since(). Stored in the file. Defaults to False.
 
     Returns
     -------
     Booklet
         A Booklet object (specifically a VariableLengthValue instance).
     """
-    return VariableLengthValue(file_path, flag, key_serializer, value_serializer, n_buckets, buffer_size, init_timestamps, init_bytes, timeout)
+    return VariableLengthValue(file_path, flag, key_serializer, value_serializer, n_buckets, buffer_size, init_timestamps, init_bytes, timeout, overwrite_in_place, codec_threads, dedup_threshold, blob_threshold, change_index)
+
+
+def from_arrow(file_path: Union[str, pathlib.Path, io.BytesIO], data, key_col: str = 'key', value_col: str = 'value', timestamp_col: Optional[str] = None, encode_values: bool = True, flag: str = 'n', **kwargs) -> int:
+    """
+    Write the rows of Arrow data into a booklet opened with
+    open(file_path, flag, **kwargs). The data is converted one record batch
+    at a time: the values of each batch are encoded with the value
+    serializer's batch protocol and the batch is written under a single
+    lock acquisition, like update().
+
+    Parameters
+    ----------
+    file_path : str, pathlib.Path, or io.BytesIO
+        Path to the booklet file or a BytesIO object.
+    data : pyarrow.Table, pyarrow.RecordBatch or pyarrow.RecordBatchReader
+        The data to write (or any iterable of record batches).
+    key_col : str, optional
+        The column of keys, encoded with the key_serializer.
+    value_col : str, optional
+        The column of values.
+    timestamp_col : str or None, optional
+        A column of timestamps (Arrow timestamps, or int microseconds in
+        POSIX UTC) for the keys. None (default) uses the current time.
+    encode_values : bool, optional
+        Whether to encode the values with the value_serializer. If False,
+        the value column must hold the serialized bytes (e.g. from
+        to_arrow(decode_values=False)).
+    flag : str, optional
+        The open flag. Defaults to 'n'.
+    **kwargs
+        Passed to open (key_serializer, value_serializer, etc).
+
+    Returns
+    -------
+    int
+        The number of rows written.
+    """
+    pa = serializers.pa
+    if isinstance(data, pa.RecordBatch):
+        data = [data]
+    elif hasattr(data, 'to_batches'):
+        data = data.to_batches()
+
+    n_rows = 0
+    with open(file_path, flag, **kwargs) as db:
+        if not db.writable:
+            raise ValueError('File is open for read only.')
+        for batch in data:
+            key_bytes = [db._pre_key(key) for key in batch.column(key_col).to_pylist()]
+            values = batch.column(value_col).to_pylist()
+            if encode_values:
+                values = db._pre_values(values)
+            elif not all(isinstance(value, bytes) for value in values):
+                raise TypeError('If encode_values is False, then the value column must hold bytes.')
+            if timestamp_col is None:
+                timestamps = None
+            else:
+                ts_col = batch.column(timestamp_col)
+                if pa.types.is_timestamp(ts_col.type):
+                    ts_col = ts_col.cast(pa.timestamp('us', tz=ts_col.type.tz)).cast(pa.int64())
+                timestamps = ts_col.to_pylist()
+            db._store_values(key_bytes, values, timestamps)
+            n_rows += len(key_bytes)
+
+    return n_rows
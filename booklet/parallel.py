@@ -1,14 +1,177 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Multiprocessing helpers for Booklet.map().
+Parallel helpers for Booklet.map() and Booklet.partitions().
 """
+import mmap
+from concurrent.futures import as_completed
+from itertools import islice
 
+from . import utils
 
-def _map_worker(args):
-    """Worker function for multiprocessing.Pool."""
-    func, key, value = args
-    result = func(key, value)
-    if result is not None:
-        return result  # (new_key, new_value) tuple
-    return None
+
+## The func and read-only booklet handle of a map() pool worker
+_worker_state = {}
+
+
+def _open_reader(cls, file_path: str):
+    """
+    Open a booklet read-only without the shared OS file lock, for workers
+    reading a file that a write-mode handle holds.
+    """
+    db = cls.__new__(cls)
+    db._shared_lock = False
+    db.__init__(file_path)
+    return db
+
+
+class _Items(list):
+    """A map() task of (key, value) pairs read by the calling process."""
+
+
+def _run_map_task(func, db, task) -> list:
+    """
+    Apply func to the items of a map() task: a Partition, a list of keys or
+    _Items. Returns the results that are not None.
+    """
+    if isinstance(task, Partition):
+        items = task._iter_items(db)
+    elif isinstance(task, _Items):
+        items = task
+    else:
+        items = ((key, value) for key, value in db.get_items(task) if value is not None)
+
+    results = []
+    for key, value in items:
+        result = func(key, value)
+        if result is not None:
+            results.append(result)
+
+    return results
+
+
+def _init_map_worker(func, cls, file_path):
+    """Pool initializer: keep func and a handle of the file for the worker's tasks."""
+    _worker_state['func'] = func
+    _worker_state['db'] = None if file_path is None else _open_reader(cls, file_path)
+
+
+def _map_task(task) -> list:
+    """Run a map() task in a pool worker set up by _init_map_worker."""
+    return _run_map_task(_worker_state['func'], _worker_state['db'], task)
+
+
+def _open_map_task(func, cls, file_path, task) -> list:
+    """
+    Run a map() task on a caller's executor, whose workers have no state, so
+    the file is opened for the task.
+    """
+    if file_path is None or isinstance(task, _Items):
+        return _run_map_task(func, None, task)
+
+    db = _open_reader(cls, file_path)
+    try:
+        return _run_map_task(func, db, task)
+    finally:
+        db.close()
+
+
+def _executor_map(executor, fn, tasks, ordered: bool):
+    """
+    Submit fn(task) for every task to a concurrent.futures executor and yield
+    the results in task order or as they complete. Tasks not yet started are
+    cancelled if the caller stops early.
+    """
+    futures = [executor.submit(fn, task) for task in tasks]
+    try:
+        if ordered:
+            for future in futures:
+                yield future.result()
+        else:
+            for future in as_completed(futures):
+                yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+class Partition:
+    """
+    A picklable descriptor of block-aligned byte ranges of a booklet file,
+    made by Booklet.partitions(). Each partition opens the file read-only on
+    its own, so the partitions of a file can be scanned in separate threads
+    or processes. Iterating a partition yields the live user items whose
+    blocks start in its ranges.
+    """
+    def __init__(self, file_path: str, spans: tuple, fixed: bool, file_size: int, compactions: int = 0):
+        self.file_path = file_path
+        self.spans = spans
+        self.fixed = fixed
+        self.file_size = file_size
+        self.compactions = compactions
+
+    def __repr__(self):
+        return f'Partition({self.file_path!r}, spans={self.spans!r})'
+
+    @property
+    def n_bytes(self) -> int:
+        """
+        The number of file bytes in the partition.
+        """
+        return sum(end - start for start, end in self.spans)
+
+    def _open(self):
+        from .main import VariableLengthValue, FixedLengthValue
+
+        if self.fixed:
+            db = FixedLengthValue(self.file_path)
+        else:
+            db = VariableLengthValue(self.file_path)
+        if db._mmap is None or len(db._mmap) < self.file_size or utils.read_file_compactions(db._mmap) != self.compactions:
+            db.close()
+            raise ValueError('The booklet was compacted (prune or clear) since the partitions were made.')
+
+        return db
+
+    def _iter_raw(self, db, include_key: bool, include_value: bool):
+        mm = db._mmap
+        for start, end in self.spans:
+            if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                page_start = start - (start % mmap.PAGESIZE)
+                mm.madvise(mmap.MADV_SEQUENTIAL, page_start, end - page_start)
+            if self.fixed:
+                yield from utils._mmap_iter_keys_values_fixed_region(mm, start, end, include_key, include_value, db._value_len)
+            else:
+                yield from utils._mmap_iter_keys_values_region(mm, start, end, include_key, include_value, False, db._ts_bytes_len, db._dedup_threshold is not None)
+
+    def keys(self):
+        """
+        Iterate over the keys of the partition.
+        """
+        with self._open() as db:
+            for key in self._iter_raw(db, True, False):
+                yield db._post_key(key)
+
+    def items(self):
+        """
+        Iterate over the (key, value) pairs of the partition. Values are
+        decoded in batches with the serializer's batch protocol.
+        """
+        with self._open() as db:
+            yield from self._iter_items(db)
+
+    def _iter_items(self, db):
+        it = self._iter_raw(db, True, True)
+        while True:
+            batch = list(islice(it, utils.codec_batch_size))
+            if not batch:
+                return
+            keys = db._post_keys([key for key, value in batch])
+            yield from zip(keys, db._post_values([value for key, value in batch]))
+
+    def values(self):
+        """
+        Iterate over the values of the partition.
+        """
+        for key, value in self.items():
+            yield value
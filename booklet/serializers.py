@@ -9,48 +9,53 @@ import io
 import pickle
 import json
 import hashlib
-
+import importlib
+import importlib.util
+import ast
+import struct
+import threading
+from functools import lru_cache
+from itertools import accumulate
+
+
+class _LazyModule:
+    """
+    Stand-in for an optional backend module. The module is only imported on
+    first attribute access (i.e. when a serializer that needs it is first
+    used), so importing booklet does not pay for numpy, pandas, etc.
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        try:
+            return getattr(module, attr)
+        except AttributeError:
+            ## Submodules that the package does not import itself (e.g. shapely.wkb)
+            return importlib.import_module(f'{self._name}.{attr}')
+
+    def __repr__(self):
+        return f'<lazy module {self._name!r}>'
+
+
+## Which optional backends are installed, found without importing them
 imports = set()
-try:
-    import orjson
-    imports.add('orjson')
-except ImportError:
-    pass
-try:
-    import zstandard as zstd
-    imports.add('zstd')
-except ImportError:
-    pass
-try:
-    import numpy as np
-    imports.add('numpy')
-except ImportError:
-    pass
-try:
-    import pandas as pd
-    imports.add('pandas')
-except ImportError:
-    pass
-try:
-    import geopandas as gpd
-    imports.add('geopandas')
-except ImportError:
-    pass
-try:
-    import pyarrow
-    imports.add('pyarrow')
-except ImportError:
-    pass
-try:
-    import shapely
-    imports.add('shapely')
-except ImportError:
-    pass
-try:
-    import msgpack
-    imports.add('msgpack')
-except ImportError:
-    pass
+for _name, _module_name in (('orjson', 'orjson'), ('zstd', 'zstandard'), ('numpy', 'numpy'), ('pandas', 'pandas'), ('geopandas', 'geopandas'), ('pyarrow', 'pyarrow'), ('shapely', 'shapely'), ('msgpack', 'msgpack')):
+    if importlib.util.find_spec(_module_name) is not None:
+        imports.add(_name)
+
+orjson = _LazyModule('orjson')
+zstd = _LazyModule('zstandard')
+np = _LazyModule('numpy')
+pd = _LazyModule('pandas')
+gpd = _LazyModule('geopandas')
+shapely = _LazyModule('shapely')
+msgpack = _LazyModule('msgpack')
+pa = _LazyModule('pyarrow')
 
 
 # try:
@@ -60,6 +65,65 @@ except ImportError:
 #     imports['lz4'] = False
 
 
+#######################################################
+### Batch protocol
+## A serializer may also define dumps_many(objs) -> list of bytes and
+## loads_many(list of bytes) -> list of objects, which must give the same
+## results as mapping dumps/loads over the items but with less per-item
+## overhead. dumps_many/loads_many below fall back to the per-item loop.
+
+
+def dumps_many(serializer, objs):
+    """
+    Serialize a list of objects with the serializer's dumps_many if it has one.
+    """
+    func = getattr(serializer, 'dumps_many', None)
+    if func is not None:
+        return func(objs)
+    dumps = serializer.dumps
+    return [dumps(obj) for obj in objs]
+
+
+def loads_many(serializer, objs):
+    """
+    Deserialize a list of bytes with the serializer's loads_many if it has one.
+    """
+    func = getattr(serializer, 'loads_many', None)
+    if func is not None:
+        return func(objs)
+    loads = serializer.loads
+    return [loads(obj) for obj in objs]
+
+
+def _split_arrays(objs, dtype):
+    """
+    Decode many 1-D arrays with one np.frombuffer over the concatenated bytes.
+    The results are views of that one buffer.
+    """
+    if not objs:
+        return []
+    itemsize = np.dtype(dtype).itemsize
+    arr = np.frombuffer(b''.join(objs), dtype)
+    ends = list(accumulate(len(obj) // itemsize for obj in objs))
+    return [arr[start:end] for start, end in zip([0] + ends[:-1], ends)]
+
+
+def _ints_from_bytes(objs, dtype, signed):
+    """
+    Decode many fixed-width ints with one vectorized np.frombuffer when numpy
+    is available.
+    """
+    if 'numpy' in imports and len(objs) > 16:
+        return np.frombuffer(b''.join(objs), dtype).tolist()
+    return [int.from_bytes(obj, 'little', signed=signed) for obj in objs]
+
+
+## Option names accepted by the configurable serializers (see configure())
+zstd_options = ('level', 'threads')
+msgpack_pack_options = ('use_bin_type', 'use_single_float', 'datetime')
+msgpack_unpack_options = ('use_list', 'raw', 'strict_map_key', 'timestamp')
+
+
 #######################################################
 ### Serializers
 
@@ -80,6 +144,15 @@ class Orjson:
         return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_OMIT_MICROSECONDS | orjson.OPT_SERIALIZE_NUMPY)
     def loads(obj):
         return orjson.loads(obj)
+    def dumps_many(objs):
+        dumps = orjson.dumps
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_OMIT_MICROSECONDS | orjson.OPT_SERIALIZE_NUMPY
+        return [dumps(obj, option=option) for obj in objs]
+    def loads_many(objs):
+        ## Each value is a complete JSON document, so the batch parses as one array
+        if not objs:
+            return []
+        return orjson.loads(b'[' + b','.join(objs) + b']')
 
 class Str:
     def dumps(obj):
@@ -98,90 +171,190 @@ class PickleZstd:
         return zstd.compress(pickle.dumps(obj, 5), 1)
     def loads(obj):
         return pickle.loads(zstd.decompress(obj))
+    def dumps_many(objs):
+        return Zstd.dumps_many([pickle.dumps(obj, 5) for obj in objs])
+    def loads_many(objs):
+        return [pickle.loads(obj) for obj in Zstd.loads_many(objs)]
+    options = zstd_options
+    def configure(options):
+        return ZstdCodec(PickleZstd, Pickle, **options)
 
 class OrjsonZstd:
     def dumps(obj):
         return zstd.compress(orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_OMIT_MICROSECONDS | orjson.OPT_SERIALIZE_NUMPY), 1)
     def loads(obj):
         return orjson.loads(zstd.decompress(obj))
+    def dumps_many(objs):
+        return Zstd.dumps_many(Orjson.dumps_many(objs))
+    def loads_many(objs):
+        return Orjson.loads_many(Zstd.loads_many(objs))
+    options = zstd_options
+    def configure(options):
+        return ZstdCodec(OrjsonZstd, Orjson, **options)
 
 class NumpyInt1:
     def dumps(obj):
         return obj.astype('i1').tobytes()
     def loads(obj):
         return np.frombuffer(obj, 'i1')
+    def dumps_many(objs):
+        return [obj.astype('i1').tobytes() for obj in objs]
+    def loads_many(objs):
+        return _split_arrays(objs, 'i1')
 
 class NumpyInt2:
     def dumps(obj):
         return obj.astype('i2').tobytes()
     def loads(obj):
         return np.frombuffer(obj, 'i2')
+    def dumps_many(objs):
+        return [obj.astype('i2').tobytes() for obj in objs]
+    def loads_many(objs):
+        return _split_arrays(objs, 'i2')
 
 class NumpyInt4:
     def dumps(obj):
         return obj.astype('i4').tobytes()
     def loads(obj):
         return np.frombuffer(obj, 'i4')
+    def dumps_many(objs):
+        return [obj.astype('i4').tobytes() for obj in objs]
+    def loads_many(objs):
+        return _split_arrays(objs, 'i4')
 
 class NumpyInt8:
     def dumps(obj):
         return obj.astype('i8').tobytes()
     def loads(obj):
         return np.frombuffer(obj, 'i8')
+    def dumps_many(objs):
+        return [obj.astype('i8').tobytes() for obj in objs]
+    def loads_many(objs):
+        return _split_arrays(objs, 'i8')
 
 class NumpyInt2Zstd:
     def dumps(obj):
         return zstd.compress(obj.astype('i2').tobytes(), 1)
     def loads(obj):
         return np.frombuffer(zstd.decompress(obj), 'i2')
+    def dumps_many(objs):
+        return Zstd.dumps_many([obj.astype('i2').tobytes() for obj in objs])
+    def loads_many(objs):
+        return _split_arrays(Zstd.loads_many(objs), 'i2')
+    options = zstd_options
+    def configure(options):
+        return ZstdCodec(NumpyInt2Zstd, NumpyInt2, **options)
 
 class NumpyInt4Zstd:
     def dumps(obj):
         return zstd.compress(obj.astype('i4').tobytes(), 1)
     def loads(obj):
         return np.frombuffer(zstd.decompress(obj), 'i4')
+    def dumps_many(objs):
+        return Zstd.dumps_many([obj.astype('i4').tobytes() for obj in objs])
+    def loads_many(objs):
+        return _split_arrays(Zstd.loads_many(objs), 'i4')
+    options = zstd_options
+    def configure(options):
+        return ZstdCodec(NumpyInt4Zstd, NumpyInt4, **options)
 
 class NumpyInt8Zstd:
     def dumps(obj):
         return zstd.compress(obj.astype('i8').tobytes(), 1)
     def loads(obj):
         return np.frombuffer(zstd.decompress(obj), 'i8')
+    def dumps_many(objs):
+        return Zstd.dumps_many([obj.astype('i8').tobytes() for obj in objs])
+    def loads_many(objs):
+        return _split_arrays(Zstd.loads_many(objs), 'i8')
+    options = zstd_options
+    def configure(options):
+        return ZstdCodec(NumpyInt8Zstd, NumpyInt8, **options)
+
+@lru_cache(maxsize=256)
+def _descr_to_dtype(descr):
+    return np.lib.format.descr_to_dtype(ast.literal_eval(descr.decode()))
+
+
+class Numpy:
+    """
+    Any ndarray that does not hold Python objects. A small header stores the
+    dtype, shape and memory order: version (1 byte), flags (1 byte, 1 =
+    Fortran order), ndim (1 byte), dtype descr length (2 bytes), the descr,
+    then 8 bytes per dimension. loads returns a read-only array over the
+    buffer it is given, so on the read-mode mmap path it is a view of the file.
+    """
+    zero_copy = True
+    def dumps(obj):
+        obj = np.asarray(obj)
+        if obj.dtype.hasobject:
+            raise TypeError('The numpy serializer does not support object arrays.')
+        fortran = obj.ndim > 1 and obj.flags.f_contiguous and not obj.flags.c_contiguous
+        descr = repr(np.lib.format.dtype_to_descr(obj.dtype)).encode()
+        header = struct.pack(f'<BBBH{len(descr)}s{obj.ndim}Q', 1, fortran, obj.ndim, len(descr), descr, *obj.shape)
+        return header + obj.tobytes('F' if fortran else 'C')
+    def loads(obj):
+        version, flags, ndim, descr_len = struct.unpack_from('<BBBH', obj)
+        if version != 1:
+            raise ValueError(f'Unknown numpy serializer header version {version}.')
+        pos = 5 + descr_len
+        dtype = _descr_to_dtype(bytes(obj[5:pos]))
+        shape = struct.unpack_from(f'<{ndim}Q', obj, pos)
+        order = 'F' if flags & 1 else 'C'
+        if dtype.itemsize == 0:
+            return np.empty(shape, dtype, order)
+        count = 1
+        for dim in shape:
+            count *= dim
+        return np.frombuffer(obj, dtype, count, pos + 8 * ndim).reshape(shape, order=order)
 
 class Uint1:
     def dumps(obj):
         return int(obj).to_bytes(1, 'little', signed=False)
     def loads(obj):
         return int.from_bytes(obj, 'little', signed=False)
+    def loads_many(objs):
+        return _ints_from_bytes(objs, '<u1', False)
 
 class Int1:
     def dumps(obj):
         return int(obj).to_bytes(1, 'little', signed=True)
     def loads(obj):
         return int.from_bytes(obj, 'little', signed=True)
+    def loads_many(objs):
+        return _ints_from_bytes(objs, '<i1', True)
 
 class Uint2:
     def dumps(obj):
         return int(obj).to_bytes(2, 'little', signed=False)
     def loads(obj):
         return int.from_bytes(obj, 'little', signed=False)
+    def loads_many(objs):
+        return _ints_from_bytes(objs, '<u2', False)
 
 class Int2:
     def dumps(obj):
         return int(obj).to_bytes(2, 'little', signed=True)
     def loads(obj):
         return int.from_bytes(obj, 'little', signed=True)
+    def loads_many(objs):
+        return _ints_from_bytes(objs, '<i2', True)
 
 class Uint4:
     def dumps(obj):
         return int(obj).to_bytes(4, 'little', signed=False)
     def loads(obj):
         return int.from_bytes(obj, 'little', signed=False)
+    def loads_many(objs):
+        return _ints_from_bytes(objs, '<u4', False)
 
 class Int4:
     def dumps(obj):
         return int(obj).to_bytes(4, 'little', signed=True)
     def loads(obj):
         return int.from_bytes(obj, 'little', signed=True)
+    def loads_many(objs):
+        return _ints_from_bytes(objs, '<i4', True)
 
 class Uint5:
     def dumps(obj):
@@ -200,12 +373,16 @@ class Uint8:
         return int(obj).to_bytes(8, 'little', signed=False)
     def loads(obj):
         return int.from_bytes(obj, 'little', signed=False)
+    def loads_many(objs):
+        return _ints_from_bytes(objs, '<u8', False)
 
 class Int8:
     def dumps(obj):
         return int(obj).to_bytes(8, 'little', signed=True)
     def loads(obj):
         return int.from_bytes(obj, 'little', signed=True)
+    def loads_many(objs):
+        return _ints_from_bytes(objs, '<i8', True)
 
 class GpdZstd:
     def dumps(obj):
@@ -229,11 +406,41 @@ class PdZstd:
         out = pd.read_feather(b1)
         return out
 
+class ArrowIpc:
+    """
+    A pyarrow Table or RecordBatch in the Arrow IPC stream format. loads
+    returns a Table whose buffers point into the buffer it is given (on the
+    read-mode mmap path, the file) wherever the data is suitably aligned.
+    """
+    zero_copy = True
+    def dumps(obj):
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, obj.schema) as writer:
+            writer.write(obj)
+        return sink.getvalue().to_pybytes()
+    def loads(obj):
+        return pa.ipc.open_stream(pa.py_buffer(obj)).read_all()
+
 class Zstd:
     def dumps(obj):
         return zstd.compress(obj, 1)
     def loads(obj):
         return zstd.decompress(obj)
+    def dumps_many(objs):
+        if len(objs) < 2 or zstd.backend != 'cext':
+            return [zstd.compress(obj, 1) for obj in objs]
+        return [bytes(b) for b in zstd.ZstdCompressor(level=1).multi_compress_to_buffer(objs)]
+    def loads_many(objs):
+        if len(objs) < 2 or zstd.backend != 'cext':
+            return [zstd.decompress(obj) for obj in objs]
+        try:
+            return [bytes(b) for b in zstd.ZstdDecompressor().multi_decompress_to_buffer(objs)]
+        except zstd.ZstdError:
+            ## Frames written without a content size cannot be batch-decompressed
+            return [zstd.decompress(obj) for obj in objs]
+    options = zstd_options
+    def configure(options):
+        return ZstdCodec(Zstd, Bytes, **options)
 
 class Wkb:
     def dumps(obj):
@@ -246,18 +453,200 @@ class WkbZstd:
         return zstd.compress(shapely.wkb.dumps(obj), 1)
     def loads(obj):
         return shapely.wkb.loads(zstd.decompress(obj))
+    def dumps_many(objs):
+        return Zstd.dumps_many([shapely.wkb.dumps(obj) for obj in objs])
+    def loads_many(objs):
+        return [shapely.wkb.loads(obj) for obj in Zstd.loads_many(objs)]
+    options = zstd_options
+    def configure(options):
+        return ZstdCodec(WkbZstd, Wkb, **options)
 
 class Msgpack:
     def dumps(obj):
         return msgpack.dumps(obj)
     def loads(obj):
         return msgpack.loads(obj)
+    def dumps_many(objs):
+        pack = msgpack.Packer().pack
+        return [pack(obj) for obj in objs]
+    def loads_many(objs):
+        ## One streaming unpacker over the concatenated values
+        data = b''.join(objs)
+        unpacker = msgpack.Unpacker(max_buffer_size=max(len(data), 1))
+        unpacker.feed(data)
+        return list(unpacker)
+    options = msgpack_pack_options + msgpack_unpack_options
+    def configure(options):
+        return MsgpackCodec(Msgpack, options)
 
 class MsgpackZstd:
     def dumps(obj):
         return zstd.compress(msgpack.dumps(obj), 1)
     def loads(obj):
         return msgpack.loads(zstd.decompress(obj))
+    def dumps_many(objs):
+        return Zstd.dumps_many(Msgpack.dumps_many(objs))
+    def loads_many(objs):
+        return Msgpack.loads_many(Zstd.loads_many(objs))
+    options = zstd_options + msgpack_pack_options + msgpack_unpack_options
+    def configure(options):
+        zstd_kwargs = {k: v for k, v in options.items() if k in zstd_options}
+        inner_options = {k: v for k, v in options.items() if k not in zstd_options}
+        inner = MsgpackCodec(Msgpack, inner_options) if inner_options else Msgpack
+        return ZstdCodec(MsgpackZstd, inner, **zstd_kwargs)
+
+class ZstdDict:
+    """
+    Zstd with a dictionary trained on the file's own values (see
+    VariableLengthValue.train_compression_dictionary). Until a dictionary is
+    trained this writes plain zstd frames, which remain readable after. The
+    *Dict serializers name their uncompressed serializer in inner.
+    """
+    inner = Bytes
+    def dumps(obj):
+        return zstd.compress(obj, 1)
+    def loads(obj):
+        return zstd.decompress(obj)
+
+class OrjsonZstdDict:
+    inner = Orjson
+    def dumps(obj):
+        return zstd.compress(Orjson.dumps(obj), 1)
+    def loads(obj):
+        return Orjson.loads(zstd.decompress(obj))
+
+class MsgpackZstdDict:
+    inner = Msgpack
+    def dumps(obj):
+        return zstd.compress(Msgpack.dumps(obj), 1)
+    def loads(obj):
+        return Msgpack.loads(zstd.decompress(obj))
+
+class PickleZstdDict:
+    inner = Pickle
+    def dumps(obj):
+        return zstd.compress(Pickle.dumps(obj), 1)
+    def loads(obj):
+        return Pickle.loads(zstd.decompress(obj))
+
+
+#######################################################
+### Configured serializers
+## A serializer that takes per-file options lists them in options and builds
+## a configured codec object (with the same dumps/loads/dumps_many/loads_many
+## protocol) in configure(options). Booklet persists the options in the file
+## and calls configure() on every open.
+
+def split_options(serializer):
+    """
+    Split a (name, options) serializer argument into its parts.
+    """
+    if isinstance(serializer, tuple):
+        name, options = serializer
+        return name, dict(options)
+    return serializer, None
+
+
+def configure(serializer, options):
+    """
+    Build the configured codec of serializer from a dict of options.
+    """
+    serializer = getattr(serializer, 'serializer', serializer)
+    allowed = getattr(serializer, 'options', ())
+    name = getattr(serializer, '__name__', repr(serializer))
+    if not allowed:
+        raise ValueError(f'The {name} serializer takes no options.')
+    unknown = set(options).difference(allowed)
+    if unknown:
+        raise ValueError(f'Unknown {name} serializer options: {sorted(unknown)}. Allowed: {list(allowed)}.')
+    return serializer.configure(options)
+
+
+class MsgpackCodec:
+    """
+    Msgpack with packb/unpackb keyword options.
+    """
+    def __init__(self, serializer, options):
+        self.serializer = serializer
+        self.pack_options = {k: v for k, v in options.items() if k in msgpack_pack_options}
+        self.unpack_options = {k: v for k, v in options.items() if k in msgpack_unpack_options}
+
+    def dumps(self, obj):
+        return msgpack.packb(obj, **self.pack_options)
+
+    def loads(self, obj):
+        return msgpack.unpackb(obj, **self.unpack_options)
+
+    def dumps_many(self, objs):
+        pack = msgpack.Packer(**self.pack_options).pack
+        return [pack(obj) for obj in objs]
+
+    def loads_many(self, objs):
+        data = b''.join(objs)
+        unpacker = msgpack.Unpacker(max_buffer_size=max(len(data), 1), **self.unpack_options)
+        unpacker.feed(data)
+        return list(unpacker)
+
+
+class ZstdCodec:
+    """
+    Zstd over an inner serializer with a configured level, compression
+    threads and optional dictionary. Compression contexts are not
+    thread-safe, so each thread gets its own pair.
+    """
+    def __init__(self, serializer, inner, level=1, threads=0, dict_data=None):
+        self.serializer = serializer
+        self.inner = inner
+        self.level = level
+        self.threads = threads
+        self.dict_data = dict_data
+        self._local = threading.local()
+        ## Fail on bad options now rather than at the first write
+        self._contexts()
+
+    def _contexts(self):
+        local = self._local
+        if not hasattr(local, 'cctx'):
+            local.cctx = zstd.ZstdCompressor(level=self.level, threads=self.threads, dict_data=self.dict_data)
+            local.dctx = zstd.ZstdDecompressor(dict_data=self.dict_data)
+        return local.cctx, local.dctx
+
+    def dumps(self, obj):
+        return self._contexts()[0].compress(self.inner.dumps(obj))
+
+    def loads(self, obj):
+        return self.inner.loads(self._contexts()[1].decompress(obj))
+
+    def dumps_many(self, objs):
+        cctx = self._contexts()[0]
+        raw = dumps_many(self.inner, objs)
+        if len(raw) < 2 or zstd.backend != 'cext' or self.threads:
+            return [cctx.compress(obj) for obj in raw]
+        return [bytes(b) for b in cctx.multi_compress_to_buffer(raw)]
+
+    def loads_many(self, objs):
+        dctx = self._contexts()[1]
+        if len(objs) < 2 or zstd.backend != 'cext':
+            raw = [dctx.decompress(obj) for obj in objs]
+        else:
+            try:
+                raw = [bytes(b) for b in dctx.multi_decompress_to_buffer(objs)]
+            except zstd.ZstdError:
+                raw = [dctx.decompress(obj) for obj in objs]
+        return loads_many(self.inner, raw)
+
+
+class BoundZstdDict(ZstdCodec):
+    """
+    A *Dict serializer bound to its file's trained dictionary. Booklet builds
+    one when the file is opened. Frames written before the dictionary existed
+    carry dictionary id 0 and still decode.
+    """
+    def __init__(self, serializer, dict_bytes, level):
+        dict_data = zstd.ZstdCompressionDict(dict_bytes)
+        dict_data.precompute_compress(level=level)
+        super().__init__(serializer, serializer.inner, level, 0, dict_data)
+
 
 # class FileObj:
 #     def dumps(obj):
@@ -272,7 +661,10 @@ class MsgpackZstd:
 ## Serializer dict
 ## New serializers must be appended to the end of the dict!!!!!
 
-serial_dict = {None: Bytes, 'str': Str, 'pickle': Pickle, 'json': Json, 'orjson': Orjson, 'uint1': Uint1, 'int1': Int1, 'uint2': Uint2, 'int2': Int2, 'uint4': Uint4, 'int4': Int4, 'uint5': Uint5, 'int5': Int5, 'uint8': Uint8, 'int8': Int8, 'pickle_zstd': PickleZstd, 'orjson_zstd': OrjsonZstd, 'numpy_int1': NumpyInt1, 'numpy_int2': NumpyInt2, 'numpy_int4': NumpyInt4, 'numpy_int8': NumpyInt8, 'numpy_int2_zstd': NumpyInt2Zstd, 'numpy_int4_zstd': NumpyInt4Zstd, 'numpy_int8_zstd': NumpyInt8Zstd, 'pd_zstd': PdZstd, 'gpd_zstd': GpdZstd, 'zstd': Zstd, 'wkb': Wkb, 'wkb_zstd': WkbZstd, 'msgpack': Msgpack, 'msgpack_zstd': MsgpackZstd, 'bytes': Bytes}
+serial_dict = {None: Bytes, 'str': Str, 'pickle': Pickle, 'json': Json, 'orjson': Orjson, 'uint1': Uint1, 'int1': Int1, 'uint2': Uint2, 'int2': Int2, 'uint4': Uint4, 'int4': Int4, 'uint5': Uint5, 'int5': Int5, 'uint8': Uint8, 'int8': Int8, 'pickle_zstd': PickleZstd, 'orjson_zstd': OrjsonZstd, 'numpy_int1': NumpyInt1, 'numpy_int2': NumpyInt2, 'numpy_int4': NumpyInt4, 'numpy_int8': NumpyInt8, 'numpy_int2_zstd': NumpyInt2Zstd, 'numpy_int4_zstd': NumpyInt4Zstd, 'numpy_int8_zstd': NumpyInt8Zstd, 'pd_zstd': PdZstd, 'gpd_zstd': GpdZstd, 'zstd': Zstd, 'wkb': Wkb, 'wkb_zstd': WkbZstd, 'msgpack': Msgpack, 'msgpack_zstd': MsgpackZstd, 'bytes': Bytes, 'zstd_dict': ZstdDict, 'orjson_zstd_dict': OrjsonZstdDict, 'msgpack_zstd_dict': MsgpackZstdDict, 'pickle_zstd_dict': PickleZstdDict, 'numpy': Numpy, 'arrow': ArrowIpc}
+
+## Serializers that use a per-file trained zstd dictionary
+dict_serializers = (ZstdDict, OrjsonZstdDict, MsgpackZstdDict, PickleZstdDict)
 
 serial_name_dict = {n: i+1 for i, n in enumerate(serial_dict)}
 
@@ -0,0 +1,137 @@
+"""
+Tests for the NumPy batch API: FixedLengthValue.set_array/get_array and the
+DenseFixedLengthValue variants.
+"""
+import io
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from booklet import DenseFixedLengthValue, FixedLengthValue
+
+
+def _new_fixed(path, **kwargs):
+    kwargs.setdefault('key_serializer', 'uint4')
+    kwargs.setdefault('value_len', 8)
+    kwargs.setdefault('n_buckets', 101)
+    return FixedLengthValue(path, 'n', **kwargs)
+
+
+def _rows(values):
+    return np.asarray(values, '<u8').view(np.uint8).reshape(-1, 8)
+
+
+def test_set_array_matches_set(tmp_path):
+    n = 5000
+    keys = np.arange(n, dtype=np.uint32)
+    with _new_fixed(tmp_path / 'f.blt') as f:
+        f.set_array(keys, _rows(keys * 7))
+        assert len(f) == n
+        ## The batch outgrew the 101 buckets and was reindexed up front
+        assert f._n_buckets >= n
+        for k in (0, 1, 2500, n - 1):
+            assert f[k] == int(k * 7).to_bytes(8, 'little')
+        assert dict(f.items()) == {int(k): int(k * 7).to_bytes(8, 'little') for k in keys}
+
+    with FixedLengthValue(tmp_path / 'f.blt') as f:
+        out, found = f.get_array(keys)
+        assert found.all()
+        assert (out.view('<u8').ravel() == keys * 7).all()
+
+
+def test_set_array_overwrites_in_place_and_mixes(tmp_path):
+    p = tmp_path / 'f.blt'
+    with _new_fixed(p) as f:
+        for k in range(10):
+            f[k] = k.to_bytes(8, 'little')
+        f.sync()
+        size0 = p.stat().st_size
+
+        f.set_array(list(range(10)), _rows(np.arange(100, 110)))
+        assert p.stat().st_size == size0
+        assert f[3] == (103).to_bytes(8, 'little')
+
+        f.set_array([5, 20, 21], _rows([500, 2000, 2100]))
+        assert len(f) == 12
+        assert f[5] == (500).to_bytes(8, 'little')
+        assert f[21] == (2100).to_bytes(8, 'little')
+        assert f.prune() == 0
+
+
+def test_duplicate_keys_last_wins(tmp_path):
+    with _new_fixed(tmp_path / 'f.blt') as f:
+        f.set_array([1, 2, 1, 1], _rows([10, 20, 30, 40]))
+        assert len(f) == 2
+        assert f[1] == (40).to_bytes(8, 'little')
+
+
+def test_get_array_missing_and_out(tmp_path):
+    with _new_fixed(tmp_path / 'f.blt') as f:
+        f.set_array([1, 2, 3], _rows([10, 20, 30]))
+        out = np.full(4, 99, '<u8')
+        res, found = f.get_array([3, 4, 1, 2], out=out)
+        assert res is out
+        assert found.tolist() == [True, False, True, True]
+        assert out.tolist() == [30, 99, 10, 20]
+
+        with pytest.raises(ValueError):
+            f.get_array([1, 2], out=np.zeros(3, '<u8'))
+        with pytest.raises(ValueError):
+            f.set_array([1, 2], np.zeros((2, 4), np.uint8))
+
+
+def test_structured_values_and_str_keys(tmp_path):
+    dt = np.dtype([('a', '<u4'), ('b', '<f4')])
+    vals = np.zeros(3, dt)
+    vals['a'] = [1, 2, 3]
+    vals['b'] = [0.5, 1.5, 2.5]
+    with FixedLengthValue(tmp_path / 'f.blt', 'n', key_serializer='str', value_len=8, n_buckets=11) as f:
+        f.set_array(['x', 'yy', 'zzz'], vals)
+        out, found = f.get_array(['zzz', 'x'], out=np.zeros(2, dt))
+        assert found.all()
+        assert out['a'].tolist() == [3, 1]
+        assert out['b'].tolist() == [2.5, 0.5]
+        assert sorted(f.keys()) == ['x', 'yy', 'zzz']
+
+
+def test_set_array_bytesio_and_lookups_after_more_sets():
+    b = io.BytesIO()
+    with _new_fixed(b) as f:
+        f.set_array(np.arange(300), _rows(np.arange(300)))
+        f[1000] = (1).to_bytes(8, 'little')
+        f.set_array(np.arange(250, 350), _rows(np.arange(250, 350) + 1))
+        assert len(f) == 351
+        out, found = f.get_array(np.arange(360))
+        assert found[:350].all() and not found[350:].any()
+        assert out.view('<u8').ravel()[260] == 261
+        assert out.view('<u8').ravel()[100] == 100
+
+
+def test_dense_arrays(tmp_path):
+    p = tmp_path / 'd.blt'
+    with DenseFixedLengthValue(p, 'n', value_len=8) as f:
+        f.set_array(np.arange(1000), _rows(np.arange(1000) * 2))
+        f.set_array([5, 10**6], _rows([1, 2]))
+        assert len(f) == 1001
+        assert f[5] == (1).to_bytes(8, 'little')
+        assert f[10**6] == (2).to_bytes(8, 'little')
+
+        with pytest.raises(OverflowError):
+            f.set_array([-1], _rows([0]))
+
+    with DenseFixedLengthValue(p) as f:
+        out, found = f.get_array([0, 999, 1000, 10**6, 10**7])
+        assert found.tolist() == [True, True, False, True, False]
+        assert out.view('<u8').ravel()[:2].tolist() == [0, 1998]
+
+
+def test_dense_get_array_wrapping_key(tmp_path):
+    ## key * record_len wraps mod 2**64 to the position of key 0
+    key = pow(5, -1, 2**64)
+    with DenseFixedLengthValue(tmp_path / 'd.blt', 'n', key_serializer='uint8', value_len=4) as f:
+        f[0] = b'\x01abc'
+        f[1] = b'wxyz'
+        out, found = f.get_array(np.array([key, 1], np.uint64))
+        assert found.tolist() == [False, True]
+        assert out[1].tobytes() == b'wxyz'
@@ -0,0 +1,144 @@
+"""
+Tests for the Arrow IPC value serializer and the to_arrow/from_arrow bulk
+export and import.
+"""
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+
+import booklet
+from booklet import FixedLengthValue
+
+
+def _records(n):
+    return {f'k{i}': {'a': i, 'b': str(i)} for i in range(n)}
+
+
+def test_arrow_serializer_roundtrip_and_views(tmp_path):
+    p = tmp_path / 'a.blt'
+    table = pa.table({'x': [0.5, 1.5, 2.5], 'y': ['a', 'b', 'c']})
+    with booklet.open(p, 'n', key_serializer='str', value_serializer='arrow') as db:
+        db['table'] = table
+        db['batch'] = table.to_batches()[0]
+        assert db['table'].equals(table)
+
+    with booklet.open(p) as db:
+        out = db['table']
+        assert out.equals(table)
+        assert db['batch'].equals(table)
+        ## Read-mode values are slices of the mmap, not copies
+        buf = out.column('x').chunks[0].buffers()[1]
+        assert buf.parent is not None
+        assert not buf.is_mutable
+
+    assert out.column('x').to_pylist() == [0.5, 1.5, 2.5]
+
+
+def test_to_arrow_batches_and_columns(tmp_path):
+    p = tmp_path / 'a.blt'
+    data = _records(2500)
+    with booklet.open(p, 'n', key_serializer='str', value_serializer='orjson') as db:
+        db.update(data)
+
+    with booklet.open(p) as db:
+        reader = db.to_arrow(batch_size=1000)
+        assert reader.schema.names == ['key', 'value', 'timestamp']
+        assert reader.schema.field('timestamp').type == pa.timestamp('us', tz='UTC')
+        batches = list(reader)
+        assert [len(b) for b in batches] == [1000, 1000, 500]
+        table = pa.Table.from_batches(batches)
+        assert dict(zip(table['key'].to_pylist(), table['value'].to_pylist())) == data
+
+        raw = db.to_arrow(decode_values=False).read_all()
+        assert raw.schema.field('value').type == pa.large_binary()
+        assert raw['value'][0].as_py() == db.get_timestamp(raw['key'][0].as_py(), include_value=True, decode_value=False)[1]
+
+
+def test_export_import_roundtrip_with_timestamps(tmp_path):
+    p = tmp_path / 'a.blt'
+    with booklet.open(p, 'n', key_serializer='str', value_serializer='orjson') as db:
+        db.update(_records(100))
+        db.set('old', {'a': -1}, timestamp='2001-01-01T00:00:00+00:00')
+
+    with booklet.open(p) as db:
+        table = db.to_arrow(decode_values=False).read_all()
+        expected = dict(db.timestamps())
+
+    p2 = tmp_path / 'b.blt'
+    n = booklet.from_arrow(p2, table, timestamp_col='timestamp', encode_values=False, key_serializer='str', value_serializer='orjson')
+    assert n == 101
+    with booklet.open(p2) as db:
+        assert dict(db.items()) == {**_records(100), 'old': {'a': -1}}
+        assert dict(db.timestamps()) == expected
+
+
+def test_from_arrow_reader_and_encoding(tmp_path):
+    table = pa.table({'id': [1, 2, 3], 'rec': [{'a': 1}, {'a': 2}, {'a': 3}], 'ts': [10, 20, 30]})
+    p = tmp_path / 'a.blt'
+    n = booklet.from_arrow(p, table.to_reader(max_chunksize=2), 'id', 'rec', 'ts', key_serializer='uint4', value_serializer='orjson')
+    assert n == 3
+    with booklet.open(p) as db:
+        assert dict(db.items()) == {1: {'a': 1}, 2: {'a': 2}, 3: {'a': 3}}
+        assert db.get_timestamp(2) == 20
+
+
+def test_batched_reads_and_writes(tmp_path, monkeypatch):
+    ## from_arrow writes each record batch in one pass and to_arrow reads a
+    ## batch per lock acquisition
+    cls = booklet.VariableLengthValue
+    calls = []
+    store_values = cls._store_values
+    def counting_store(self, key_bytes, value_bytes, timestamp=None):
+        calls.append((len(key_bytes), timestamp))
+        return store_values(self, key_bytes, value_bytes, timestamp)
+    monkeypatch.setattr(cls, '_store_values', counting_store)
+
+    table = pa.table({'id': list(range(10)), 'rec': [{'a': i} for i in range(10)], 'ts': [i * 10 for i in range(10)]})
+    p = tmp_path / 'a.blt'
+    booklet.from_arrow(p, table.to_reader(max_chunksize=4), 'id', 'rec', 'ts', key_serializer='uint4', value_serializer='orjson')
+    assert calls == [(4, [0, 10, 20, 30]), (4, [40, 50, 60, 70]), (2, [80, 90])]
+
+    sizes = []
+    iter_batches = cls._iter_locked_batches
+    def counting_batches(self, make_iter, batch_size):
+        for batch in iter_batches(self, make_iter, batch_size):
+            sizes.append(len(batch))
+            yield batch
+    monkeypatch.setattr(cls, '_iter_locked_batches', counting_batches)
+    with booklet.open(p) as db:
+        reader = db.to_arrow(batch_size=3)
+        assert [batch.num_rows for batch in reader] == [3, 3, 3, 1]
+        assert sizes == [3, 3, 3, 1]
+    with booklet.open(p) as db:
+        assert [db.get_timestamp(i) for i in range(10)] == [i * 10 for i in range(10)]
+
+
+def test_parquet_export(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    p = tmp_path / 'a.blt'
+    with booklet.open(p, 'n', key_serializer='uint4', value_serializer='orjson', init_timestamps=False) as db:
+        db.update({i: {'a': i} for i in range(300)})
+
+    with booklet.open(p) as db:
+        reader = db.to_arrow(batch_size=128)
+        with pq.ParquetWriter(tmp_path / 'a.parquet', reader.schema) as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+
+    table = pq.read_table(tmp_path / 'a.parquet')
+    assert table.schema.names == ['key', 'value']
+    assert sorted(table['key'].to_pylist()) == list(range(300))
+
+
+def test_empty_and_fixed(tmp_path):
+    with booklet.open(tmp_path / 'e.blt', 'n') as db:
+        table = db.to_arrow().read_all()
+        assert table.num_rows == 0
+        assert table.schema.names == ['key', 'value', 'timestamp']
+
+    with FixedLengthValue(tmp_path / 'f.blt', 'n', key_serializer='uint4', value_len=2) as db:
+        db[1] = b'ab'
+        db[2] = b'cd'
+        assert sorted(db.to_arrow().read_all().to_pylist(), key=lambda r: r['key']) == [{'key': 1, 'value': b'ab'}, {'key': 2, 'value': b'cd'}]
+        with pytest.raises(ValueError):
+            db.to_arrow(batch_size=0)
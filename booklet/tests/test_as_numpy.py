@@ -0,0 +1,141 @@
+"""
+Tests for as_numpy: structured NumPy views straight over the mmap of a
+read-mode FixedLengthValue (and DenseFixedLengthValue).
+"""
+import gc
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from booklet import DenseFixedLengthValue, FixedLengthValue
+
+
+def _new_fixed(path, **kwargs):
+    kwargs.setdefault('key_serializer', 'uint4')
+    kwargs.setdefault('value_len', 8)
+    kwargs.setdefault('n_buckets', 101)
+    return FixedLengthValue(path, 'n', **kwargs)
+
+
+def _val(i):
+    return i.to_bytes(8, 'little')
+
+
+def test_view_fields_and_zero_copy(tmp_path):
+    p = tmp_path / 'f.blt'
+    with _new_fixed(p) as f:
+        for k in range(50):
+            f[k] = _val(k * 3)
+
+    with FixedLengthValue(p) as f:
+        arr = f.as_numpy('<u8')
+        assert len(arr) == 50
+        assert arr.dtype.names == ('key_hash', 'next_ptr', 'key_len', 'key', 'value')
+        assert arr['key'].dtype == np.dtype('<u4')
+        assert (arr['key_len'] == 4).all()
+        assert arr['next_ptr'].any(axis=1).all()
+        assert dict(zip(arr['key'].tolist(), arr['value'].tolist())) == {k: k * 3 for k in range(50)}
+        ## A view over the mmap, not a copy
+        assert not arr.flags.owndata
+        assert not arr.flags.writeable
+        del arr
+
+
+def test_deleted_blocks_and_live_only(tmp_path):
+    p = tmp_path / 'f.blt'
+    with _new_fixed(p) as f:
+        for k in range(20):
+            f[k] = _val(k)
+        f.sync()
+        for k in range(0, 20, 2):
+            del f[k]
+        ## Compaction-free churn: the deleted slots hold new keys
+        f[100] = _val(100)
+
+    with FixedLengthValue(p) as f:
+        arr = f.as_numpy()
+        live = arr['next_ptr'].any(axis=1)
+        assert len(arr) == 20
+        assert int(live.sum()) == 11
+        assert sorted(arr['key'][live].tolist()) == sorted(f.keys())
+
+        live_arr = f.as_numpy('<u8', live_only=True)
+        assert live_arr.flags.owndata
+        assert dict(zip(live_arr['key'].tolist(), live_arr['value'].tolist())) == {k: int.from_bytes(v, 'little') for k, v in f.items()}
+        del arr, live_arr
+
+
+def test_reindexed_file_is_concatenated(tmp_path):
+    p = tmp_path / 'f.blt'
+    with _new_fixed(p, n_buckets=11) as f:
+        for k in range(3000):
+            f[k] = _val(k)
+    with FixedLengthValue(p) as f:
+        assert f._n_buckets > 11
+        arr = f.as_numpy('<u8', live_only=True)
+        assert sorted(arr['key'].tolist()) == list(range(3000))
+        assert (arr['value'] == arr['key']).all()
+
+
+def test_structured_value_dtype_and_errors(tmp_path):
+    p = tmp_path / 'f.blt'
+    dt = np.dtype([('a', '<u4'), ('b', '<f4')])
+    with _new_fixed(p) as f:
+        f[1] = np.array([(7, 1.5)], dt).tobytes()
+        with pytest.raises(ValueError):
+            f.as_numpy()
+
+    with FixedLengthValue(p) as f:
+        arr = f.as_numpy(dt)
+        assert arr['value']['a'].tolist() == [7]
+        assert arr['value']['b'].tolist() == [1.5]
+        with pytest.raises(ValueError):
+            f.as_numpy('<u4')
+        del arr
+
+
+def test_mixed_key_lengths_raise(tmp_path):
+    p = tmp_path / 'f.blt'
+    with _new_fixed(p, key_serializer='str') as f:
+        f['a'] = _val(1)
+        f['bb'] = _val(2)
+    with FixedLengthValue(p) as f:
+        with pytest.raises(ValueError):
+            f.as_numpy()
+
+    with _new_fixed(p, key_serializer='str') as f:
+        f['aa'] = _val(1)
+        f['bb'] = _val(2)
+    with FixedLengthValue(p) as f:
+        arr = f.as_numpy()
+        assert arr['key'].dtype == np.dtype('V2')
+        assert sorted(bytes(k) for k in arr['key']) == [b'aa', b'bb']
+        del arr
+
+
+def test_close_with_live_view(tmp_path):
+    p = tmp_path / 'f.blt'
+    with _new_fixed(p) as f:
+        f[1] = _val(1)
+    f = FixedLengthValue(p)
+    arr = f.as_numpy('<u8')
+    f.close()
+    assert arr['value'].tolist() == [1]
+    del arr
+    gc.collect()
+
+
+def test_dense_view(tmp_path):
+    p = tmp_path / 'd.blt'
+    with DenseFixedLengthValue(p, 'n', value_len=8) as f:
+        for k in (0, 3, 4):
+            f[k] = _val(k * 10)
+
+    with DenseFixedLengthValue(p) as f:
+        arr = f.as_numpy('<u8')
+        assert arr['present'].tolist() == [1, 0, 0, 1, 1]
+        assert arr['value'][[0, 3, 4]].tolist() == [0, 30, 40]
+        assert np.flatnonzero(arr['present']).tolist() == list(f.keys())
+        assert f.as_numpy('<u8', live_only=True)['value'].tolist() == [0, 30, 40]
+        del arr
@@ -0,0 +1,105 @@
+"""
+Tests for the batch serializer protocol (dumps_many/loads_many) and the
+booklet paths that use it: update(), get_items() and iter_batches().
+"""
+import io
+
+import pytest
+
+import booklet
+from booklet import serializers
+
+
+class Upper:
+    """A custom serializer without the batch methods."""
+    def dumps(obj):
+        return obj.upper().encode()
+    def loads(obj):
+        return obj.decode()
+
+
+def _values_for(name):
+    if name.startswith('numpy'):
+        np = pytest.importorskip('numpy')
+        return [np.arange(n, dtype='i8') - 3 for n in (0, 1, 5, 17)]
+    elif name in ('uint1', 'uint2', 'uint4', 'uint8'):
+        return list(range(0, 250, 7)) * 2
+    elif name in ('int1', 'int2', 'int4', 'int8'):
+        return list(range(-120, 120, 7)) * 2
+    elif name == 'zstd':
+        return [b'', b'a', b'abc' * 100] * 10
+    else:
+        return [{'a': i, 'b': 'x' * i, 'c': [1, 2.5]} for i in range(40)]
+
+
+@pytest.mark.parametrize('name', ['orjson', 'msgpack', 'orjson_zstd', 'msgpack_zstd', 'pickle_zstd', 'zstd', 'uint1', 'int1', 'uint2', 'int2', 'uint4', 'int4', 'uint8', 'int8', 'numpy_int1', 'numpy_int2', 'numpy_int4', 'numpy_int8', 'numpy_int2_zstd', 'numpy_int4_zstd', 'numpy_int8_zstd'])
+def test_batch_matches_per_item(name):
+    module = {'orjson': 'orjson', 'msgpack': 'msgpack', 'zstd': 'zstandard'}
+    for part, module_name in module.items():
+        if part in name:
+            pytest.importorskip(module_name)
+    ser = serializers.serial_dict[name]
+    objs = _values_for(name)
+
+    dumped = serializers.dumps_many(ser, objs)
+    loaded = serializers.loads_many(ser, [ser.dumps(obj) for obj in objs])
+    expected = [ser.loads(ser.dumps(obj)) for obj in objs]
+
+    roundtrip = [ser.loads(b) for b in dumped]
+    if name.startswith('numpy'):
+        for a, b, c in zip(loaded, roundtrip, expected):
+            assert a.dtype == c.dtype
+            assert a.tolist() == b.tolist() == c.tolist()
+    else:
+        assert loaded == roundtrip == expected
+
+    assert serializers.loads_many(ser, []) == []
+    assert serializers.dumps_many(ser, []) == []
+
+
+def test_fallback_for_custom_serializer():
+    assert serializers.dumps_many(Upper, ['a', 'b']) == [b'A', b'B']
+    assert serializers.loads_many(Upper, [b'A']) == ['A']
+
+
+def test_update_get_items_iter_batches(tmp_path):
+    pytest.importorskip('msgpack')
+    data = {f'k{i}': {'i': i} for i in range(2500)}
+    p = tmp_path / 'v.blt'
+    with booklet.open(p, 'n', key_serializer='str', value_serializer='msgpack') as db:
+        db.update(data)
+        assert db['k7'] == {'i': 7}
+
+    with booklet.open(p) as db:
+        items = dict(db.get_items(['k1', 'missing', 'k2499'] + [f'k{i}' for i in range(1500)], default=-1))
+        assert items['missing'] == -1
+        assert items['k2499'] == {'i': 2499}
+        assert items['k1499'] == {'i': 1499}
+
+        batches = list(db.iter_batches(batch_size=1000))
+        assert [len(b) for b in batches] == [1000, 1000, 500]
+        assert dict(pair for b in batches for pair in b) == data
+        assert sorted(k for b in db.iter_batches(what='keys') for k in b) == sorted(data)
+        assert [v for b in db.iter_batches(700, 'values') for v in b] == list(db.values())
+
+        with pytest.raises(ValueError):
+            next(db.iter_batches(what='bytes'))
+
+
+def test_update_validates_before_writing():
+    b = io.BytesIO()
+    with booklet.FixedLengthValue(b, 'n', key_serializer='uint4', value_len=4) as f:
+        with pytest.raises(ValueError):
+            f.update({1: b'1234', 2: b'12'})
+        assert len(f) == 0
+        f.update({1: b'1234', 2: b'5678'})
+        assert sorted(next(f.iter_batches(what='keys'))) == [1, 2]
+        assert dict(f.get_items([2, 3])) == {2: b'5678', 3: None}
+
+
+def test_dense_batches(tmp_path):
+    with booklet.DenseFixedLengthValue(tmp_path / 'd.blt', 'n', value_len=2) as f:
+        f.update({k: k.to_bytes(2, 'little') for k in (0, 3, 9)})
+        assert list(f.iter_batches(2)) == [[(0, b'\x00\x00'), (3, b'\x03\x00')], [(9, b'\x09\x00')]]
+        assert list(f.iter_batches(what='keys')) == [[0, 3, 9]]
+        assert dict(f.get_items([3, 4])) == {3: b'\x03\x00', 4: None}
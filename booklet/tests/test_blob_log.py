@@ -0,0 +1,179 @@
+"""
+Tests for the blob log: values at or above blob_threshold are appended to a
+companion <name>.<gen>.blob file and the booklet stores a pointer to them.
+"""
+import io
+
+import pytest
+
+import booklet
+from booklet import utils
+
+
+def _new(path, **kwargs):
+    kwargs.setdefault('key_serializer', 'uint4')
+    kwargs.setdefault('blob_threshold', 100)
+    return booklet.open(path, 'n', **kwargs)
+
+
+def _blob_files(path):
+    return sorted(p.name for p in path.parent.glob(path.name + '.*.blob'))
+
+
+BIG = [bytes([i]) * 5000 for i in range(10)]
+
+
+def test_roundtrip_and_small_main_file(tmp_path):
+    p = tmp_path / 'a.blt'
+    with _new(p) as db:
+        for i in range(200):
+            db[i] = BIG[i % 10]
+        db[1000] = b'small'
+        db.update({1001: BIG[1], 1002: b'tiny'})
+        assert db[7] == BIG[7]
+        assert db[1000] == b'small'
+
+    assert _blob_files(p) == ['a.blt.0.blob']
+    assert (tmp_path / 'a.blt.0.blob').stat().st_size == 201 * 5000
+    assert p.stat().st_size < 200 * 5000 / 10
+
+    with booklet.open(p) as db:
+        assert len(db) == 203
+        assert dict(db.items()) == {**{i: BIG[i % 10] for i in range(200)}, 1000: b'small', 1001: BIG[1], 1002: b'tiny'}
+        assert dict(db.get_items([3, 1000])) == {3: BIG[3], 1000: b'small'}
+        assert db.get_timestamp(4, include_value=True, decode_value=False)[1] == BIG[4]
+        assert all(value == BIG[key % 10] for key, ts, value in db.timestamps(True, False) if key < 200)
+
+
+def test_settings_are_stored(tmp_path):
+    p = tmp_path / 'a.blt'
+    with _new(p) as db:
+        db[1] = BIG[1]
+    with booklet.open(p, 'w') as db:
+        assert db._blob_threshold == 100
+        db[2] = BIG[2]
+        assert db[2] == BIG[2]
+    with booklet.open(p, 'w', blob_threshold=1000) as db:
+        assert db._blob_threshold == 100
+
+    with pytest.raises(ValueError):
+        _new(tmp_path / 'b.blt', blob_threshold=utils.blob_pointer_len)
+    with booklet.open(tmp_path / 'c.blt', 'n', key_serializer='uint4') as db:
+        db[1] = b'x'
+    with pytest.raises(ValueError):
+        booklet.open(tmp_path / 'c.blt', 'w', blob_threshold=100)
+    with pytest.raises(ValueError):
+        _new(io.BytesIO())
+
+
+def test_pointer_shaped_values(tmp_path):
+    p = tmp_path / 'a.blt'
+    fake = utils.blob_pointer(0, 0, 5000)
+    with _new(p) as db:
+        db[1] = BIG[1]
+        db[2] = fake
+        assert db[2] == fake
+    with booklet.open(p) as db:
+        assert db[1] == BIG[1]
+        assert db[2] == fake
+
+
+def test_compact_blobs(tmp_path):
+    p = tmp_path / 'a.blt'
+    with _new(p) as db:
+        for i in range(100):
+            db[i] = BIG[i % 10]
+        for i in range(50):
+            del db[i]
+        for i in range(50, 75):
+            db[i] = b'small'
+
+        assert db.compact_blobs() == 75 * 5000
+        assert _blob_files(p) == ['a.blt.1.blob']
+        assert (tmp_path / 'a.blt.1.blob').stat().st_size == 25 * 5000
+        assert dict(db.items()) == {**{i: b'small' for i in range(50, 75)}, **{i: BIG[i % 10] for i in range(75, 100)}}
+
+        db[200] = BIG[0]
+        assert db[200] == BIG[0]
+
+    with booklet.open(p) as db:
+        assert db[80] == BIG[0]
+        assert db[200] == BIG[0]
+        assert len(db) == 51
+
+    with booklet.open(p, 'w') as db:
+        assert db.compact_blobs() == 0
+        assert _blob_files(p) == ['a.blt.2.blob']
+        db.prune()
+        assert db[99] == BIG[9]
+        assert db.compact_blobs() == 0
+
+
+def test_with_dedup(tmp_path):
+    p = tmp_path / 'a.blt'
+    with _new(p, dedup_threshold=50) as db:
+        for i in range(100):
+            db[i] = BIG[i % 5]
+        db[1000] = bytes(60)
+        assert db[3] == BIG[3]
+        assert db[1000] == bytes(60)
+    assert (tmp_path / 'a.blt.0.blob').stat().st_size == 5 * 5000
+
+    with booklet.open(p, 'w') as db:
+        for i in range(100):
+            if i % 5 != 1:
+                db[i] = b'small'
+        db.prune()
+        assert db.compact_blobs() == 4 * 5000
+        assert db[6] == BIG[1]
+        assert db[7] == b'small'
+
+
+def test_clear_and_reopen(tmp_path):
+    p = tmp_path / 'a.blt'
+    with _new(p) as db:
+        for i in range(10):
+            db[i] = BIG[i]
+        db.compact_blobs()
+        db.clear()
+        assert len(db) == 0
+        assert _blob_files(p) == []
+        db[1] = BIG[1]
+        db.reopen('r')
+        assert db[1] == BIG[1]
+        db.reopen('w')
+        db[2] = BIG[2]
+        assert dict(db.items()) == {1: BIG[1], 2: BIG[2]}
+        assert db._blob_threshold == 100
+
+
+def test_reads_without_pread(tmp_path, monkeypatch):
+    ## Windows has no os.pread: blob files are read with seek and read
+    monkeypatch.delattr(utils.os, 'pread')
+    p = tmp_path / 'a.blt'
+    with _new(p) as db:
+        for i in range(20):
+            db[i] = BIG[i % 10]
+        db.sync()
+        assert [db[i] for i in range(20)] == [BIG[i % 10] for i in range(20)]
+
+
+def test_reader_sees_blobs_appended_after_mapping(tmp_path):
+    ## A reader (e.g. a map() worker) maps the blob file on its first blob
+    ## read; blobs the writer appends afterwards must still be readable
+    from booklet.parallel import _open_reader
+    p = tmp_path / 'a.blt'
+    with _new(p) as db:
+        db[0] = BIG[0]
+        db.sync()
+        r = _open_reader(type(db), str(p))
+        try:
+            assert r[0] == BIG[0]
+            for i in range(1, 10):
+                db[i] = BIG[i]
+            db.sync()
+            assert [r[i] for i in range(10)] == BIG
+            with r.open_value(9) as f:
+                assert f.read() == BIG[9]
+        finally:
+            r.close()
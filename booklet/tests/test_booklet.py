@@ -1222,10 +1222,15 @@ def test_prune_inplace_roundtrip_fixed(tmp_path):
     with FixedLengthValue(fp, 'n', key_serializer='uint4', value_len=vlen) as f:
         for k, v in live.items():
             f[k] = v
+        ## Dead blocks come from deletes - fixed-length overwrites are in place.
+        for k in range(n, 2 * n):
+            f[k] = b'x' * vlen
         f.sync()
         for k in list(live):
             live[k] = f'{k + 500000:016d}'.encode()
             f[k] = live[k]
+        for k in range(n, 2 * n):
+            del f[k]
 
     old_size = fp.stat().st_size
 
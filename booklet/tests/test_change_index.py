@@ -0,0 +1,119 @@
+"""
+Tests for the change index: a timestamp-ordered companion file
+(<name>.changes) that changed_since() answers from without scanning the
+booklet.
+"""
+import io
+
+import pytest
+
+import booklet
+from booklet import utils
+
+
+T0 = 1_700_000_000_000_000
+
+
+def _new(path, **kwargs):
+    kwargs.setdefault('key_serializer', 'uint4')
+    kwargs.setdefault('value_serializer', 'pickle')
+    kwargs.setdefault('change_index', True)
+    return booklet.open(path, 'n', **kwargs)
+
+
+def test_changed_since(tmp_path):
+    p = tmp_path / 'a.blt'
+    with _new(p) as db:
+        for i in range(100):
+            db.set(i, i, timestamp=T0 + i)
+        assert db.changed_since(T0 + 95) == [95, 96, 97, 98, 99]
+        assert utils.changes_path(p).exists()
+
+        ## Overwrites, in-place timestamps and deletes
+        db.set(3, 'x', timestamp=T0 + 200)
+        db.set_timestamp(97, T0 + 1)
+        db.set_timestamp(5, T0 + 150)
+        del db[99]
+        assert db.changed_since(T0 + 95) == [95, 96, 98, 5, 3]
+        assert db.changed_since(T0 + 1000) == []
+
+    with booklet.open(p) as db:
+        assert db.changed_since(T0 + 95) == [95, 96, 98, 5, 3]
+        assert len(db.changed_since(T0)) == 99
+
+
+def test_enable_on_existing_file_and_reopen(tmp_path):
+    p = tmp_path / 'a.blt'
+    with booklet.open(p, 'n', key_serializer='str', value_serializer='pickle') as db:
+        for i in range(50):
+            db.set(f'k{i}', i, timestamp=T0 + i)
+        with pytest.raises(ValueError):
+            db.changed_since(T0)
+
+    with booklet.open(p, 'w', change_index=True) as db:
+        assert db.changed_since(T0 + 48) == ['k48', 'k49']
+
+    ## The setting is stored in the file
+    with booklet.open(p, 'w') as db:
+        db.set('new', 1, timestamp=T0 + 100)
+    with booklet.open(p) as db:
+        assert db.changed_since(T0 + 49) == ['k49', 'new']
+
+    ## Without the companion file, a reader scans the booklet
+    utils.changes_path(p).unlink()
+    with booklet.open(p) as db:
+        assert db.changed_since(T0 + 49) == ['k49', 'new']
+    with booklet.open(p, 'w') as db:
+        assert db.changed_since(T0 + 49) == ['k49', 'new']
+    assert utils.changes_path(p).exists()
+
+
+def test_prune_clear_reindex_and_recreate(tmp_path):
+    p = tmp_path / 'a.blt'
+    with _new(p, n_buckets=11) as db:
+        for i in range(500):
+            db.set(i, i, timestamp=T0 + i)
+        db.sync()
+        assert db._n_buckets > 11
+        for i in range(0, 500, 2):
+            db.set(i, -i, timestamp=T0 + 1000 + i)
+        db.sync()
+        assert db.prune() > 0
+        assert db.changed_since(T0 + 497) == [497, 499] + list(range(0, 500, 2))
+        assert db.changed_since(T0 + 1496) == [496, 498]
+
+        db.clear()
+        assert db.changed_since(0) == []
+        db.set(7, 7, timestamp=T0)
+        assert db.changed_since(0) == [7]
+
+    ## A new booklet at the same path does not reuse the old index
+    with _new(p) as db:
+        db.set(1, 1, timestamp=T0 + 5)
+        assert db.changed_since(0) == [1]
+
+
+def test_in_place_overwrites_and_run_merging(tmp_path):
+    p = tmp_path / 'a.blt'
+    with _new(p, overwrite_in_place=True) as db:
+        db.set(1, 'aaaa', timestamp=T0)
+        db.set(2, 'bbbb', timestamp=T0)
+        db.sync()
+        db.set(1, 'a', timestamp=T0 + 10)
+        assert db.changed_since(T0 + 5) == [1]
+
+        for i in range(utils.change_index_max_runs * 2):
+            db.set(100 + i, i, timestamp=T0 + 100 + i)
+            db.sync()
+        with open(utils.changes_path(p), 'rb') as f:
+            runs = utils.read_change_runs(f, db.uuid.bytes)[1]
+        assert len(runs) <= utils.change_index_max_runs
+        assert db.changed_since(T0 + 100 + utils.change_index_max_runs * 2 - 2) == [98 + utils.change_index_max_runs * 2, 99 + utils.change_index_max_runs * 2]
+        assert len(db.changed_since(T0)) == 2 + utils.change_index_max_runs * 2
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        booklet.open(io.BytesIO(), 'n', change_index=True)
+    with pytest.raises(ValueError):
+        booklet.open(io.BytesIO(), 'n', init_timestamps=False, change_index=True)
@@ -0,0 +1,82 @@
+"""
+Tests for codec_threads: batch value encodes/decodes split across a thread
+pool with the order preserved.
+"""
+import threading
+
+import pytest
+
+import booklet
+from booklet import utils
+
+
+class Recording:
+    """A bytes serializer that records which threads ran it."""
+    threads = set()
+    def dumps(obj):
+        Recording.threads.add(threading.current_thread().name)
+        return obj
+    def loads(obj):
+        Recording.threads.add(threading.current_thread().name)
+        return obj
+
+
+def _data(n):
+    return {f'k{i:05}': {'i': i, 's': 'x' * (i % 50)} for i in range(n)}
+
+
+@pytest.mark.parametrize('value_serializer', ['orjson', 'orjson_zstd', 'pickle'])
+def test_results_match_serial(tmp_path, value_serializer):
+    data = _data(3000)
+    p = tmp_path / 'v.blt'
+    with booklet.open(p, 'n', key_serializer='str', value_serializer=value_serializer, codec_threads=4) as db:
+        db.update(data)
+
+    with booklet.open(p) as db:
+        serial_items = list(db.items())
+
+    with booklet.open(p, codec_threads=4) as db:
+        assert list(db.items()) == serial_items
+        assert list(db.values()) == [v for k, v in serial_items]
+        keys = [k for k, v in serial_items][::-1] + ['missing']
+        assert list(db.get_items(keys, default=0)) == [(k, data.get(k, 0)) for k in keys]
+
+
+def test_pool_runs_and_shuts_down(tmp_path):
+    Recording.threads = set()
+    p = tmp_path / 'v.blt'
+    with booklet.open(p, 'n', key_serializer='str', value_serializer=Recording, codec_threads=3) as db:
+        db.update({str(i): b'v' for i in range(utils.codec_min_chunk * 6)})
+        assert any(name.startswith('booklet-codec') for name in Recording.threads)
+        pool = db._codec_pool
+        assert pool is not None
+    assert db._codec_pool is None
+    assert pool._shutdown
+
+    ## Small batches stay on the calling thread
+    Recording.threads = set()
+    with booklet.open(p, 'w', value_serializer=Recording, codec_threads=3) as db:
+        db.update({'a': b'1', 'b': b'2'})
+        assert Recording.threads == {threading.current_thread().name}
+
+
+def test_fixed_length(tmp_path):
+    p = tmp_path / 'f.blt'
+    data = {i: i.to_bytes(8, 'little') for i in range(1000)}
+    with booklet.FixedLengthValue(p, 'n', key_serializer='uint4', value_len=8, codec_threads=2) as f:
+        f.update(data)
+        assert dict(f.items()) == data
+        assert sorted(f.values()) == sorted(data.values())
+
+
+def test_mutation_detected_at_batch_granularity(tmp_path):
+    p = tmp_path / 'v.blt'
+    n = utils.codec_batch_size + 10
+    with booklet.open(p, 'n', key_serializer='str', value_serializer='bytes', codec_threads=2) as db:
+        db.update({str(i): b'v' for i in range(n)})
+        it = db.items()
+        next(it)
+        db['new'] = b'x'
+        with pytest.raises(RuntimeError):
+            for _ in it:
+                pass
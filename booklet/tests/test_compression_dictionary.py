@@ -0,0 +1,121 @@
+"""
+Tests for trained zstd dictionary compression: the *_zstd_dict value
+serializers and VariableLengthValue.train_compression_dictionary.
+"""
+import io
+
+import pytest
+
+pytest.importorskip('zstandard')
+
+import booklet
+from booklet import serializers, utils
+
+
+def _records(n, start=0):
+    return {f'k{i}': {'id': i, 'name': f'user{i}', 'email': f'user{i}@example.com', 'tags': ['alpha', 'beta']} for i in range(start, start + n)}
+
+
+def _new_file(path, value_serializer='orjson_zstd_dict', **kwargs):
+    return booklet.open(path, 'n', key_serializer='str', value_serializer=value_serializer, **kwargs)
+
+
+def test_codes_appended_to_serial_dict():
+    codes = [serializers.serial_name_dict[name] for name in ('zstd_dict', 'orjson_zstd_dict', 'msgpack_zstd_dict', 'pickle_zstd_dict')]
+    assert codes == [33, 34, 35, 36]
+    assert serializers.serial_name_dict['msgpack_zstd'] == 31
+
+
+def test_train_roundtrip_and_reopen(tmp_path):
+    p = tmp_path / 'v.blt'
+    data = _records(2000)
+    with _new_file(p) as db:
+        db.update(data)
+        dict_id = db.train_compression_dictionary(sample_size=500, dict_size=8192, level=5)
+        assert dict_id > 0
+        more = _records(100, 5000)
+        db.update(more)
+        data.update(more)
+        assert dict(db.items()) == data
+        ## The hidden key is not a key
+        assert len(db) == len(data)
+        assert utils.compression_dict_key_bytes not in set(db.keys())
+
+    with booklet.open(p) as db:
+        assert isinstance(db._value_serializer, serializers.BoundZstdDict)
+        assert db._value_serializer.level == 5
+        assert dict(db.items()) == data
+        assert db['k5001'] == data['k5001']
+
+
+def test_dictionary_shrinks_small_values(tmp_path):
+    p = tmp_path / 'v.blt'
+    data = _records(3000)
+    with _new_file(p) as db:
+        db.update(data)
+        db.sync()
+        plain = sum(length for k, ts, offset, length in db.locations())
+        db.train_compression_dictionary(recompress=True)
+        with_dict = sum(length for k, ts, offset, length in db.locations())
+        assert with_dict < plain * 0.7
+        assert db.prune() == len(data)
+        assert dict(db.items()) == data
+
+
+def test_train_errors(tmp_path):
+    with _new_file(tmp_path / 'a.blt', value_serializer='orjson_zstd') as db:
+        db.update(_records(50))
+        with pytest.raises(ValueError):
+            db.train_compression_dictionary()
+
+    with _new_file(tmp_path / 'b.blt') as db:
+        db.update(_records(3))
+        with pytest.raises(ValueError):
+            db.train_compression_dictionary()
+        db.update(_records(500))
+        db.train_compression_dictionary()
+        with pytest.raises(ValueError):
+            db.train_compression_dictionary()
+
+    with booklet.open(tmp_path / 'b.blt') as db:
+        with pytest.raises(ValueError):
+            db.train_compression_dictionary()
+
+
+@pytest.mark.parametrize('value_serializer', ['zstd_dict', 'msgpack_zstd_dict', 'pickle_zstd_dict'])
+def test_other_dict_serializers(value_serializer):
+    if value_serializer == 'msgpack_zstd_dict':
+        pytest.importorskip('msgpack')
+    b = io.BytesIO()
+    if value_serializer == 'zstd_dict':
+        data = {f'k{i}': f'header;{i};payload;{"x" * (i % 30)}'.encode() for i in range(500)}
+    else:
+        data = _records(500)
+    with _new_file(b, value_serializer) as db:
+        db.update(data)
+        db.train_compression_dictionary(dict_size=4096)
+        db['extra'] = data['k1']
+        assert dict(db.get_items(['k1', 'extra', 'nope'])) == {'k1': data['k1'], 'extra': data['k1'], 'nope': None}
+        assert list(db.iter_batches(what='values'))[0][:3] == [data[k] for k in list(db.keys())[:3]]
+
+
+def test_clear_drops_dictionary(tmp_path):
+    p = tmp_path / 'v.blt'
+    with _new_file(p) as db:
+        db.update(_records(300))
+        db.train_compression_dictionary()
+        db.clear()
+        assert db._value_serializer is serializers.OrjsonZstdDict
+        db['a'] = {'x': 1}
+    with booklet.open(p) as db:
+        assert db['a'] == {'x': 1}
+
+
+def test_dictionary_with_codec_threads(tmp_path):
+    p = tmp_path / 'v.blt'
+    data = _records(2000)
+    with _new_file(p, codec_threads=4) as db:
+        db.update(data)
+        db.train_compression_dictionary(recompress=True)
+    with booklet.open(p, codec_threads=4) as db:
+        assert dict(db.items()) == data
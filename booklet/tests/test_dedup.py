@@ -0,0 +1,189 @@
+"""
+Tests for value deduplication: values at or above dedup_threshold are stored
+once per distinct content in a hidden refcounted block.
+"""
+import os
+
+import pytest
+
+import booklet
+from booklet import utils
+
+
+def _new(path, **kwargs):
+    kwargs.setdefault('key_serializer', 'uint4')
+    kwargs.setdefault('dedup_threshold', 100)
+    return booklet.open(path, 'n', **kwargs)
+
+
+def _refcount(db, value):
+    content = db._read_reserved_key(utils.hash_key(utils.dedup_key(value)))
+    if content is None:
+        return None
+    return utils.bytes_to_int(content[:utils.dedup_refcount_len])
+
+
+BIG = [bytes([i]) * 1000 for i in range(5)]
+
+
+def test_roundtrip_and_size(tmp_path):
+    p = tmp_path / 'a.blt'
+    with _new(p) as db:
+        for i in range(500):
+            db[i] = BIG[i % 5]
+        db[1000] = b'small'
+        assert db[7] == BIG[2]
+        assert _refcount(db, BIG[2]) == 100
+    assert p.stat().st_size < 500 * 1000 / 4
+
+    with booklet.open(p) as db:
+        assert len(db) == 501
+        assert sorted(db.keys()) == list(range(500)) + [1000]
+        assert dict(db.items()) == {**{i: BIG[i % 5] for i in range(500)}, 1000: b'small'}
+        assert dict(db.get_items([3, 1000])) == {3: BIG[3], 1000: b'small'}
+        assert db.get_timestamp(4, include_value=True, decode_value=False)[1] == BIG[4]
+        assert all(value == BIG[key % 5] for key, ts, value in db.timestamps(True, False) if key < 500)
+
+
+def test_overwrite_delete_and_prune(tmp_path):
+    p = tmp_path / 'a.blt'
+    with _new(p) as db:
+        for i in range(10):
+            db[i] = BIG[0]
+        db[10] = BIG[1]
+        db.sync()
+        assert _refcount(db, BIG[0]) == 10
+
+        del db[0]
+        db[1] = BIG[1]
+        db.update({2: b'x', 3: BIG[0]})
+        db.sync()
+        assert _refcount(db, BIG[0]) == 7
+        assert _refcount(db, BIG[1]) == 2
+
+        del db[10]
+        db[1] = b'y'
+        db.sync()
+        assert _refcount(db, BIG[1]) == 0
+
+        ## Content stays (and can be revived) until prune drops it
+        db[20] = BIG[1]
+        del db[20]
+        db.prune()
+        assert _refcount(db, BIG[1]) is None
+        assert _refcount(db, BIG[0]) == 7
+        assert len(db) == 9
+        assert dict(db.items()) == {1: b'y', 2: b'x', **{i: BIG[0] for i in range(3, 10)}}
+
+        db[30] = BIG[1]
+        assert db[30] == BIG[1]
+
+
+def test_update_writes_new_content_in_one_pass(tmp_path, monkeypatch):
+    p = tmp_path / 'a.blt'
+    with _new(p) as db:
+        db[0] = BIG[0]
+        db.sync()
+        syncs = []
+        sync = db.sync
+        monkeypatch.setattr(db, 'sync', lambda: syncs.append(1) or sync())
+        values = {i: bytes([i]) * 500 for i in range(1, 50)}
+        db.update({**values, 50: BIG[0], 51: values[1], 52: values[1]})
+        ## One sync for the whole batch of new content, not one per content
+        assert len(syncs) == 1
+        db.sync()
+        assert _refcount(db, BIG[0]) == 2
+        assert _refcount(db, values[1]) == 3
+        assert _refcount(db, values[2]) == 1
+        assert dict(db.items()) == {0: BIG[0], **values, 50: BIG[0], 51: values[1], 52: values[1]}
+
+
+def test_prune_keeps_old_referenced_content(tmp_path):
+    p = tmp_path / 'a.blt'
+    with _new(p) as db:
+        db.set(1, BIG[0], timestamp='2001-01-01T00:00:00+00:00')
+        db.set(2, BIG[0])
+        db.set(3, BIG[1], timestamp='2001-01-01T00:00:00+00:00')
+        db.prune(timestamp='2010-01-01T00:00:00+00:00')
+        assert sorted(db.keys()) == [2]
+        assert db[2] == BIG[0]
+        ## The pruned keys released their references
+        assert _refcount(db, BIG[0]) == 1
+        assert _refcount(db, BIG[1]) is None
+
+    with booklet.open(p) as db:
+        assert db[2] == BIG[0]
+
+
+def test_threshold_is_stored(tmp_path):
+    p = tmp_path / 'a.blt'
+    with _new(p, dedup_threshold=10) as db:
+        db[1] = b'0123456789'
+    with booklet.open(p, 'w', dedup_threshold=500) as db:
+        assert db._dedup_threshold == 10
+        db[2] = b'0123456789'
+        assert _refcount(db, b'0123456789') == 2
+
+    p2 = tmp_path / 'b.blt'
+    with booklet.open(p2, 'n', key_serializer='uint4') as db:
+        db[1] = b'x'
+    with pytest.raises(ValueError):
+        booklet.open(p2, 'w', dedup_threshold=10)
+    with pytest.raises(ValueError):
+        _new(tmp_path / 'c.blt', dedup_threshold=-1)
+
+
+def test_values_shaped_like_references(tmp_path):
+    ref_like = utils.dedup_key(b'not stored')
+    with _new(tmp_path / 'a.blt', key_serializer=None, value_serializer=None) as db:
+        db[b'a'] = ref_like
+        db[b'b'] = b'plain'
+        assert db[b'a'] == ref_like
+        assert len(db) == 2
+        assert sorted(db.keys()) == [b'a', b'b']
+        ## A user key with the content key form is still only a user key
+        db[ref_like] = b'v'
+        assert db[ref_like] == b'v'
+
+    ## Without dedup, keys of that form are ordinary keys everywhere
+    p = tmp_path / 'b.blt'
+    with booklet.open(p, 'n', key_serializer=None, value_serializer=None) as db:
+        db[ref_like] = b''
+        db[b'b'] = b'plain'
+        assert sorted(db.keys()) == sorted([ref_like, b'b'])
+        assert dict(db.items())[ref_like] == b''
+        assert [k for k, ts, offset, length in db.locations()].count(ref_like) == 1
+        db.prune()
+        assert len(db) == 2
+        assert db[ref_like] == b''
+
+    with booklet.open(p) as db:
+        assert sorted(db.keys()) == sorted([ref_like, b'b'])
+        assert len(db) == 2
+
+
+def test_clear_keeps_dedup_and_serializers(tmp_path):
+    p = tmp_path / 'a.blt'
+    with _new(p, value_serializer='pickle') as db:
+        db[1] = list(range(100))
+        db.clear()
+        assert len(db) == 0
+        db[2] = list(range(100))
+        db[3] = list(range(100))
+        db.sync()
+        assert db._dedup_threshold == 100
+        assert _refcount(db, db._pre_value(list(range(100)))) == 2
+
+    with booklet.open(p) as db:
+        assert dict(db.items()) == {2: list(range(100)), 3: list(range(100))}
+
+
+def test_compression_is_per_content(tmp_path):
+    pytest.importorskip('zstandard')
+    p = tmp_path / 'a.blt'
+    tile = os.urandom(4000)
+    with _new(p, value_serializer='zstd') as db:
+        db.update({i: tile for i in range(200)})
+    with booklet.open(p) as db:
+        assert db[150] == tile
+        assert list(db.values()) == [tile] * 200
@@ -0,0 +1,186 @@
+"""
+Tests for DenseFixedLengthValue: direct-address records for dense unsigned
+integer keys (record of key k at a fixed offset, presence byte + value).
+"""
+import io
+
+import pytest
+
+import booklet
+from booklet import DenseFixedLengthValue, FixedLengthValue, utils
+
+
+def _new_dense(path, **kwargs):
+    kwargs.setdefault('value_len', 8)
+    return DenseFixedLengthValue(path, 'n', **kwargs)
+
+
+def _val(i):
+    return i.to_bytes(8, 'little')
+
+
+def test_roundtrip(tmp_path):
+    p = tmp_path / 'd.blt'
+    with _new_dense(p) as f:
+        for k in range(100):
+            f[k] = _val(k * 3)
+        assert len(f) == 100
+        assert f[42] == _val(126)
+        assert 99 in f
+        assert 100 not in f
+        assert f.get(1000) is None
+
+    with DenseFixedLengthValue(p) as f:
+        assert len(f) == 100
+        assert list(f.keys()) == list(range(100))
+        assert dict(f.items()) == {k: _val(k * 3) for k in range(100)}
+        assert list(f.values())[:2] == [_val(0), _val(3)]
+        assert f[7] == _val(21)
+        assert f.get(5000, b'') == b''
+
+
+def test_record_offsets_and_file_size(tmp_path):
+    p = tmp_path / 'd.blt'
+    with _new_dense(p) as f:
+        f[9] = _val(1)
+    assert p.stat().st_size == utils.sub_index_init_pos + 10 * 9
+    raw = p.read_bytes()
+    pos = utils.sub_index_init_pos + 9 * 9
+    assert raw[pos:pos + 9] == b'\x01' + _val(1)
+
+
+def test_overwrite_and_delete_in_place(tmp_path):
+    p = tmp_path / 'd.blt'
+    with _new_dense(p) as f:
+        for k in range(10):
+            f[k] = _val(k)
+        size0 = p.stat().st_size
+        for i in range(50):
+            f[3] = _val(i)
+        del f[5]
+        assert p.stat().st_size == size0
+        assert f[3] == _val(49)
+        assert 5 not in f
+        assert len(f) == 9
+        with pytest.raises(KeyError):
+            del f[5]
+        f[5] = _val(55)
+        assert len(f) == 10
+        assert f.prune() == 0
+
+    with DenseFixedLengthValue(p, 'w') as f:
+        assert len(f) == 10
+        assert f[5] == _val(55)
+
+
+def test_sparse_keys_and_update(tmp_path):
+    p = tmp_path / 'd.blt'
+    with _new_dense(p, key_serializer='uint8') as f:
+        f.update({0: _val(0), 1000: _val(1), 500: _val(2)})
+        assert list(f.keys()) == [0, 500, 1000]
+        assert len(f) == 3
+
+
+def test_invalid_keys_and_serializers(tmp_path):
+    with pytest.raises(ValueError):
+        DenseFixedLengthValue(tmp_path / 'x.blt', 'n', key_serializer='str', value_len=8)
+    with _new_dense(tmp_path / 'd.blt', key_serializer='uint1') as f:
+        with pytest.raises(OverflowError):
+            f[-1] = _val(0)
+        with pytest.raises(OverflowError):
+            f[256] = _val(0)
+        with pytest.raises(ValueError):
+            f[1] = b'short'
+
+
+def test_layouts_do_not_cross_open(tmp_path):
+    p = tmp_path / 'd.blt'
+    with _new_dense(p) as f:
+        f[1] = _val(1)
+    with pytest.raises(TypeError):
+        FixedLengthValue(p)
+    with pytest.raises(TypeError):
+        booklet.open(p)
+
+    p2 = tmp_path / 'f.blt'
+    with FixedLengthValue(p2, 'n', key_serializer='uint4', value_len=8) as f:
+        f[1] = _val(1)
+    with pytest.raises(TypeError):
+        DenseFixedLengthValue(p2)
+
+    ## Dense files have their own uuid, which older versions reject
+    assert p.read_bytes()[:16] == utils.uuid_dense_blt
+    assert p2.read_bytes()[:16] == utils.uuid_fixed_blt
+
+
+def test_huge_keys(tmp_path):
+    huge = 2**63 + 5
+    for path in (tmp_path / 'd.blt', io.BytesIO()):
+        with _new_dense(path, key_serializer='uint8') as f:
+            f[1] = _val(1)
+            assert f.get(huge, 'missing') == 'missing'
+            assert f.get(utils.dense_max_records) is None
+            assert huge not in f
+            with pytest.raises(OverflowError):
+                f[huge] = _val(0)
+            with pytest.raises(OverflowError):
+                f.update({2: _val(2), utils.dense_max_records: _val(0)})
+            with pytest.raises(OverflowError):
+                f.set_array([utils.dense_max_records], [_val(0)])
+            with pytest.raises(KeyError):
+                del f[huge]
+            assert dict(f.items()) == {1: _val(1)}
+    assert (tmp_path / 'd.blt').stat().st_size < 1000
+
+
+def test_clear_and_bytesio():
+    b = io.BytesIO()
+    with _new_dense(b) as f:
+        for k in range(5):
+            f[k] = _val(k)
+        f.clear()
+        assert len(f) == 0
+        assert list(f.keys()) == []
+        f[2] = _val(2)
+        assert dict(f.items()) == {2: _val(2)}
+
+
+def test_unsupported_features(tmp_path):
+    with _new_dense(tmp_path / 'd.blt') as f:
+        with pytest.raises(NotImplementedError):
+            f.set_metadata({'a': 1})
+        with pytest.raises(NotImplementedError):
+            f.get_metadata()
+        with pytest.raises(NotImplementedError):
+            f.set_reserved(1, b'x')
+        with pytest.raises(NotImplementedError):
+            f.get_reserved(1, include_timestamp=True)
+        with pytest.raises(ValueError):
+            f.set(1, _val(1), timestamp=1000)
+
+
+def test_locations(tmp_path):
+    ## Same signature and tuple shape as the hashed classes
+    p = tmp_path / 'd.blt'
+    with _new_dense(p) as f:
+        for k in (0, 3, 9):
+            f[k] = _val(k)
+        del f[3]
+        locs = list(f.locations())
+        assert [(k, ts, n) for k, ts, _, n in locs] == [(0, None, 8), (9, None, 8)]
+        f.sync()
+    data = p.read_bytes()
+    for k, _, offset, n in locs:
+        assert data[offset:offset + n] == _val(k)
+
+
+def test_crash_recount(tmp_path):
+    p = tmp_path / 'd.blt'
+    f = _new_dense(p)
+    for k in range(7):
+        f[k] = _val(k)
+    f.sync()
+    ## Simulate an unclean close: the finalizer writes the crash sentinel
+    f._finalizer()
+    with DenseFixedLengthValue(p, 'w') as f:
+        assert len(f) == 7
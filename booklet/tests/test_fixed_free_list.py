@@ -0,0 +1,203 @@
+"""
+Tests for the fixed-length slot free-list: deleted slots are recorded in a
+persistent per-key-length free-list (header bytes 77-141) and reused by the
+next new key of the same key length, so churn does not grow the file.
+"""
+import io
+
+from booklet import FixedLengthValue, utils
+
+
+def _new_fixed(path, **kwargs):
+    kwargs.setdefault('key_serializer', 'uint4')
+    kwargs.setdefault('value_len', 8)
+    kwargs.setdefault('n_buckets', 101)
+    return FixedLengthValue(path, 'n', **kwargs)
+
+
+def _val(i):
+    return i.to_bytes(8, 'little')
+
+
+def test_deleted_slot_is_reused(tmp_path):
+    p = tmp_path / 'f.blt'
+    with _new_fixed(p) as f:
+        for k in range(20):
+            f[k] = _val(k)
+        f.sync()
+        size0 = p.stat().st_size
+
+        del f[5]
+        f[100] = _val(100)
+        f.sync()
+
+        assert p.stat().st_size == size0
+        assert 5 not in f
+        assert f[100] == _val(100)
+        assert len(f) == 20
+        assert sorted(f.keys()) == sorted([k for k in range(20) if k != 5] + [100])
+        ## The only free slot was consumed
+        assert utils.read_free_slots_fixed(p.read_bytes()[:200]) == {}
+
+
+def test_churn_keeps_file_size_constant(tmp_path):
+    p = tmp_path / 'f.blt'
+    expected = {}
+    with _new_fixed(p) as f:
+        for k in range(50):
+            f[k] = _val(k)
+            expected[k] = _val(k)
+        f.sync()
+        size0 = p.stat().st_size
+
+        next_key = 50
+        for cycle in range(20):
+            for k in sorted(expected)[:10]:
+                del f[k]
+                del expected[k]
+            for _ in range(10):
+                f[next_key] = _val(next_key)
+                expected[next_key] = _val(next_key)
+                next_key += 1
+        f.sync()
+
+        assert p.stat().st_size == size0
+        assert dict(f.items()) == expected
+        assert len(f) == len(expected)
+
+    with FixedLengthValue(p) as f:
+        assert dict(f.items()) == expected
+        for k, v in expected.items():
+            assert f[k] == v
+
+
+def test_free_list_persists_across_reopen(tmp_path):
+    p = tmp_path / 'f.blt'
+    with _new_fixed(p) as f:
+        for k in range(10):
+            f[k] = _val(k)
+        f.sync()
+        del f[3]
+        del f[4]
+    size0 = p.stat().st_size
+    assert len(utils.read_free_slots_fixed(p.read_bytes()[:200])) == 1
+
+    with FixedLengthValue(p, 'w') as f:
+        f[30] = _val(30)
+        f[40] = _val(40)
+        f[50] = _val(50)
+    assert p.stat().st_size == size0 + (utils.key_hash_len + utils.n_bytes_file + utils.n_bytes_key + 4 + 8)
+
+    with FixedLengthValue(p) as f:
+        assert sorted(f.keys()) == [0, 1, 2, 5, 6, 7, 8, 9, 30, 40, 50]
+        assert f[40] == _val(40)
+
+
+def test_keys_of_other_lengths_do_not_reuse(tmp_path):
+    p = tmp_path / 'f.blt'
+    with FixedLengthValue(p, 'n', key_serializer='str', value_len=4, n_buckets=101) as f:
+        f['aa'] = b'1111'
+        f['bb'] = b'2222'
+        f.sync()
+        size0 = p.stat().st_size
+        del f['aa']
+
+        f['ccc'] = b'3333'
+        f.sync()
+        assert p.stat().st_size > size0
+        size1 = p.stat().st_size
+
+        f['dd'] = b'4444'
+        f.sync()
+        assert p.stat().st_size == size1
+        assert dict(f.items()) == {'bb': b'2222', 'ccc': b'3333', 'dd': b'4444'}
+
+
+def test_prune_and_clear_reset_free_list(tmp_path):
+    p = tmp_path / 'f.blt'
+    with _new_fixed(p) as f:
+        for k in range(10):
+            f[k] = _val(k)
+        f.sync()
+        del f[1]
+        del f[2]
+        assert f.prune() == 2
+        assert utils.read_free_slots_fixed(p.read_bytes()[:200]) == {}
+
+        f[20] = _val(20)
+        assert dict(f.items()) == {k: _val(k) for k in [0, 3, 4, 5, 6, 7, 8, 9, 20]}
+
+        del f[3]
+        f.clear()
+        assert utils.read_free_slots_fixed(p.read_bytes()[:200]) == {}
+        f[1] = _val(1)
+        assert dict(f.items()) == {1: _val(1)}
+
+
+def test_stale_head_is_dropped(tmp_path):
+    p = tmp_path / 'f.blt'
+    with _new_fixed(p) as f:
+        for k in range(10):
+            f[k] = _val(k)
+        f.sync()
+
+        ## Point the free-list at a live block, as a free-list-unaware writer could leave it
+        f._free_slots[4] = f._first_data_block_pos
+        utils.write_free_slots_fixed(f._file, f._free_slots)
+
+        f[10] = _val(10)
+        f.sync()
+        assert f._free_slots == {}
+        assert dict(f.items()) == {k: _val(k) for k in range(11)}
+
+
+def test_init_bytes_does_not_inherit_free_list(tmp_path):
+    p = tmp_path / 'f.blt'
+    with _new_fixed(p) as f:
+        for k in range(10):
+            f[k] = _val(k)
+        f.sync()
+        del f[1]
+    init_bytes = p.read_bytes()[:200]
+    assert utils.read_free_slots_fixed(init_bytes)
+
+    p2 = tmp_path / 'g.blt'
+    with FixedLengthValue(p2, 'n', init_bytes=init_bytes) as f:
+        assert f._free_slots == {}
+        f[1] = _val(1)
+        assert dict(f.items()) == {1: _val(1)}
+    assert utils.read_free_slots_fixed(p2.read_bytes()[:200]) == {}
+
+
+def test_legacy_filler_parses_as_empty():
+    header = bytearray(200)
+    header[utils.free_list_pos:] = b'0' * (200 - utils.free_list_pos)
+    assert utils.read_free_slots_fixed(header) == {}
+
+
+def test_free_list_bytesio():
+    b = io.BytesIO()
+    with _new_fixed(b) as f:
+        for k in range(10):
+            f[k] = _val(k)
+        f.sync()
+        size0 = len(b.getvalue())
+        del f[0]
+        f[11] = _val(11)
+        f.sync()
+        assert len(b.getvalue()) == size0
+        assert sorted(f.keys()) == [1, 2, 3, 4, 5, 6, 7, 8, 9, 11]
+
+
+def test_recycled_key_count_persists(tmp_path):
+    p = tmp_path / 'f.blt'
+    with _new_fixed(p) as f:
+        for k in range(10):
+            f[k] = _val(k)
+        f.sync()
+        del f[0]
+    with FixedLengthValue(p, 'w') as f:
+        ## Only a recycled write: nothing goes through the append buffer
+        f[20] = _val(20)
+    with FixedLengthValue(p) as f:
+        assert len(f) == 10
@@ -0,0 +1,119 @@
+"""
+Tests for the fixed-length in-place write path: overwrites of existing keys
+rewrite the value bytes of the existing block (no new block, no index change),
+so a hot fixed-width store stays at a constant file size.
+"""
+import io
+
+import pytest
+
+from booklet import FixedLengthValue, utils
+
+
+def _new_fixed(path, **kwargs):
+    kwargs.setdefault('key_serializer', 'uint4')
+    kwargs.setdefault('value_len', 8)
+    kwargs.setdefault('n_buckets', 101)
+    return FixedLengthValue(path, 'n', **kwargs)
+
+
+def test_overwrite_keeps_file_size_constant(tmp_path):
+    p = tmp_path / 'f.blt'
+    with _new_fixed(p) as f:
+        for k in range(50):
+            f[k] = (0).to_bytes(8, 'little')
+        f.sync()
+        size0 = p.stat().st_size
+        for i in range(1, 200):
+            for k in range(50):
+                f[k] = i.to_bytes(8, 'little')
+        f.sync()
+        assert p.stat().st_size == size0
+        assert len(f) == 50
+        assert f.prune() == 0
+
+    with FixedLengthValue(p) as f:
+        assert dict(f.items()) == {k: (199).to_bytes(8, 'little') for k in range(50)}
+
+
+def test_overwrite_block_position_unchanged(tmp_path):
+    p = tmp_path / 'f.blt'
+    with _new_fixed(p) as f:
+        f[1] = b'a' * 8
+        f.sync()
+        key_hash = utils.hash_key(f._pre_key(1))
+        pos0 = utils.get_last_data_block_pos(f._file, key_hash, f._n_buckets, f._index_offset)
+        f[1] = b'b' * 8
+        f.update({1: b'c' * 8})
+        pos1 = utils.get_last_data_block_pos(f._file, key_hash, f._n_buckets, f._index_offset)
+        assert pos0 == pos1
+        assert f[1] == b'c' * 8
+
+
+def test_overwrite_of_buffered_key_appends(tmp_path):
+    p = tmp_path / 'f.blt'
+    with _new_fixed(p) as f:
+        ## Not on disk yet - the second write goes through the buffer and the
+        ## flush tombstones the first block (prune reclaims it).
+        f[1] = b'a' * 8
+        f[1] = b'b' * 8
+        assert f[1] == b'b' * 8
+        assert len(f) == 1
+        assert f.prune() == 1
+        assert f[1] == b'b' * 8
+
+
+def test_overwrite_after_reindex_and_prune(tmp_path):
+    p = tmp_path / 'f.blt'
+    with _new_fixed(p, n_buckets=11) as f:
+        for k in range(100):
+            f[k] = k.to_bytes(8, 'little')
+        f.sync()
+        del f[0]
+        f.prune()
+        size0 = p.stat().st_size
+        for k in range(1, 100):
+            f[k] = (k * 2).to_bytes(8, 'little')
+        f.sync()
+        assert p.stat().st_size == size0
+        for k in range(1, 100):
+            assert f[k] == (k * 2).to_bytes(8, 'little')
+
+
+def test_overwrite_bytesio():
+    b = io.BytesIO()
+    with FixedLengthValue(b, 'n', key_serializer='str', value_len=4) as f:
+        f['a'] = b'1111'
+        f.sync()
+        n0 = len(b.getvalue())
+        f['a'] = b'2222'
+        f.sync()
+        assert len(b.getvalue()) == n0
+        assert f['a'] == b'2222'
+
+
+def test_wrong_length_still_rejected(tmp_path):
+    with _new_fixed(tmp_path / 'f.blt') as f:
+        f[1] = b'a' * 8
+        f.sync()
+        with pytest.raises(ValueError):
+            f[1] = b'a' * 7
+        assert f[1] == b'a' * 8
+
+
+def test_skip_block_fixed_large_region_tiles_exactly():
+    """A dead region larger than one block's key_len field can describe is
+    covered by several skip blocks that tile it exactly."""
+    vlen = 8
+    dead = 300_000
+    buf = io.BytesIO(b'\xff' * (dead + 10))
+    utils.write_skip_block_fixed(buf, 0, dead, vlen)
+    data = buf.getvalue()
+    overhead = utils.key_hash_len + utils.n_bytes_file + utils.n_bytes_key
+    pos = 0
+    while pos < dead:
+        assert data[pos + utils.key_hash_len:pos + utils.key_hash_len + utils.n_bytes_file] == b'\x00' * utils.n_bytes_file
+        key_len = int.from_bytes(data[pos + overhead - utils.n_bytes_key:pos + overhead], 'little')
+        assert key_len >= 1
+        pos += overhead + key_len + vlen
+    assert pos == dead
@@ -0,0 +1,74 @@
+"""
+Tests for iter_batches: a batch of blocks read per lock acquisition, raw
+batches, NumPy value batches for fixed-length booklets and the per-batch
+mutation check.
+"""
+import pytest
+
+import booklet
+from booklet import DenseFixedLengthValue, FixedLengthValue
+
+
+def test_raw_batches_and_indirect_values(tmp_path):
+    p = tmp_path / 'a.blt'
+    with booklet.open(p, 'n', key_serializer='uint4', value_serializer='pickle', blob_threshold=1000, dedup_threshold=100) as db:
+        for i in range(250):
+            db[i] = bytes([i % 3]) * (i * 8)
+        expected = {db._pre_key(k): db._pre_value(v) for k, v in db.items()}
+
+        batches = list(db.iter_batches(100, 'raw'))
+        assert [len(b) for b in batches] == [100, 100, 50]
+        assert {bytes(k): bytes(v) for b in batches for k, v in b} == expected
+
+    with booklet.open(p) as db:
+        assert {bytes(k): bytes(v) for b in db.iter_batches(64, 'raw') for k, v in b} == expected
+        assert dict(pair for b in db.iter_batches(64) for pair in b) == dict(db.items())
+        with pytest.raises(ValueError):
+            next(db.iter_batches(as_numpy=True))
+
+
+def test_mutation_checked_per_batch():
+    import io
+
+    with booklet.open(io.BytesIO(), 'n', key_serializer='uint4', value_serializer='pickle') as db:
+        db.update({i: i for i in range(30)})
+        it = db.iter_batches(10, 'keys')
+        first = next(it)
+        ## Reads are fine between batches
+        assert db[first[0]] == first[0]
+        assert len(next(it)) == 10
+        db[100] = 1
+        with pytest.raises(RuntimeError):
+            next(it)
+
+
+def test_numpy_batches_fixed(tmp_path):
+    np = pytest.importorskip('numpy')
+    p = tmp_path / 'f.blt'
+    with FixedLengthValue(p, 'n', key_serializer='uint4', value_len=8) as f:
+        for k in range(25):
+            f[k] = k.to_bytes(8, 'little')
+
+    with FixedLengthValue(p) as f:
+        arrays = list(f.iter_batches(10, 'values', as_numpy=True))
+        assert [a.shape for a in arrays] == [(10, 8), (10, 8), (5, 8)]
+        assert all(a.dtype == np.uint8 for a in arrays)
+        keys, values = zip(*f.iter_batches(10, 'items', as_numpy=True))
+        keys = [k for b in keys for k in b]
+        values = np.concatenate(values).view('<u8').ravel()
+        assert values.tolist() == keys
+        raw_keys, _ = next(f.iter_batches(3, 'raw', as_numpy=True))
+        assert [f._post_key(k) for k in raw_keys] == keys[:3]
+        with pytest.raises(ValueError):
+            next(f.iter_batches(what='keys', as_numpy=True))
+
+
+def test_numpy_batches_dense(tmp_path):
+    np = pytest.importorskip('numpy')
+    with DenseFixedLengthValue(tmp_path / 'd.blt', 'n', value_len=2) as f:
+        f.update({k: k.to_bytes(2, 'little') for k in (0, 3, 9)})
+        keys, values = next(f.iter_batches(what='raw', as_numpy=True))
+        assert keys.dtype == np.uint64
+        assert keys.tolist() == [0, 3, 9]
+        assert values.view('<u2').ravel().tolist() == [0, 3, 9]
+        assert list(f.iter_batches(2, 'raw')) == [[(0, b'\x00\x00'), (3, b'\x03\x00')], [(9, b'\x09\x00')]]
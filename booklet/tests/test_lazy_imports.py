@@ -0,0 +1,54 @@
+"""
+Tests for the lazy optional-dependency imports in booklet.serializers:
+importing booklet must not import any serializer backend.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from booklet import serializers
+
+optional_modules = ('numpy', 'pandas', 'geopandas', 'pyarrow', 'shapely', 'zstandard', 'msgpack')
+
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _run(code):
+    env = dict(os.environ, PYTHONPATH=repo_root + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, env=env).stdout.strip()
+
+
+def test_import_does_not_load_backends():
+    loaded = _run(f"import sys, booklet; print(','.join(m for m in {optional_modules!r} if m in sys.modules))")
+    assert loaded == ''
+
+
+def test_backend_loads_on_first_use(tmp_path):
+    pytest.importorskip('zstandard')
+    p = str(tmp_path / 'z.blt')
+    code = (
+        "import sys, booklet\n"
+        f"with booklet.open({p!r}, 'n', key_serializer='str', value_serializer='zstd') as db:\n"
+        "    db['a'] = b'x' * 100\n"
+        "assert 'zstandard' in sys.modules\n"
+        f"print(booklet.open({p!r})['a'] == b'x' * 100)\n"
+        )
+    assert _run(code) == 'True'
+
+
+def test_imports_reports_installed_backends():
+    for name, module_name in (('numpy', 'numpy'), ('zstd', 'zstandard'), ('msgpack', 'msgpack')):
+        try:
+            __import__(module_name)
+        except ImportError:
+            assert name not in serializers.imports
+        else:
+            assert name in serializers.imports
+
+
+def test_missing_backend_raises_on_use():
+    lazy = serializers._LazyModule('booklet_no_such_backend')
+    with pytest.raises(ImportError):
+        lazy.dumps
@@ -2,7 +2,8 @@
 Tests for the 0.12.8 locations() header-only iterator and the compaction_count
 property: physical (offset, length) resolution of value bytes for external
 readers, the append-only validity contract (offsets survive overwrite/delete/
-auto-reindex, die on prune/clear), and the fixed-length refusal.
+auto-reindex, die on prune/clear), fixed-length and dense locations, and
+the batched utils.read_locations reader.
 """
 import io
 
@@ -167,18 +168,93 @@ def test_read_mode_mmap_path(tmp_path):
             assert ts == f.get_timestamp(k)
 
 
-def test_fixed_length_raises(tmp_path):
+def test_fixed_length_locations(tmp_path):
     p = tmp_path / 'fx.blt'
     with booklet.FixedLengthValue(p, 'n', key_serializer='str', value_len=5, n_buckets=101) as f:
         f['k1'] = b'AAAAA'
-        f['k1'] = b'BBBBB'   # dead block so prune has work
-        with pytest.raises(NotImplementedError):
-            list(f.locations())
+        f['k2'] = b'CCCCC'
+        f['k1'] = b'BBBBB'   # fixed overwrites are in place
+        f['key3'] = b'DDDDD'
+        locs = _locs(f)
+        assert set(locs) == {'k1', 'k2', 'key3'}
+        assert all(ts is None and ln == 5 for ts, off, ln in locs.values())
+        assert _read_at(p, *locs['k1'][1:]) == b'BBBBB'
+        assert _read_at(p, *locs['key3'][1:]) == b'DDDDD'
+
         ## compaction_count stays inherited and meaningful on fixed files.
         assert f.compaction_count == 0
+        del f['k2']
         f.prune()
         assert f.compaction_count == 1
 
+    with booklet.FixedLengthValue(p) as f:
+        locs = _locs(f)
+        assert set(locs) == {'k1', 'key3'}
+        assert _read_at(p, *locs['key3'][1:]) == b'DDDDD'
+
+
+def test_dense_locations(tmp_path):
+    p = tmp_path / 'd.blt'
+    with booklet.DenseFixedLengthValue(p, 'n', value_len=4) as f:
+        for k in (0, 3, 7):
+            f[k] = bytes([k]) * 4
+        locs = list(f.locations())
+    assert [key for key, ts, off, ln in locs] == [0, 3, 7]
+    for key, ts, off, ln in locs:
+        assert _read_at(p, off, ln) == bytes([key]) * 4
+
+
+def test_read_locations(tmp_path):
+    p = tmp_path / 'f.blt'
+    data = {f'k{i}': bytes([i % 256]) * (i * 7 + 1) for i in range(300)}
+    with _new_file(p) as f:
+        for k, v in data.items():
+            f[k] = v
+        f['k5'] = b'overwritten'
+        data['k5'] = b'overwritten'
+        f['gap'] = b'x' * 10
+
+    with booklet.open(p) as f:
+        locs = [loc for loc in f.locations() if loc[0] != 'gap']
+    ## Out of file order, with a duplicate
+    locs = locs[::-1] + locs[:3]
+    expected = [data[key] for key, ts, off, ln in locs]
+
+    with open(p, 'rb') as fd:
+        assert utils.read_locations(fd, locs) == expected
+        assert utils.read_locations(fd.fileno(), [loc[2:] for loc in locs], n_threads=4) == expected
+
+        total = sum(len(v) for v in expected)
+        buf = bytearray(total + 5)
+        assert utils.read_locations(fd, locs, into=buf) == total
+        assert bytes(buf[:total]) == b''.join(expected)
+
+        with pytest.raises(ValueError):
+            utils.read_locations(fd, locs, into=bytearray(10))
+        with pytest.raises(ValueError):
+            utils.read_locations(fd, [(p.stat().st_size - 2, 10)])
+
+    assert utils.read_locations(0, []) == []
+
+
+def test_read_locations_coalesces_adjacent(tmp_path, monkeypatch):
+    p = tmp_path / 'raw.bin'
+    p.write_bytes(bytes(range(256)) * 4)
+    calls = []
+    preadv = utils.os.preadv
+
+    def counting_preadv(fd, buffers, offset):
+        calls.append(len(buffers))
+        return preadv(fd, buffers, offset)
+
+    monkeypatch.setattr(utils.os, 'preadv', counting_preadv)
+    locs = [(10, 5), (0, 10), (15, 1), (100, 3), (103, 0), (103, 7)]
+    with open(p, 'rb') as fd:
+        out = utils.read_locations(fd, locs)
+    raw = p.read_bytes()
+    assert out == [raw[o:o + n] for o, n in locs]
+    assert sorted(calls) == [3, 3]
+
 
 def test_no_timestamp_file_yields_none(tmp_path):
     p = tmp_path / 'f.blt'
@@ -29,6 +29,10 @@ def identity(key, value):
     return (key, value)
 
 
+def make_new_key_bytes(key, value):
+    return (f"processed_{key}", value[::-1])
+
+
 def fixed_transform(key, value):
     """Transform for fixed-length: reverse the bytes."""
     return (key, value[::-1])
@@ -132,3 +136,213 @@ def test_map_fixed_length():
 
         for k in data:
             assert results[k] == b'\x00' * 8  # reversed null bytes are still null bytes
+
+
+def value_len(key, value):
+    return (key, len(value))
+
+
+def test_map_reads_in_workers(tmp_path):
+    ## Blob, dedup and pending buffered values, read by workers while the
+    ## parent holds the write lock
+    p = tmp_path / 'a.blt'
+    with booklet.open(p, 'n', key_serializer='uint4', blob_threshold=1000, dedup_threshold=100) as db:
+        for i in range(500):
+            db[i] = bytes([i % 7]) * (i * 10)
+        results = dict(db.map(value_len, n_workers=3))
+        assert results == {i: i * 10 for i in range(500)}
+
+        db[1000] = b'pending'
+        assert dict(db.map(value_len, keys=[1000, 499, 12345], n_workers=2)) == {1000: 7, 499: 4990}
+
+
+def test_map_dense():
+    with NamedTemporaryFile() as tf:
+        with booklet.DenseFixedLengthValue(tf.name, 'n', value_len=4) as db:
+            for k in (0, 3, 10, 11):
+                db[k] = k.to_bytes(4, 'little')
+            results = dict(db.map(fixed_transform, n_workers=2))
+        assert results == {k: k.to_bytes(4, 'little')[::-1] for k in (0, 3, 10, 11)}
+
+
+def test_map_executors_chunksize_and_order(tmp_path):
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    p = tmp_path / 'a.blt'
+    data = {i: i * 10 for i in range(300)}
+    with booklet.open(p, 'n', key_serializer='uint4', value_serializer='pickle') as db:
+        db.update(data)
+        expected = {k: v * 2 for k, v in data.items()}
+        file_order = list(db.keys())
+
+        assert dict(db.map(double_value, n_workers=2, executor='thread')) == expected
+        ## Closures are fine without pickling
+        assert dict(db.map(lambda k, v: (k, v + 1), executor='thread', chunksize=7)) == {k: v + 1 for k, v in data.items()}
+
+        keys = list(range(299, -1, -3))
+        for executor in ('process', 'thread'):
+            results = list(db.map(double_value, keys=keys, n_workers=3, executor=executor, chunksize=5, ordered=True))
+            assert [k for k, v in results] == keys
+            results = list(db.map(identity, n_workers=3, executor=executor, chunksize=10, ordered=True))
+            assert [k for k, v in results] == file_order
+
+        ## A persistent executor of the caller is reused and left running
+        with ProcessPoolExecutor(2) as pool:
+            for _ in range(2):
+                assert dict(db.map(double_value, executor=pool, chunksize=50)) == expected
+            assert dict(db.map(double_value, keys=[5, 6], executor=pool)) == {5: 100, 6: 120}
+        with ThreadPoolExecutor(2) as pool:
+            assert list(db.map(identity, keys=keys, executor=pool, chunksize=4, ordered=True)) == [(k, data[k]) for k in keys]
+
+
+def test_map_executor_errors_and_bytesio():
+    import io
+    import pytest
+
+    b = io.BytesIO()
+    with booklet.open(b, 'n', key_serializer='uint4', value_serializer='pickle') as db:
+        for i in range(20):
+            db[i] = i
+        with pytest.raises(ValueError):
+            list(db.map(double_value, executor='fork'))
+        with pytest.raises(ValueError):
+            list(db.map(double_value, chunksize=0))
+        for executor in ('process', 'thread'):
+            assert dict(db.map(double_value, n_workers=2, executor=executor, chunksize=3)) == {i: i * 2 for i in range(20)}
+            assert list(db.map(double_value, keys=[3, 99, 1], executor=executor, ordered=True)) == [(3, 6), (1, 2)]
+
+
+def test_map_update(tmp_path):
+    import pytest
+
+    p = tmp_path / 'a.blt'
+    data = {i: i * 10 for i in range(1, 2001)}
+    with booklet.open(p, 'n', key_serializer='uint4', value_serializer='pickle', n_buckets=101) as db:
+        db.update(data)
+        assert db.map_update(double_value, n_workers=3) == 2000
+        assert dict(db.items()) == {k: v * 2 for k, v in data.items()}
+
+        size = p.stat().st_size
+        assert db.map_update(skip_even, keys=range(1, 101), executor='thread', compact=True) == 50
+        assert p.stat().st_size < size
+        assert len(db) == 2000
+        assert db[3] == 60
+        assert db[4] == 80
+
+    with booklet.open(p) as db:
+        assert db._n_buckets > 101
+        assert db[2000] == 40000
+        with pytest.raises(ValueError):
+            db.map_update(double_value)
+
+
+def test_map_update_fixed_new_keys():
+    with NamedTemporaryFile() as tf:
+        with FixedLengthValue(tf.name, 'n', key_serializer='str', value_len=4) as db:
+            for i in range(50):
+                db[str(i)] = bytes([i, 1, 2, 3])
+            assert db.map_update(make_new_key_bytes, n_workers=2) == 50
+            assert len(db) == 100
+            assert db['processed_7'] == bytes([3, 2, 1, 7])
+            assert db['7'] == bytes([7, 1, 2, 3])
+
+
+def test_map_reader_follows_chains_past_its_map(tmp_path):
+    ## A worker's mmap is sized when it opens; blocks the parent links in
+    ## afterwards are remapped rather than reported missing
+    from booklet.parallel import _open_reader
+
+    p = tmp_path / 'a.blt'
+    with booklet.open(p, 'n', key_serializer='uint4', value_serializer='pickle', n_buckets=1009) as db:
+        db.update({i: i for i in range(50)})
+        db.sync()
+        reader = _open_reader(type(db), str(p))
+        try:
+            db.update({i: i + 1000 for i in range(0, 100, 2)})
+            db.sync()
+            assert len(reader._mmap) < p.stat().st_size
+            for i in range(100):
+                expected = i + 1000 if i % 2 == 0 else (i if i < 50 else None)
+                assert reader.get(i) == expected
+                assert (i in reader) == (expected is not None)
+        finally:
+            reader.close()
+
+    with NamedTemporaryFile() as tf:
+        with FixedLengthValue(tf.name, 'n', key_serializer='uint4', value_len=4, n_buckets=1009) as db:
+            db[1] = b'abcd'
+            db.sync()
+            reader = _open_reader(type(db), tf.name)
+            try:
+                db[1] = b'wxyz'
+                db[2] = b'efgh'
+                db.sync()
+                assert reader[1] == b'wxyz'
+                assert reader[2] == b'efgh'
+            finally:
+                reader.close()
+
+        with booklet.DenseFixedLengthValue(tf.name, 'n', value_len=4) as db:
+            db[0] = b'abcd'
+            db.sync()
+            reader = _open_reader(type(db), tf.name)
+            try:
+                db[500] = b'wxyz'
+                db.sync()
+                assert reader[500] == b'wxyz'
+            finally:
+                reader.close()
+
+
+def slow_double(key, value):
+    import time
+    time.sleep(0.0001)
+    return (key, value * 2)
+
+
+def test_map_update_small_buffer_slow_func(tmp_path):
+    ## Many buffer flushes while the workers are still reading
+    p = tmp_path / 'a.blt'
+    n = 3000
+    with booklet.open(p, 'n', key_serializer='uint4', value_serializer='pickle', buffer_size=2**12) as db:
+        db.update({i: i for i in range(n)})
+        for executor in ('process', 'thread'):
+            assert db.map_update(slow_double, keys=list(range(n)), n_workers=2, executor=executor) == n
+        assert len(db) == n
+        assert dict(db.items()) == {i: i * 4 for i in range(n)}
+
+
+def test_map_update_streams_batches(tmp_path, monkeypatch):
+    ## Results are written a batch at a time as they arrive, so memory stays
+    ## bounded by the batch size rather than the dataset
+    from booklet import utils
+
+    monkeypatch.setattr(utils, 'codec_batch_size', 100)
+    p = tmp_path / 'a.blt'
+    n = 1000
+    with booklet.open(p, 'n', key_serializer='uint4', value_serializer='pickle') as db:
+        db.update({i: i for i in range(n)})
+
+        consumed = []
+        batch_sizes = []
+        map0 = db.map
+        update0 = db.update
+
+        def counting_map(*args, **kwargs):
+            for result in map0(*args, **kwargs):
+                consumed.append(result)
+                yield result
+
+        def recording_update(mapping):
+            batch_sizes.append((len(consumed), len(mapping)))
+            return update0(mapping)
+
+        monkeypatch.setattr(db, 'map', counting_map)
+        monkeypatch.setattr(db, 'update', recording_update)
+        assert db.map_update(double_value, n_workers=2, chunksize=50) == n
+
+        assert len(batch_sizes) == n // 100
+        assert all(size == 100 for n_consumed, size in batch_sizes)
+        ## The first batch is written long before the map has finished
+        assert batch_sizes[0][0] < n
+        assert dict(db.items()) == {i: i * 2 for i in range(n)}
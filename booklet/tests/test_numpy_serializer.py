@@ -0,0 +1,83 @@
+"""
+Tests for the general numpy value serializer: dtype, shape and order in a
+small header, and read-only views over the mmap in read mode.
+"""
+import gc
+import io
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import booklet
+from booklet import serializers
+
+
+def _root(arr):
+    while isinstance(arr, np.ndarray):
+        arr = arr.base
+    return arr
+
+
+@pytest.mark.parametrize('arr', [
+    np.arange(10.0),
+    np.arange(24, dtype='>i4').reshape(2, 3, 4),
+    np.asfortranarray(np.arange(12.0).reshape(3, 4)),
+    np.arange(20)[::3],
+    np.zeros((0, 5), 'f4'),
+    np.float32(2.5),
+    np.array(['ab', 'c']),
+    np.array([1 + 2j, 3 - 1j]),
+    np.zeros(3, [('a', '<u4'), ('b', '<f8', (2,))]),
+])
+def test_roundtrip(arr):
+    data = serializers.Numpy.dumps(arr)
+    for buf in (data, memoryview(data)):
+        out = serializers.Numpy.loads(buf)
+        assert out.dtype == arr.dtype
+        assert out.shape == np.shape(arr)
+        assert (out == arr).all()
+        assert not out.flags.writeable
+
+
+def test_fortran_order_is_kept():
+    arr = np.asfortranarray(np.arange(12.0).reshape(3, 4))
+    out = serializers.Numpy.loads(serializers.Numpy.dumps(arr))
+    assert out.flags.f_contiguous and not out.flags.c_contiguous
+
+
+def test_object_arrays_rejected():
+    with pytest.raises(TypeError):
+        serializers.Numpy.dumps(np.array([1, 'a'], dtype=object))
+
+
+def test_read_mode_returns_views(tmp_path):
+    p = tmp_path / 'a.blt'
+    arrs = {f'k{i}': np.random.default_rng(i).random((50, 20)) for i in range(5)}
+    with booklet.open(p, 'n', key_serializer='str', value_serializer='numpy') as db:
+        db.update(arrs)
+        ## Write mode has no mmap: values are decoded from a copy
+        assert isinstance(_root(db['k0']), bytes)
+
+    with booklet.open(p) as db:
+        out = db['k3']
+        assert (out == arrs['k3']).all()
+        assert not out.flags.owndata
+        assert not out.flags.writeable
+        assert isinstance(_root(out), memoryview)
+        got = dict(db.get_items(['k1', 'k4', 'missing']))
+        assert got['missing'] is None
+        assert (got['k4'] == arrs['k4']).all()
+        assert (db.get('k2') == arrs['k2']).all()
+
+    ## The views outlive the file
+    assert (out == arrs['k3']).all()
+    del out, got
+    gc.collect()
+
+
+def test_bytesio():
+    b = io.BytesIO()
+    with booklet.open(b, 'n', key_serializer='uint4', value_serializer='numpy') as db:
+        db[1] = np.arange(6, dtype='u2').reshape(2, 3)
+        assert db[1].tolist() == [[0, 1, 2], [3, 4, 5]]
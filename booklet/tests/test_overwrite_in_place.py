@@ -0,0 +1,166 @@
+"""
+Tests for the opt-in variable-length in-place overwrite mode
+(overwrite_in_place=True): an overwrite whose new value fits inside the
+existing block is rewritten there, with any trailing slack covered by a
+skip block that prune reclaims.
+"""
+import io
+
+import booklet
+
+
+def _new_file(path, **kwargs):
+    kwargs.setdefault('key_serializer', 'str')
+    kwargs.setdefault('value_serializer', 'bytes')
+    kwargs.setdefault('n_buckets', 101)
+    return booklet.open(path, 'n', overwrite_in_place=True, **kwargs)
+
+
+def _value_offset(db, key):
+    for k, ts, offset, length in db.locations():
+        if k == key:
+            return offset, length
+
+
+def test_same_length_overwrite_is_in_place(tmp_path):
+    p = tmp_path / 'v.blt'
+    with _new_file(p) as db:
+        db['status'] = b'running!'
+        db.sync()
+        size0 = p.stat().st_size
+        loc0 = _value_offset(db, 'status')
+
+        for i in range(100):
+            db['status'] = str(i % 10).encode() * 8
+        db.sync()
+
+        assert p.stat().st_size == size0
+        assert _value_offset(db, 'status') == loc0
+        assert db['status'] == b'9' * 8
+        assert db.prune() == 0
+
+
+def test_shrinking_overwrite_leaves_skip_block(tmp_path):
+    p = tmp_path / 'v.blt'
+    with _new_file(p) as db:
+        db['a'] = b'x' * 200
+        db['b'] = b'y' * 10
+        db.sync()
+        size0 = p.stat().st_size
+        offset0, _ = _value_offset(db, 'a')
+
+        db['a'] = b'short'
+        db.sync()
+
+        assert p.stat().st_size == size0
+        assert _value_offset(db, 'a') == (offset0, 5)
+        assert dict(db.items()) == {'a': b'short', 'b': b'y' * 10}
+        assert len(db) == 2
+
+        ## The slack is dead space
+        assert db.prune() == 1
+        assert dict(db.items()) == {'a': b'short', 'b': b'y' * 10}
+
+    with booklet.open(p) as db:
+        assert dict(db.items()) == {'a': b'short', 'b': b'y' * 10}
+
+
+def test_timestamp_is_rewritten(tmp_path):
+    p = tmp_path / 'v.blt'
+    with _new_file(p) as db:
+        db.set('k', b'abcdef', timestamp=1000)
+        db.sync()
+        db.set('k', b'abc', timestamp=2000)
+        db.sync()
+        assert db.get_timestamp('k', include_value=True) == (2000, b'abc')
+
+
+def test_growing_or_tiny_slack_overwrite_appends(tmp_path):
+    p = tmp_path / 'v.blt'
+    with _new_file(p) as db:
+        db['k'] = b'x' * 10
+        db.sync()
+        size0 = p.stat().st_size
+
+        ## Larger value: append
+        db['k'] = b'x' * 20
+        db.sync()
+        size1 = p.stat().st_size
+        assert size1 > size0
+
+        ## 1 byte of slack cannot hold a skip block: append
+        db['k'] = b'x' * 19
+        db.sync()
+        assert p.stat().st_size > size1
+        assert db['k'] == b'x' * 19
+        assert db.prune() == 2
+
+
+def test_default_mode_still_appends(tmp_path):
+    p = tmp_path / 'v.blt'
+    with booklet.open(p, 'n', key_serializer='str', value_serializer='bytes', n_buckets=101) as db:
+        db['k'] = b'x' * 10
+        db.sync()
+        size0 = p.stat().st_size
+        db['k'] = b'y' * 10
+        db.sync()
+        assert p.stat().st_size > size0
+        assert db.prune() == 1
+
+
+def test_buffered_key_overwrite_appends(tmp_path):
+    p = tmp_path / 'v.blt'
+    with _new_file(p) as db:
+        db['k'] = b'x' * 10
+        db['k'] = b'y' * 10
+        db.sync()
+        assert db['k'] == b'y' * 10
+        assert db.prune() == 1
+
+
+def test_update_and_no_timestamps(tmp_path):
+    p = tmp_path / 'v.blt'
+    with _new_file(p, init_timestamps=False) as db:
+        db.update({'a': b'x' * 100, 'b': b'y' * 100})
+        db.sync()
+        size0 = p.stat().st_size
+        db.update({'a': b'1' * 50, 'b': b'2' * 100})
+        db.sync()
+        assert p.stat().st_size == size0
+        assert dict(db.items()) == {'a': b'1' * 50, 'b': b'2' * 100}
+        assert db.prune() == 1
+        assert dict(db.items()) == {'a': b'1' * 50, 'b': b'2' * 100}
+
+
+def test_bytesio():
+    b = io.BytesIO()
+    with _new_file(b) as db:
+        db['a'] = b'x' * 100
+        db.sync()
+        size0 = len(b.getvalue())
+        db['a'] = b'z' * 30
+        db.sync()
+        assert len(b.getvalue()) == size0
+        assert dict(db.items()) == {'a': b'z' * 30}
+
+
+def test_length_is_published_last():
+    ## A crash part way through must leave the block framed by its old length
+    from booklet import utils
+
+    class Recorder(io.BytesIO):
+        writes = []
+
+        def write(self, b):
+            self.writes.append(self.tell())
+            return super().write(b)
+
+    b = Recorder()
+    with _new_file(b) as db:
+        db['a'] = b'x' * 200
+        db.sync()
+        b.writes = []
+        key_hash = utils.hash_key(b'a')
+        pos = utils.overwrite_value_variable(b, key_hash, db._n_buckets, b'short', None, db._ts_bytes_len, db._index_offset)
+        assert b.writes[-1] == pos + utils.key_hash_len + utils.n_bytes_file + utils.n_bytes_key
+        assert len(b.writes) == 3
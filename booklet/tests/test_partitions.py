@@ -0,0 +1,133 @@
+"""
+Tests for partitions(): picklable, block-aligned byte ranges of a booklet
+file that are scanned independently.
+"""
+import io
+import pickle
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+import booklet
+from booklet import DenseFixedLengthValue, FixedLengthValue
+
+
+def _items(part):
+    return list(part.items())
+
+
+def _fill(p, n=3000, **kwargs):
+    data = {i: {'i': i, 'pad': 'x' * (i % 50)} for i in range(n)}
+    with booklet.open(p, 'n', key_serializer='uint4', value_serializer='orjson', **kwargs) as db:
+        db.update(data)
+    return data
+
+
+def test_partitions_cover_every_item_once(tmp_path):
+    p = tmp_path / 'a.blt'
+    data = _fill(p)
+    with booklet.open(p) as db:
+        parts = db.partitions(7)
+    assert len(parts) == 7
+    sizes = [part.n_bytes for part in parts]
+    assert max(sizes) - min(sizes) < max(sizes) / 2
+
+    items = [item for part in parts for item in part.items()]
+    assert len(items) == len(data)
+    assert dict(items) == data
+    assert sorted(key for part in parts for key in part.keys()) == sorted(data)
+    assert [value for value in parts[0].values()] == [value for key, value in parts[0].items()]
+
+    ## Spans are contiguous and cut at block boundaries
+    spans = [span for part in parts for span in part.spans]
+    assert all(a[1] == b[0] for a, b in zip(spans, spans[1:]))
+
+
+def test_threads_and_processes(tmp_path):
+    p = tmp_path / 'a.blt'
+    data = _fill(p)
+    with booklet.open(p) as db:
+        parts = db.partitions(4)
+
+    parts = pickle.loads(pickle.dumps(parts))
+    with ThreadPoolExecutor(4) as pool:
+        assert dict(item for items in pool.map(_items, parts) for item in items) == data
+    with ProcessPoolExecutor(2) as pool:
+        assert dict(item for items in pool.map(_items, parts) for item in items) == data
+
+
+def test_reindexed_deleted_and_hidden(tmp_path):
+    p = tmp_path / 'a.blt'
+    with booklet.open(p, 'n', key_serializer='uint4', n_buckets=11, dedup_threshold=20) as db:
+        for i in range(2000):
+            db[i] = bytes([i % 5]) * 40
+        db.set_metadata({'a': 1})
+        for i in range(0, 2000, 3):
+            del db[i]
+        assert db._index_offset != booklet.utils.sub_index_init_pos
+        expected = dict(db.items())
+        parts = db.partitions(5)
+    assert dict(item for part in parts for item in part.items()) == expected
+
+
+def test_small_empty_fixed_and_errors(tmp_path):
+    p = tmp_path / 'a.blt'
+    data = _fill(p, n=2)
+    with booklet.open(p) as db:
+        parts = db.partitions(10)
+        assert len(parts) == 10
+        assert dict(item for part in parts for item in part.items()) == data
+        with pytest.raises(ValueError):
+            db.partitions(0)
+
+    with booklet.open(tmp_path / 'e.blt', 'n') as db:
+        parts = db.partitions(3)
+    assert [list(part.items()) for part in parts] == [[], [], []]
+
+    pf = tmp_path / 'f.blt'
+    with FixedLengthValue(pf, 'n', key_serializer='str', value_len=4) as db:
+        for i in range(500):
+            db[f'k{i}'] = i.to_bytes(4, 'little')
+        parts = db.partitions(3)
+    assert dict(item for part in parts for item in part.items()) == {f'k{i}': i.to_bytes(4, 'little') for i in range(500)}
+
+    with DenseFixedLengthValue(tmp_path / 'd.blt', 'n', value_len=4) as db:
+        with pytest.raises(NotImplementedError):
+            db.partitions(2)
+    with booklet.open(io.BytesIO(), 'n') as db:
+        with pytest.raises(ValueError):
+            db.partitions(2)
+
+    with booklet.open(p, 'w') as db:
+        parts = db.partitions(2)
+        db.clear()
+    with pytest.raises(ValueError):
+        list(parts[0].items())
+
+
+def test_prune_then_regrowth_invalidates(tmp_path):
+    ## The file is back to (or past) its old size after the prune, so only
+    ## the compaction count in the header shows the blocks have moved
+    p = tmp_path / 'a.blt'
+    _fill(p, n=1000)
+    with booklet.open(p) as db:
+        parts = db.partitions(3)
+    size = p.stat().st_size
+
+    with booklet.open(p, 'w') as db:
+        for i in range(500):
+            db[i] = {'i': -i}
+        db.prune()
+        i = 1000
+        while p.stat().st_size <= size:
+            db[i] = {'i': i, 'pad': 'y' * 40}
+            i += 1
+            db.sync()
+
+    for part in parts:
+        with pytest.raises(ValueError, match='compacted'):
+            list(part.items())
+
+    with booklet.open(p) as db:
+        parts = db.partitions(3)
+        assert sum(len(list(part.keys())) for part in parts) == len(db)
@@ -0,0 +1,96 @@
+"""
+Tests for raw_items: key prefix, key filter and timestamp range tests pushed
+down into the block scan, with only matching blocks read and decoded.
+"""
+import io
+
+import pytest
+
+import booklet
+from booklet import DenseFixedLengthValue, FixedLengthValue
+
+
+def test_prefix_filter_and_decode(tmp_path):
+    p = tmp_path / 'a.blt'
+    with booklet.open(p, 'n', key_serializer='str', value_serializer='pickle') as db:
+        for tenant in ('acme', 'globex'):
+            for i in range(50):
+                db[f'{tenant}/{i}'] = {'i': i}
+        db.sync()
+
+        raw = dict(db.raw_items(key_prefix=b'acme/'))
+        assert sorted(raw) == sorted(f'acme/{i}'.encode() for i in range(50))
+        assert raw[b'acme/7'] == db._pre_value({'i': 7})
+
+    with booklet.open(p) as db:
+        assert dict(db.raw_items(key_prefix=b'globex/', key_filter=lambda k: k.endswith(b'/1'), decode=True)) == {'globex/1': {'i': 1}}
+        assert len(list(db.raw_items())) == 100
+        assert list(db.raw_items(key_prefix=b'initech/')) == []
+
+
+def test_timestamp_range():
+    with booklet.open(io.BytesIO(), 'n', key_serializer='uint4', value_serializer='pickle', init_timestamps=True) as db:
+        for i in range(20):
+            db.set(i, i, timestamp=1_000_000 + i)
+        assert dict(db.raw_items(since_ts=1_000_005, until_ts=1_000_008, decode=True)) == {5: 5, 6: 6, 7: 7}
+        assert sorted(k for k, v in db.raw_items(since_ts=1_000_018, decode=True)) == [18, 19]
+        db.set_timestamp(3, 1_000_100)
+        assert [k for k, v in db.raw_items(since_ts=1_000_100, decode=True)] == [3]
+
+    with booklet.open(io.BytesIO(), 'n', key_serializer='uint4', init_timestamps=False) as db:
+        db[1] = b'x'
+        with pytest.raises(ValueError):
+            next(db.raw_items(since_ts=0))
+
+
+def test_indirect_values(tmp_path):
+    p = tmp_path / 'a.blt'
+    with booklet.open(p, 'n', key_serializer='uint4', blob_threshold=1000, dedup_threshold=100) as db:
+        db[1] = b'x' * 5000
+        db[2] = b'y' * 200
+        db[3] = b'z'
+    with booklet.open(p) as db:
+        assert dict(db.raw_items()) == {db._pre_key(1): b'x' * 5000, db._pre_key(2): b'y' * 200, db._pre_key(3): b'z'}
+
+
+def test_fixed_and_dense(tmp_path):
+    p = tmp_path / 'f.blt'
+    with FixedLengthValue(p, 'n', key_serializer='str', value_len=2) as f:
+        for i in range(30):
+            f[f'k{i}'] = i.to_bytes(2, 'little')
+        f.sync()
+        assert sorted(dict(f.raw_items(key_prefix=b'k2', decode=True))) == ['k2'] + [f'k2{i}' for i in range(10)]
+        with pytest.raises(ValueError):
+            next(f.raw_items(until_ts=0))
+    with FixedLengthValue(p) as f:
+        assert dict(f.raw_items(key_filter=lambda k: k == b'k5')) == {b'k5': b'\x05\x00'}
+
+    with DenseFixedLengthValue(tmp_path / 'd.blt', 'n', value_len=2) as f:
+        with pytest.raises(NotImplementedError):
+            f.raw_items()
+
+
+def test_key_filter_may_use_the_booklet(tmp_path):
+    ## The filter runs without the (non-reentrant) lock held
+    p = tmp_path / 'a.blt'
+    with booklet.open(p, 'n', key_serializer=None, value_serializer=None) as db:
+        for i in range(20):
+            db[b'k%d' % i] = b'v%d' % i
+        db[b'k3-x'] = b'marker'
+        db[b'k7-x'] = b'marker'
+        db.sync()
+        assert sorted(db.raw_items(key_filter=lambda k: k + b'-x' in db)) == [(b'k3', b'v3'), (b'k7', b'v7')]
+
+        with pytest.raises(RuntimeError):
+            list(db.raw_items(key_filter=lambda k: db.set(k, b'changed')))
+
+        ## The filter's own exception is not replaced by the mutation check
+        def failing_filter(k):
+            db.set(k, b'changed')
+            raise KeyError(k)
+        with pytest.raises(KeyError):
+            list(db.raw_items(key_filter=failing_filter))
+        assert db.get(b'k3-x') == b'marker'
+
+    with booklet.open(p) as db:
+        assert sorted(db.raw_items(key_filter=lambda k: db.get(k) == b'marker')) == [(b'k3-x', b'marker'), (b'k7-x', b'marker')]
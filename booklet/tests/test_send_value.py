@@ -0,0 +1,104 @@
+"""
+Tests for send_value/send_values: stored values sent to sockets and file
+descriptors with os.sendfile.
+"""
+import io
+import os
+import socket
+import threading
+
+import pytest
+
+import booklet
+
+
+def _recv_all(sock, out):
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        out.extend(chunk)
+
+
+def _socket_pair():
+    a, b = socket.socketpair()
+    received = bytearray()
+    thread = threading.Thread(target=_recv_all, args=(b, received))
+    thread.start()
+    return a, b, thread, received
+
+
+BIG = os.urandom(300000)
+
+
+def test_send_to_socket(tmp_path):
+    p = tmp_path / 'a.blt'
+    with booklet.open(p, 'n', key_serializer='str', value_serializer='pickle') as db:
+        db['a'] = {'x': 1}
+        db['big'] = BIG
+        db.set('raw', BIG, encode_value=False)
+        stored = db.get_timestamp('a', include_value=True, decode_value=False)[1]
+
+    with booklet.open(p) as db:
+        a, b, thread, received = _socket_pair()
+        assert db.send_value('raw', a) == len(BIG)
+        assert db.send_value('raw', a, offset=100, count=50) == 50
+        assert db.send_value('raw', a, offset=len(BIG) - 10, count=1000) == 10
+        assert db.send_values(['a', 'raw'], a) == len(stored) + len(BIG)
+        a.close()
+        thread.join()
+        b.close()
+        assert bytes(received) == BIG + BIG[100:150] + BIG[-10:] + stored + BIG
+
+        with pytest.raises(KeyError):
+            db.send_value('missing', 1)
+        with pytest.raises(ValueError):
+            db.send_value('a', 1, offset=10**6)
+
+
+def test_send_to_fd_write_mode_and_missing_batch(tmp_path):
+    p = tmp_path / 'a.blt'
+    out_path = tmp_path / 'out.bin'
+    with booklet.open(p, 'n', key_serializer='uint4') as db:
+        db[1] = BIG
+        db[2] = b'abc'
+        with out_path.open('wb') as f:
+            ## Pending buffered writes are flushed first
+            assert db.send_values([2, 1], f.fileno()) == len(BIG) + 3
+            with pytest.raises(KeyError):
+                db.send_values([1, 3], f)
+    assert out_path.read_bytes() == b'abc' + BIG
+
+
+def test_send_dedup_blob_and_bytesio(tmp_path):
+    p = tmp_path / 'a.blt'
+    out_path = tmp_path / 'out.bin'
+    with booklet.open(p, 'n', key_serializer='uint4', blob_threshold=1000, dedup_threshold=100) as db:
+        db[1] = BIG
+        db[2] = b'y' * 500
+        db[3] = b'y' * 500
+    with booklet.open(p) as db:
+        with out_path.open('wb') as f:
+            assert db.send_values([1, 3, 2], f) == len(BIG) + 1000
+    assert out_path.read_bytes() == BIG + b'y' * 1000
+
+    b = io.BytesIO()
+    with booklet.open(b, 'n', key_serializer='uint4') as db:
+        db[1] = BIG
+        with out_path.open('wb') as f:
+            assert db.send_value(1, f, offset=5) == len(BIG) - 5
+    assert out_path.read_bytes() == BIG[5:]
+
+
+def test_send_without_sendfile_or_pread(tmp_path, monkeypatch):
+    ## Windows has neither: the values are read with seek and read
+    monkeypatch.delattr(os, 'sendfile')
+    monkeypatch.delattr(os, 'pread')
+    p = tmp_path / 'a.blt'
+    out_path = tmp_path / 'out.bin'
+    with booklet.open(p, 'n', key_serializer='uint4', blob_threshold=1000) as db:
+        db[1] = BIG
+        db[2] = b'abc'
+        with out_path.open('wb') as f:
+            assert db.send_values([2, 1], f) == len(BIG) + 3
+    assert out_path.read_bytes() == b'abc' + BIG
@@ -0,0 +1,90 @@
+"""
+Tests for per-file serializer options: (name, options) serializer arguments
+that are stored in the file and restored on reopen.
+"""
+import pytest
+
+pytest.importorskip('zstandard')
+
+import booklet
+from booklet import serializers, utils
+
+
+def test_zstd_level_persists(tmp_path):
+    p = tmp_path / 'v.blt'
+    value = b'abcdefgh' * 5000 + bytes(range(256)) * 20
+    with booklet.open(p, 'n', key_serializer='str', value_serializer=('zstd', {'level': 19})) as db:
+        db['a'] = value
+        assert db._value_serializer.level == 19
+        high = len(db._value_serializer.dumps(value))
+
+    ## Reopen without options: restored from the file
+    with booklet.open(p) as db:
+        assert isinstance(db._value_serializer, serializers.ZstdCodec)
+        assert db._value_serializer.serializer is serializers.Zstd
+        assert db._value_serializer.level == 19
+        assert db['a'] == value
+        assert len(db) == 1
+        assert list(db.keys()) == ['a']
+
+    ## Stored options win over passed ones
+    with booklet.open(p, 'w', value_serializer=('zstd', {'level': 1})) as db:
+        assert db._value_serializer.level == 19
+        db['b'] = value
+        assert len(db._value_serializer.dumps(value)) == high
+
+
+def test_plain_zstd_frames_stay_readable(tmp_path):
+    p = tmp_path / 'v.blt'
+    with booklet.open(p, 'n', key_serializer='str', value_serializer='orjson_zstd') as db:
+        db['a'] = {'x': 1}
+    with booklet.open(p, 'w', value_serializer=('orjson_zstd', {'level': 7, 'threads': 2})) as db:
+        assert db['a'] == {'x': 1}
+        db.update({'b': [1, 2], 'c': 'three'})
+    with booklet.open(p) as db:
+        assert db._value_serializer.level == 7
+        assert db._value_serializer.threads == 2
+        assert dict(db.items()) == {'a': {'x': 1}, 'b': [1, 2], 'c': 'three'}
+
+
+def test_msgpack_options(tmp_path):
+    pytest.importorskip('msgpack')
+    p = tmp_path / 'v.blt'
+    with booklet.open(p, 'n', key_serializer='str', value_serializer=('msgpack_zstd', {'use_list': False, 'level': 3})) as db:
+        db['a'] = [1, [2, 3]]
+        db.update({f'k{i}': [i] for i in range(100)})
+    with booklet.open(p) as db:
+        assert db['a'] == (1, (2, 3))
+        assert next(db.iter_batches(what='values'))[0] in [(1, (2, 3))] + [(i,) for i in range(100)]
+        assert dict(db.items())['k5'] == (5,)
+
+    with booklet.open(p, 'n', key_serializer='str', value_serializer=('msgpack', {'use_single_float': True})) as db:
+        db['f'] = 0.1
+        assert db['f'] != 0.1
+        assert abs(db['f'] - 0.1) < 1e-6
+
+
+def test_invalid_options(tmp_path):
+    with pytest.raises(ValueError):
+        booklet.open(tmp_path / 'a.blt', 'n', value_serializer=('zstd', {'lvl': 3}))
+    with pytest.raises(ValueError):
+        booklet.open(tmp_path / 'b.blt', 'n', value_serializer=('orjson', {'level': 3}))
+
+
+def test_clear_keeps_options_and_prune_keeps_key(tmp_path):
+    b = tmp_path / 'v.blt'
+    with booklet.open(b, 'n', key_serializer='str', value_serializer=('zstd', {'level': 12})) as db:
+        db['a'] = b'1'
+        db['a'] = b'2'
+        assert db.prune() == 1
+        db['b'] = b'3'
+        db.clear()
+        db['z'] = b'zz'
+        db.sync()
+        assert len(db) == 1
+        assert list(db.keys()) == ['z']
+
+    with booklet.open(b) as db:
+        assert db._value_serializer.level == 12
+        assert dict(db.items()) == {'z': b'zz'}
+        assert utils.serializer_options_key_bytes not in set(db.keys())
@@ -0,0 +1,185 @@
+"""
+Tests for the streaming value API: open_value (a seekable read-only file
+object over a stored value) and set_stream (chunked value writes).
+"""
+import io
+import os
+
+import pytest
+
+import booklet
+from booklet import utils
+
+
+CHUNK = utils.stream_chunk_size
+
+
+def _payload(n):
+    return (os.urandom(1024) * (n // 1024 + 1))[:n]
+
+
+class _Trickle(io.RawIOBase):
+    ## Returns short reads, like a socket or pipe
+    def __init__(self, data):
+        self._data = data
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def read(self, n=-1):
+        n = min(n, 1000)
+        out = self._data[self._pos:self._pos + n]
+        self._pos += len(out)
+        return out
+
+
+def test_set_stream_and_open_value(tmp_path):
+    p = tmp_path / 'a.blt'
+    big = _payload(3 * CHUNK + 123)
+    with booklet.open(p, 'n', key_serializer='str') as db:
+        db['a'] = b'before'
+        assert db.set_stream('big', io.BytesIO(big)) == len(big)
+        assert db.set_stream('sized', io.BytesIO(big), length=CHUNK + 5) == CHUNK + 5
+        assert db.set_stream('small', io.BytesIO(b'tiny')) == 4
+        db['b'] = b'after'
+        db.sync()
+        assert len(db) == 5
+        assert db['big'] == big
+        assert db['sized'] == big[:CHUNK + 5]
+        assert db['small'] == b'tiny'
+
+        with db.open_value('big') as f:
+            assert f.seekable() and f.readable() and not f.writable()
+            assert f.seek(0, 2) == len(big)
+            f.seek(CHUNK - 10)
+            assert f.read(20) == big[CHUNK - 10:CHUNK + 10]
+            assert f.tell() == CHUNK + 10
+            f.seek(-3, 2)
+            assert f.read() == big[-3:]
+            assert f.read(10) == b''
+
+    with booklet.open(p) as db:
+        assert sorted(db.keys()) == ['a', 'b', 'big', 'sized', 'small']
+        assert db.get_timestamp('big') > 0
+        with db.open_value('big') as f:
+            assert f.read() == big
+        buf = bytearray(100)
+        with db.open_value('sized') as f:
+            f.seek(CHUNK)
+            assert f.readinto(buf) == 5
+            assert bytes(buf[:5]) == big[CHUNK:CHUNK + 5]
+        with pytest.raises(KeyError):
+            db.open_value('missing')
+
+
+def test_overwrite_short_reads_and_errors(tmp_path):
+    p = tmp_path / 'a.blt'
+    big = _payload(CHUNK + 2000)
+    with booklet.open(p, 'n', key_serializer='uint4') as db:
+        db[1] = b'x'
+        db.set_stream(1, _Trickle(big))
+        assert db[1] == big
+        assert len(db) == 1
+
+        size = p.stat().st_size
+        with pytest.raises(ValueError):
+            db.set_stream(2, io.BytesIO(big), length=len(big) + 1)
+        assert p.stat().st_size == size
+        assert 2 not in db
+        with pytest.raises(ValueError):
+            db.set_stream(2, io.BytesIO(b'abc'), length=10)
+
+        db.set_stream(1, io.BytesIO(b'short'))
+        assert db[1] == b'short'
+        db.prune()
+        assert db[1] == b'short'
+
+    with booklet.open(p) as db:
+        with pytest.raises(ValueError):
+            db.set_stream(3, io.BytesIO(b'abc'))
+
+
+def test_blob_and_dedup(tmp_path):
+    p = tmp_path / 'a.blt'
+    big = _payload(2 * CHUNK)
+    with booklet.open(p, 'n', key_serializer='uint4', blob_threshold=100, dedup_threshold=50) as db:
+        db[1] = b'y' * 500
+        db[2] = b'y' * 500
+        db.set_stream(1, io.BytesIO(big))
+        assert p.stat().st_size < CHUNK
+        assert db[1] == big
+        with db.open_value(1) as f:
+            f.seek(CHUNK)
+            assert f.read(10) == big[CHUNK:CHUNK + 10]
+        with db.open_value(2) as f:
+            assert f.read() == b'y' * 500
+
+    with booklet.open(p) as db:
+        with db.open_value(1) as f:
+            assert f.read() == big
+        with db.open_value(2) as f:
+            assert f.read() == b'y' * 500
+
+
+def test_bytesio():
+    b = io.BytesIO()
+    big = _payload(CHUNK + 10)
+    with booklet.open(b, 'n', key_serializer='uint4') as db:
+        db.set_stream(1, io.BytesIO(big))
+        with db.open_value(1) as f:
+            assert f.read() == big
+
+
+def test_crash_mid_stream_leaves_no_phantom_keys(tmp_path):
+    ## The process dies while an unsized stream is being written; the partial
+    ## value (shaped like live blocks) must not be scanned as blocks
+    import subprocess
+    import sys
+
+    p = tmp_path / 'a.blt'
+    with booklet.open(p, 'n', key_serializer='str', value_serializer='bytes') as db:
+        for i in range(10):
+            db[str(i)] = b'v'
+
+    code = f'''
+import io, os, booklet
+from booklet import utils
+
+class Dies(io.RawIOBase):
+    def __init__(self):
+        self.n = 0
+    def readable(self):
+        return True
+    def readinto(self, b):
+        self.n += 1
+        if self.n > 3:
+            os._exit(3)
+        data = (block * (len(b) // len(block) + 1))[:len(b)]
+        b[:len(data)] = data
+        return len(data)
+
+with booklet.open({str(p)!r}, 'w') as db:
+    block = utils.hash_key(b'x') + b'\\x01' + bytes(5) + utils.int_to_bytes(1, 2) + bytes(4 + db._ts_bytes_len) + b'x'
+    db.set_stream('big', Dies())
+'''
+    proc = subprocess.run([sys.executable, '-c', code], env={**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)})
+    assert proc.returncode == 3
+
+    with booklet.open(p) as db:
+        assert sorted(db.keys()) == [str(i) for i in range(10)]
+        assert len(db) == 10
+
+
+def test_open_value_without_pread(tmp_path, monkeypatch):
+    ## Windows has no os.pread: the file is read with seek and read
+    monkeypatch.delattr(utils.os, 'pread')
+    data = _payload(3 * CHUNK + 5)
+    with booklet.open(tmp_path / 'a.blt', 'n', key_serializer='str', value_serializer='bytes', blob_threshold=CHUNK) as db:
+        db['a'] = data
+        db['b'] = b'small value'
+        with db.open_value('a') as f:
+            f.seek(CHUNK - 3)
+            assert f.read(10) == data[CHUNK - 3:CHUNK + 7]
+        with db.open_value('b') as f:
+            assert f.read() == b'small value'
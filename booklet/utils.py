@@ -17,6 +17,8 @@ from threading import Lock, Timer
 import portalocker
 # from fcntl import flock, LOCK_EX, LOCK_SH, LOCK_UN
 import mmap
+import select
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 import time
 from itertools import count
@@ -68,6 +70,91 @@ reserved_slot_key_bytes = {
     2: b'f19a5c3d7e2b48069ab34c5',
     }
 
+## Internal key holding the trained zstd dictionary of the *_zstd_dict value
+## serializers: 1 signed byte compression level + the dictionary. Hidden like
+## the metadata key; permanent on-disk format constant.
+compression_dict_key_bytes = b'5e0c9d2a71f84b6c93d0e17'
+
+## Internal key holding per-file serializer options as JSON:
+## {"key": {...}, "value": {...}} (see serializers.configure).
+serializer_options_key_bytes = b'c3a81f0e6d2b4795a0f4b68'
+
+## Value deduplication: a value stored by content lives once in an internal
+## block whose key is dedup_key_prefix + a 16-byte blake2b digest of the value.
+## Its value is an 8-byte refcount + the value, and every key block sharing it
+## stores that content key as its value. Content blocks are hidden like the
+## reserved keys. The dedup threshold itself is kept in a hidden key as 4 bytes.
+dedup_key_prefix = b'\x00dedup\x00'
+dedup_digest_len = 16
+dedup_key_len = len(dedup_key_prefix) + dedup_digest_len
+dedup_refcount_len = 8
+dedup_threshold_key_bytes = b'9d27b4e0c5a8413f86e2d0b'
+
+## Blob log: values of at least the blob threshold are appended to a companion
+## file <name>.<gen>.blob, and the data block stores a pointer: the prefix +
+## gen (2 bytes) + offset (8 bytes) + length (8 bytes). Values shaped like a
+## pointer always go to the blob file. The threshold (4 bytes) and the current
+## generation (2 bytes) live in a hidden key.
+blob_pointer_prefix = b'\x00blob'
+blob_pointer_len = len(blob_pointer_prefix) + 18
+blob_key_bytes = b'2a6f0c8e41d7493bb5e9c12'
+
+## Change index: a companion file <name>.changes of runs of (timestamp,
+## data_block_pos) entries, each run sorted by timestamp. The header holds the
+## booklet's uuid and the file position up to which blocks have been indexed
+## (the watermark); a run is a 4-byte count followed by its entries. Blocks
+## appended past the watermark are indexed at sync, and blocks changed in
+## place (set_timestamp, in-place overwrites) get a new entry, so an entry
+## only counts while its block is live and still carries its timestamp. Runs
+## are merged once there are more than change_index_max_runs. A hidden key
+## marks the booklets that keep a change index.
+change_index_key_bytes = b'7f3b9a1d0e6c4825b3a9f0d'
+change_entry_len = timestamp_bytes_len + n_bytes_file
+change_header_len = 16 + n_bytes_file
+change_index_max_runs = 16
+
+## Maximum buffers per os.preadv call in read_locations (IOV_MAX on Linux
+## and macOS)
+iov_max = 1024
+
+## Chunk size of streamed values (set_stream); values up to one chunk are
+## written through set
+stream_chunk_size = 2**20
+
+## Fixed-length slot free-list (header bytes 77-141): up to free_list_n_slots
+## (key_len, head_pos) pairs, one singly-linked list of tombstoned blocks per key
+## length. A listed block keeps next_ptr=0 (so every scanner still skips it) and
+## reuses its key_hash field as next_free (6 bytes) + free_list_magic (7 bytes).
+free_list_pos = 77
+free_list_n_slots = 8
+free_list_slot_len = n_bytes_key + n_bytes_file
+free_list_magic = b'\xf5\x1e\xe0\x5b\x10\xc4\x7a'
+
+## Dense (direct-address) fixed-length files: header byte 141 == 1. There is no
+## bucket index; the record of integer key k (a presence byte + the value) sits
+## at sub_index_init_pos + k * (1 + value_len).
+dense_flag_pos = 141
+## Dense files have their own uuid, so versions that predate the layout reject
+## them instead of reading them as hashed fixed-length files.
+uuid_dense_blt = b'\x9b\x1f\xd4\x0e\x83\xa6M\x17\xb2\xc5\x6a\x08\xe1\x3f\x72\xd9'
+## Keys at or past dense_max_records are rejected on writes (and absent on
+## reads), so a stray huge key cannot make a terabyte sparse file or BytesIO.
+dense_max_records = 2**32
+
+## Compactions (prune/clear) of the file, header bytes 142-145, so the
+## Partition descriptors made before one can tell that their blocks moved.
+## Files written before this start from whatever the bytes held.
+file_compactions_pos = 142
+file_compactions_len = 4
+dense_key_serializers = ('uint1', 'uint2', 'uint4', 'uint5', 'uint8')
+
+## Keys per batch when get_items() decodes values with a serializer's loads_many
+value_batch_size = 1000
+
+## codec_threads: items per read-ahead batch, and the smallest chunk worth a thread
+codec_batch_size = 2**14
+codec_min_chunk = 64
+
 current_version = 5
 current_version_bytes = current_version.to_bytes(2, 'little', signed=False)
 
@@ -167,6 +254,7 @@ def write_skip_block_fixed(file, offset, dead_size, value_len):
 
     # Minimum block size: overhead + 1 (key_len=1) + value_len
     min_block = overhead + 1 + value_len
+    max_key_len = 256**n_bytes_key - 1
 
     pos = offset
     end = offset + dead_size
@@ -179,6 +267,12 @@ def write_skip_block_fixed(file, offset, dead_size, value_len):
         key_len = remaining - overhead - value_len
         if key_len < 1:
             key_len = 1
+        elif key_len > max_key_len:
+            # The key_len field caps a block's size, so large regions take several
+            # blocks; never leave a tail too short to hold one more block.
+            key_len = max_key_len
+            if remaining - (overhead + key_len + value_len) < min_block:
+                key_len = remaining - min_block - overhead - value_len
 
         block_size = overhead + key_len + value_len
         file.seek(pos)
@@ -358,12 +452,193 @@ def hash_key(key):
     return blake2s(key, digest_size=key_hash_len).digest()
 
 
-## The full reserved-key sets (metadata + app slots): every key-enumeration
+## The full reserved-key sets (metadata + app slots + internal keys): every key-enumeration
 ## path skips members of reserved_key_bytes, and prune's key counting
 ## compensates by reserved_key_hashes membership.
 reserved_slot_key_hashes = {slot: hash_key(k) for slot, k in reserved_slot_key_bytes.items()}
-reserved_key_bytes = frozenset(reserved_slot_key_bytes.values()) | {metadata_key_bytes}
-reserved_key_hashes = frozenset(reserved_slot_key_hashes.values()) | {metadata_key_hash}
+compression_dict_key_hash = hash_key(compression_dict_key_bytes)
+serializer_options_key_hash = hash_key(serializer_options_key_bytes)
+dedup_threshold_key_hash = hash_key(dedup_threshold_key_bytes)
+blob_key_hash = hash_key(blob_key_bytes)
+change_index_key_hash = hash_key(change_index_key_bytes)
+reserved_key_bytes = frozenset(reserved_slot_key_bytes.values()) | {metadata_key_bytes, compression_dict_key_bytes, serializer_options_key_bytes, dedup_threshold_key_bytes, blob_key_bytes, change_index_key_bytes}
+reserved_key_hashes = frozenset(reserved_slot_key_hashes.values()) | {metadata_key_hash, compression_dict_key_hash, serializer_options_key_hash, dedup_threshold_key_hash, blob_key_hash, change_index_key_hash}
+
+
+def dedup_key(value):
+    """
+    The content key of a deduplicated value, which is also what the key
+    blocks sharing it store as their value.
+    """
+    return dedup_key_prefix + blake2b(value, digest_size=dedup_digest_len).digest()
+
+
+def is_dedup_key(b):
+    """
+    Whether the bytes (a key, or a stored value) are a dedup content key.
+    """
+    return len(b) == dedup_key_len and b[:len(dedup_key_prefix)] == dedup_key_prefix
+
+
+def blob_path(file_path, gen):
+    """
+    The path of generation gen of the blob file of file_path.
+    """
+    return file_path.with_name(f'{file_path.name}.{gen}.blob')
+
+
+def changes_path(file_path):
+    """
+    The path of the change index file of file_path.
+    """
+    return file_path.with_name(f'{file_path.name}.changes')
+
+
+def read_change_runs(file, uuid_bytes):
+    """
+    Read the header and run directory of a change index file. Returns
+    (watermark, runs, end) with runs a list of (entries_offset, count) and end
+    the position after the last complete run, or None if the file is empty
+    or belongs to another booklet.
+    """
+    file.seek(0)
+    header = file.read(change_header_len)
+    if len(header) < change_header_len or header[:16] != uuid_bytes:
+        return None
+
+    watermark = bytes_to_int(header[16:])
+    file_end = file.seek(0, 2)
+    runs = []
+    pos = change_header_len
+    while pos + 4 <= file_end:
+        file.seek(pos)
+        count = bytes_to_int(file.read(4))
+        run_end = pos + 4 + (count * change_entry_len)
+        ## A run cut short by a crash is dropped
+        if run_end > file_end:
+            break
+        runs.append((pos + 4, count))
+        pos = run_end
+
+    return watermark, runs, pos
+
+
+def reset_change_index(file, uuid_bytes):
+    """
+    Empty a change index file, with the watermark at the start of the booklet.
+    Returns the read_change_runs state.
+    """
+    file.seek(0)
+    file.write(uuid_bytes + int_to_bytes(0, n_bytes_file))
+    file.truncate()
+
+    return 0, [], change_header_len
+
+
+def write_change_run(file, entries, watermark, runs, end):
+    """
+    Append a run of (ts_int, data_block_pos) entries to a change index file
+    and then move its watermark, merging all runs into one when there are
+    too many. Returns the new run count.
+    """
+    if entries:
+        if len(runs) >= change_index_max_runs:
+            for offset, count in runs:
+                file.seek(offset)
+                data = file.read(count * change_entry_len)
+                entries.extend((bytes_to_int(data[i:i + timestamp_bytes_len]), bytes_to_int(data[i + timestamp_bytes_len:i + change_entry_len])) for i in range(0, len(data), change_entry_len))
+            runs = []
+            end = change_header_len
+
+        entries.sort()
+        run = bytearray(int_to_bytes(len(entries), 4))
+        for ts_int, data_block_pos in entries:
+            run += int_to_bytes(ts_int, timestamp_bytes_len) + int_to_bytes(data_block_pos, n_bytes_file)
+        file.seek(end)
+        file.write(run)
+        file.truncate()
+        runs.append((end + 4, len(entries)))
+
+    file.seek(16)
+    file.write(int_to_bytes(watermark, n_bytes_file))
+    file.flush()
+
+    return len(runs)
+
+
+def iter_change_run_since(file, offset, count, ts_int):
+    """
+    Iterate the (ts_int, data_block_pos) entries of a change index run from
+    the first with a timestamp at or after ts_int, found by binary search.
+    """
+    lo = 0
+    hi = count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        file.seek(offset + (mid * change_entry_len))
+        if bytes_to_int(file.read(timestamp_bytes_len)) < ts_int:
+            lo = mid + 1
+        else:
+            hi = mid
+
+    file.seek(offset + (lo * change_entry_len))
+    data = file.read((count - lo) * change_entry_len)
+    for i in range(0, len(data), change_entry_len):
+        yield bytes_to_int(data[i:i + timestamp_bytes_len]), bytes_to_int(data[i + timestamp_bytes_len:i + change_entry_len])
+
+
+def iter_block_timestamps(file, start, end, ts_bytes_len, dedup=False):
+    """
+    Iterate (ts_int, data_block_pos) over the live user blocks in the region
+    [start, end), reading only the block headers. file can be an mmap.
+    """
+    header_len = key_hash_len + n_bytes_file + n_bytes_key + n_bytes_value
+    for key, ts_int, value_offset, value_len in iter_locations_from_start_end_pos(file, start, end, ts_bytes_len, dedup):
+        yield ts_int, value_offset - header_len - ts_bytes_len - len(key)
+
+
+def read_block_key_timestamp(file, data_block_pos, ts_bytes_len, dedup=False):
+    """
+    The (key, ts_int) of the data block at data_block_pos, or None if it is
+    deleted or holds a hidden key. file can be an mmap.
+    """
+    one_extra_index_bytes_len = key_hash_len + n_bytes_file
+    header_len = one_extra_index_bytes_len + n_bytes_key + n_bytes_value
+
+    file.seek(data_block_pos)
+    header = file.read(header_len)
+    if not bytes_to_int(header[key_hash_len:one_extra_index_bytes_len]):
+        return None
+
+    key_len = bytes_to_int(header[one_extra_index_bytes_len:one_extra_index_bytes_len + n_bytes_key])
+    ts_key = file.read(ts_bytes_len + key_len)
+    key = ts_key[ts_bytes_len:]
+    if key in reserved_key_bytes or (dedup and key_len == dedup_key_len and key.startswith(dedup_key_prefix)):
+        return None
+
+    return key, bytes_to_int(ts_key[:ts_bytes_len])
+
+
+def blob_pointer(gen, offset, length):
+    """
+    The stored value of a value that lives in a blob file.
+    """
+    return blob_pointer_prefix + int_to_bytes(gen, 2) + int_to_bytes(offset, 8) + int_to_bytes(length, 8)
+
+
+def is_blob_pointer(b):
+    """
+    Whether a stored value is a blob pointer.
+    """
+    return len(b) == blob_pointer_len and b[:len(blob_pointer_prefix)] == blob_pointer_prefix
+
+
+def read_blob_pointer(b):
+    """
+    The (gen, offset, length) of a blob pointer.
+    """
+    pos = len(blob_pointer_prefix)
+    return bytes_to_int(b[pos:pos + 2]), bytes_to_int(b[pos + 2:pos + 10]), bytes_to_int(b[pos + 10:pos + 18])
 
 
 def write_init_bucket_indexes(file, n_buckets, index_pos, write_buffer_size):
@@ -455,7 +730,8 @@ def contains_key(file, key_hash, n_buckets, index_offset=sub_index_init_pos):
 
 def set_timestamp(file, key_hash, n_buckets, timestamp, index_offset=sub_index_init_pos):
     """
-
+    Write the timestamp of a key in place. Returns the position of its data
+    block, or False if the key is not on disk.
     """
     data_block_pos = get_last_data_block_pos(file, key_hash, n_buckets, index_offset)
     if data_block_pos:
@@ -465,7 +741,7 @@ def set_timestamp(file, key_hash, n_buckets, timestamp, index_offset=sub_index_i
         ts_bytes = int_to_bytes(timestamp, timestamp_bytes_len)
         file.write(ts_bytes)
 
-        return True
+        return data_block_pos
     else:
         return False
 
@@ -502,6 +778,62 @@ def get_value(file, key_hash, n_buckets, ts_bytes_len=0, index_offset=sub_index_
     return False
 
 
+def get_value_offset(file, key_hash, n_buckets, ts_bytes_len=0, index_offset=sub_index_init_pos):
+    """
+    Chain traversal returning the file offset of the value of key_hash, or
+    False if the key is not found.
+    """
+    location = get_value_location(file, key_hash, n_buckets, ts_bytes_len, index_offset)
+    if location:
+        return location[0]
+    return False
+
+
+def get_value_location(file, key_hash, n_buckets, ts_bytes_len=0, index_offset=sub_index_init_pos):
+    """
+    Chain traversal returning the (value_offset, value_len) of key_hash, or
+    False if the key is not found. The value itself is not read; file can
+    also be an mmap.
+    """
+    one_extra_index_bytes_len = key_hash_len + n_bytes_file
+    header_len = one_extra_index_bytes_len + n_bytes_key + n_bytes_value
+
+    index_bucket = get_index_bucket(key_hash, n_buckets)
+    bucket_index_pos = get_bucket_index_pos(index_bucket, index_offset)
+    data_block_pos = get_first_data_block_pos(file, bucket_index_pos)
+
+    if data_block_pos:
+        while True:
+            file.seek(data_block_pos)
+            header = file.read(header_len)
+            next_data_block_pos = bytes_to_int(header[key_hash_len:one_extra_index_bytes_len])
+            if next_data_block_pos:
+                if header[:key_hash_len] == key_hash:
+                    key_len = bytes_to_int(header[one_extra_index_bytes_len:one_extra_index_bytes_len + n_bytes_key])
+                    value_len = bytes_to_int(header[one_extra_index_bytes_len + n_bytes_key:])
+                    return data_block_pos + header_len + ts_bytes_len + key_len, value_len
+                elif next_data_block_pos == 1:
+                    return False
+            else:
+                return False
+            data_block_pos = next_data_block_pos
+
+    return False
+
+
+def add_dedup_refcount(file, value_offset, delta):
+    """
+    Add delta to the refcount at the start of a dedup content block's value,
+    in place and never below 0. Returns the new count.
+    """
+    file.seek(value_offset)
+    count = max(bytes_to_int(file.read(dedup_refcount_len)) + delta, 0)
+    file.seek(value_offset)
+    file.write(int_to_bytes(count, dedup_refcount_len))
+
+    return count
+
+
 def get_value_ts(file, key_hash, n_buckets, include_value=True, include_ts=False, ts_bytes_len=0, index_offset=sub_index_init_pos):
     """
     Combined chain traversal and value/timestamp read.
@@ -544,7 +876,7 @@ def get_value_ts(file, key_hash, n_buckets, include_value=True, include_ts=False
     return False
 
 
-def iter_keys_value_from_start_end_pos(file, start, end, include_key, include_value, include_ts, ts_bytes_len):
+def iter_keys_value_from_start_end_pos(file, start, end, include_key, include_value, include_ts, ts_bytes_len, dedup=False):
     """
 
     """
@@ -570,7 +902,7 @@ def iter_keys_value_from_start_end_pos(file, start, end, include_key, include_va
             next_block_pos += init_data_block_len + ts_key_value_len
 
             key = ts_key_value[ts_bytes_len:ts_bytes_len + key_len]
-            if key not in reserved_key_bytes:
+            if key not in reserved_key_bytes and not (dedup and key_len == dedup_key_len and key.startswith(dedup_key_prefix)):
                 if include_ts:
                     ts_int = bytes_to_int(ts_key_value[:ts_bytes_len])
                     if include_value:
@@ -598,7 +930,7 @@ def iter_keys_value_from_start_end_pos(file, start, end, include_key, include_va
             # file.seek(ts_bytes_len + key_len + value_len, 1)
 
 
-def iter_keys_values(file, n_buckets, include_key, include_value, include_ts, ts_bytes_len, index_offset=sub_index_init_pos, first_data_block_pos=0):
+def iter_keys_values(file, n_buckets, include_key, include_value, include_ts, ts_bytes_len, index_offset=sub_index_init_pos, first_data_block_pos=0, dedup=False):
     """
 
     """
@@ -610,17 +942,17 @@ def iter_keys_values(file, n_buckets, include_key, include_value, include_ts, ts
     if index_offset != sub_index_init_pos:
         # Relocated index: scan two regions
         # Region 1: [first_data_block_pos, index_offset)
-        yield from iter_keys_value_from_start_end_pos(file, first_data_block_pos, index_offset, include_key, include_value, include_ts, ts_bytes_len)
+        yield from iter_keys_value_from_start_end_pos(file, first_data_block_pos, index_offset, include_key, include_value, include_ts, ts_bytes_len, dedup)
         # Region 2: [index_offset + n_buckets*6, EOF)
         start2 = index_offset + (n_buckets * n_bytes_file)
         if start2 < file_end:
-            yield from iter_keys_value_from_start_end_pos(file, start2, file_end, include_key, include_value, include_ts, ts_bytes_len)
+            yield from iter_keys_value_from_start_end_pos(file, start2, file_end, include_key, include_value, include_ts, ts_bytes_len, dedup)
     else:
         # Standard layout: one region
-        yield from iter_keys_value_from_start_end_pos(file, first_data_block_pos, file_end, include_key, include_value, include_ts, ts_bytes_len)
+        yield from iter_keys_value_from_start_end_pos(file, first_data_block_pos, file_end, include_key, include_value, include_ts, ts_bytes_len, dedup)
 
 
-def iter_locations_from_start_end_pos(file, start, end, ts_bytes_len):
+def iter_locations_from_start_end_pos(file, start, end, ts_bytes_len, dedup=False):
     """
     Header-only region scan for locations(): yields
     (key, ts_int_or_None, value_offset, value_len) for live, non-reserved
@@ -644,7 +976,7 @@ def iter_locations_from_start_end_pos(file, start, end, ts_bytes_len):
         if next_data_block_pos:  # A value of 0 means it was deleted
             ts_key = file.read(ts_bytes_len + key_len)
             key = ts_key[ts_bytes_len:]
-            if key not in reserved_key_bytes:
+            if key not in reserved_key_bytes and not (dedup and key_len == dedup_key_len and key.startswith(dedup_key_prefix)):
                 ts_int = bytes_to_int(ts_key[:ts_bytes_len]) if ts_bytes_len else None
                 value_offset = next_block_pos + init_data_block_len + ts_bytes_len + key_len
                 yield key, ts_int, value_offset, value_len
@@ -652,7 +984,99 @@ def iter_locations_from_start_end_pos(file, start, end, ts_bytes_len):
         next_block_pos += init_data_block_len + ts_bytes_len + key_len + value_len
 
 
-def iter_locations(file, n_buckets, ts_bytes_len, index_offset=sub_index_init_pos, first_data_block_pos=0):
+def _iter_filtered_region(read_at, start, end, ts_bytes_len, value_len, key_prefix, key_filter, since_ts, until_ts, dedup=False):
+    """
+    Region scan for raw_items(): the block header, timestamp and key are read
+    first and tested against the filters, and the value of a block is only
+    read when it matches. Yields (key, ts_int_or_None, value). value_len is
+    set for fixed-length files.
+    """
+    fixed = value_len is not None
+    one_extra_index_bytes_len = key_hash_len + n_bytes_file
+    init_data_block_len = one_extra_index_bytes_len + n_bytes_key
+    if not fixed:
+        init_data_block_len += n_bytes_value
+    check_ts = since_ts is not None or until_ts is not None
+
+    pos = start
+
+    while pos < end:
+        init_data_block = read_at(pos, init_data_block_len)
+        next_data_block_pos = bytes_to_int(init_data_block[key_hash_len:one_extra_index_bytes_len])
+        key_len = bytes_to_int(init_data_block[one_extra_index_bytes_len:one_extra_index_bytes_len + n_bytes_key])
+        block_value_len = value_len if fixed else bytes_to_int(init_data_block[one_extra_index_bytes_len + n_bytes_key:])
+        ts_key_start = pos + init_data_block_len
+        next_pos = ts_key_start + ts_bytes_len + key_len + block_value_len
+
+        if next_data_block_pos:  # A value of 0 means it was deleted
+            ts_key = read_at(ts_key_start, ts_bytes_len + key_len)
+            key = bytes(ts_key[ts_bytes_len:])
+            ts_int = bytes_to_int(ts_key[:ts_bytes_len]) if ts_bytes_len else None
+            if fixed or (key not in reserved_key_bytes and not (dedup and key_len == dedup_key_len and key.startswith(dedup_key_prefix))):
+                if (key_prefix is None or key.startswith(key_prefix)) and not (check_ts and ((since_ts is not None and ts_int < since_ts) or (until_ts is not None and ts_int >= until_ts))) and (key_filter is None or key_filter(key)):
+                    yield key, ts_int, bytes(read_at(ts_key_start + ts_bytes_len + key_len, block_value_len))
+
+        pos = next_pos
+
+
+def iter_filtered(file, n_buckets, ts_bytes_len, value_len, index_offset=sub_index_init_pos, first_data_block_pos=0, key_prefix=None, key_filter=None, since_ts=None, until_ts=None, dedup=False):
+    """
+    Iterate (key, ts_int_or_None, value) over the live user blocks whose key
+    starts with key_prefix, passes key_filter and whose timestamp is in
+    [since_ts, until_ts). file can be a file object or an mmap. Region
+    handling mirrors iter_keys_values.
+    """
+    if isinstance(file, mmap.mmap):
+        file_end = len(file)
+
+        def read_at(pos, n):
+            return file[pos:pos + n]
+    else:
+        file_end = file.seek(0, 2)
+
+        def read_at(pos, n):
+            file.seek(pos)
+            return file.read(n)
+
+    if first_data_block_pos == 0:
+        first_data_block_pos = sub_index_init_pos + (n_buckets * n_bytes_file)
+
+    if index_offset != sub_index_init_pos:
+        regions = [(first_data_block_pos, index_offset), (index_offset + (n_buckets * n_bytes_file), file_end)]
+    else:
+        regions = [(first_data_block_pos, file_end)]
+
+    for start, end in regions:
+        yield from _iter_filtered_region(read_at, start, end, ts_bytes_len, value_len, key_prefix, key_filter, since_ts, until_ts, dedup)
+
+
+def block_boundaries(file, start, end, targets, ts_bytes_len=0, value_len=None):
+    """
+    The first block boundary at or after each of the sorted targets in the
+    region [start, end), found by a walk of the block headers (value_len is
+    set for fixed-length files). file can also be an mmap.
+    """
+    init_data_block_len = key_hash_len + n_bytes_file + n_bytes_key
+    if value_len is None:
+        init_data_block_len += n_bytes_value
+
+    boundaries = []
+    pos = start
+    for target in targets:
+        while pos < target and pos < end:
+            file.seek(pos)
+            init_data_block = file.read(init_data_block_len)
+            key_len = bytes_to_int(init_data_block[key_hash_len + n_bytes_file:key_hash_len + n_bytes_file + n_bytes_key])
+            if value_len is None:
+                pos += init_data_block_len + ts_bytes_len + key_len + bytes_to_int(init_data_block[key_hash_len + n_bytes_file + n_bytes_key:])
+            else:
+                pos += init_data_block_len + key_len + value_len
+        boundaries.append(min(pos, end))
+
+    return boundaries
+
+
+def iter_locations(file, n_buckets, ts_bytes_len, index_offset=sub_index_init_pos, first_data_block_pos=0, dedup=False):
     """
     Iterate (key, ts_int_or_None, value_offset, value_len) over all live user
     keys - header-only (never reads value bytes). Region handling mirrors
@@ -665,22 +1089,69 @@ def iter_locations(file, n_buckets, ts_bytes_len, index_offset=sub_index_init_po
 
     if index_offset != sub_index_init_pos:
         # Relocated index: scan two regions
-        yield from iter_locations_from_start_end_pos(file, first_data_block_pos, index_offset, ts_bytes_len)
+        yield from iter_locations_from_start_end_pos(file, first_data_block_pos, index_offset, ts_bytes_len, dedup)
         start2 = index_offset + (n_buckets * n_bytes_file)
         if start2 < file_end:
-            yield from iter_locations_from_start_end_pos(file, start2, file_end, ts_bytes_len)
+            yield from iter_locations_from_start_end_pos(file, start2, file_end, ts_bytes_len, dedup)
     else:
         # Standard layout: one region
-        yield from iter_locations_from_start_end_pos(file, first_data_block_pos, file_end, ts_bytes_len)
+        yield from iter_locations_from_start_end_pos(file, first_data_block_pos, file_end, ts_bytes_len, dedup)
+
+
+def _iter_values_by_len_region(file, start, end, value_lens, ts_bytes_len):
+    one_extra_index_bytes_len = key_hash_len + n_bytes_file
+    init_data_block_len = one_extra_index_bytes_len + n_bytes_key + n_bytes_value
+
+    next_block_pos = start
+
+    while next_block_pos < end:
+        file.seek(next_block_pos)
+        init_data_block = file.read(init_data_block_len)
+
+        next_data_block_pos = bytes_to_int(init_data_block[key_hash_len:one_extra_index_bytes_len])
+        key_len = bytes_to_int(init_data_block[one_extra_index_bytes_len:one_extra_index_bytes_len + n_bytes_key])
+        value_len = bytes_to_int(init_data_block[one_extra_index_bytes_len + n_bytes_key:])
+
+        if next_data_block_pos and value_len in value_lens:
+            key_offset = next_block_pos + init_data_block_len + ts_bytes_len
+            file.seek(key_offset)
+            key_value = file.read(key_len + value_len)
+            yield key_value[:key_len], key_offset + key_len, key_value[key_len:]
+
+        next_block_pos += init_data_block_len + ts_bytes_len + key_len + value_len
+
+
+def iter_values_by_len(file, n_buckets, value_lens, ts_bytes_len, index_offset=sub_index_init_pos, first_data_block_pos=0):
+    """
+    Iterate (key, value_offset, value) over every live block, the hidden
+    internal ones included, whose value length is in value_lens. Only those
+    keys and values are read. Region handling mirrors iter_keys_values.
+    """
+    file_end = file.seek(0, 2)
+
+    if first_data_block_pos == 0:
+        first_data_block_pos = sub_index_init_pos + (n_buckets * n_bytes_file)
+
+    if index_offset != sub_index_init_pos:
+        # Relocated index: scan two regions
+        yield from _iter_values_by_len_region(file, first_data_block_pos, index_offset, value_lens, ts_bytes_len)
+        start2 = index_offset + (n_buckets * n_bytes_file)
+        if start2 < file_end:
+            yield from _iter_values_by_len_region(file, start2, file_end, value_lens, ts_bytes_len)
+    else:
+        yield from _iter_values_by_len_region(file, first_data_block_pos, file_end, value_lens, ts_bytes_len)
 
 
 ############################################
 ### mmap read functions
 
 
-def mmap_get_value(mm, key_hash, n_buckets, ts_bytes_len=0, index_offset=sub_index_init_pos):
+def mmap_get_value(mm, key_hash, n_buckets, ts_bytes_len=0, index_offset=sub_index_init_pos, view=False):
     """
-    Combined chain traversal and value read using mmap.
+    Combined chain traversal and value read using mmap. With view=True the
+    value is returned as a memoryview over the mmap instead of a bytes copy.
+    Returns None if the chain leads past the end of the map, to blocks
+    written after it was made, so the caller can remap.
     """
     one_extra_index_bytes_len = key_hash_len + n_bytes_file
     header_len = one_extra_index_bytes_len + n_bytes_key + n_bytes_value
@@ -691,6 +1162,8 @@ def mmap_get_value(mm, key_hash, n_buckets, ts_bytes_len=0, index_offset=sub_ind
 
     if data_block_pos > 1:
         while True:
+            if data_block_pos + header_len > len(mm):
+                return None
             header = mm[data_block_pos:data_block_pos + header_len]
             next_data_block_pos = bytes_to_int(header[key_hash_len:one_extra_index_bytes_len])
             if next_data_block_pos:
@@ -698,6 +1171,8 @@ def mmap_get_value(mm, key_hash, n_buckets, ts_bytes_len=0, index_offset=sub_ind
                     key_len = bytes_to_int(header[one_extra_index_bytes_len:one_extra_index_bytes_len + n_bytes_key])
                     value_len = bytes_to_int(header[one_extra_index_bytes_len + n_bytes_key:])
                     value_start = data_block_pos + header_len + ts_bytes_len + key_len
+                    if view:
+                        return memoryview(mm)[value_start:value_start + value_len]
                     return bytes(mm[value_start:value_start + value_len])
                 elif next_data_block_pos == 1:
                     return False
@@ -711,6 +1186,8 @@ def mmap_get_value(mm, key_hash, n_buckets, ts_bytes_len=0, index_offset=sub_ind
 def mmap_get_value_ts(mm, key_hash, n_buckets, include_value=True, include_ts=False, ts_bytes_len=0, index_offset=sub_index_init_pos):
     """
     Combined chain traversal and value/timestamp read using mmap.
+    Returns None if the chain leads past the end of the map, to blocks
+    written after it was made, so the caller can remap.
     """
     one_extra_index_bytes_len = key_hash_len + n_bytes_file
     header_len = one_extra_index_bytes_len + n_bytes_key + n_bytes_value
@@ -721,6 +1198,8 @@ def mmap_get_value_ts(mm, key_hash, n_buckets, include_value=True, include_ts=Fa
 
     if data_block_pos > 1:
         while True:
+            if data_block_pos + header_len > len(mm):
+                return None
             header = mm[data_block_pos:data_block_pos + header_len]
             next_data_block_pos = bytes_to_int(header[key_hash_len:one_extra_index_bytes_len])
             if next_data_block_pos:
@@ -753,6 +1232,8 @@ def mmap_get_value_ts(mm, key_hash, n_buckets, include_value=True, include_ts=Fa
 def mmap_contains_key(mm, key_hash, n_buckets, index_offset=sub_index_init_pos):
     """
     Determine if a key is present using mmap.
+    Returns None if the chain leads past the end of the map, to blocks
+    written after it was made, so the caller can remap.
     """
     index_len = key_hash_len + n_bytes_file
 
@@ -762,6 +1243,8 @@ def mmap_contains_key(mm, key_hash, n_buckets, index_offset=sub_index_init_pos):
 
     if data_block_pos > 1:
         while True:
+            if data_block_pos + index_len > len(mm):
+                return None
             data_index = mm[data_block_pos:data_block_pos + index_len]
             next_data_block_pos = bytes_to_int(data_index[key_hash_len:])
             if next_data_block_pos:
@@ -776,7 +1259,7 @@ def mmap_contains_key(mm, key_hash, n_buckets, index_offset=sub_index_init_pos):
     return False
 
 
-def _mmap_iter_keys_values_region(mm, start, end, include_key, include_value, include_ts, ts_bytes_len):
+def _mmap_iter_keys_values_region(mm, start, end, include_key, include_value, include_ts, ts_bytes_len, dedup=False):
     """
     Iterate over variable-length data blocks in a single region using mmap.
     """
@@ -800,7 +1283,7 @@ def _mmap_iter_keys_values_region(mm, start, end, include_key, include_value, in
             next_block_pos += init_data_block_len + ts_key_value_len
 
             key = bytes(ts_key_value[ts_bytes_len:ts_bytes_len + key_len])
-            if key not in reserved_key_bytes:
+            if key not in reserved_key_bytes and not (dedup and key_len == dedup_key_len and key.startswith(dedup_key_prefix)):
                 if include_ts:
                     ts_int = bytes_to_int(ts_key_value[:ts_bytes_len])
                     if include_value:
@@ -825,7 +1308,7 @@ def _mmap_iter_keys_values_region(mm, start, end, include_key, include_value, in
             next_block_pos += init_data_block_len + ts_key_value_len
 
 
-def mmap_iter_keys_values(mm, n_buckets, include_key, include_value, include_ts, ts_bytes_len, index_offset=sub_index_init_pos, first_data_block_pos=0):
+def mmap_iter_keys_values(mm, n_buckets, include_key, include_value, include_ts, ts_bytes_len, index_offset=sub_index_init_pos, first_data_block_pos=0, dedup=False):
     """
     Iterate over all keys/values using mmap.
     """
@@ -836,15 +1319,15 @@ def mmap_iter_keys_values(mm, n_buckets, include_key, include_value, include_ts,
 
     if index_offset != sub_index_init_pos:
         # Relocated index: scan two regions
-        yield from _mmap_iter_keys_values_region(mm, first_data_block_pos, index_offset, include_key, include_value, include_ts, ts_bytes_len)
+        yield from _mmap_iter_keys_values_region(mm, first_data_block_pos, index_offset, include_key, include_value, include_ts, ts_bytes_len, dedup)
         start2 = index_offset + (n_buckets * n_bytes_file)
         if start2 < mm_len:
-            yield from _mmap_iter_keys_values_region(mm, start2, mm_len, include_key, include_value, include_ts, ts_bytes_len)
+            yield from _mmap_iter_keys_values_region(mm, start2, mm_len, include_key, include_value, include_ts, ts_bytes_len, dedup)
     else:
-        yield from _mmap_iter_keys_values_region(mm, first_data_block_pos, mm_len, include_key, include_value, include_ts, ts_bytes_len)
+        yield from _mmap_iter_keys_values_region(mm, first_data_block_pos, mm_len, include_key, include_value, include_ts, ts_bytes_len, dedup)
 
 
-def _mmap_iter_locations_region(mm, start, end, ts_bytes_len):
+def _mmap_iter_locations_region(mm, start, end, ts_bytes_len, dedup=False):
     """
     Header-only region scan for locations() using mmap - the mmap twin of
     iter_locations_from_start_end_pos (never touches value bytes).
@@ -865,7 +1348,7 @@ def _mmap_iter_locations_region(mm, start, end, ts_bytes_len):
             payload_start = next_block_pos + init_data_block_len
             ts_key = mm[payload_start:payload_start + ts_bytes_len + key_len]
             key = bytes(ts_key[ts_bytes_len:])
-            if key not in reserved_key_bytes:
+            if key not in reserved_key_bytes and not (dedup and key_len == dedup_key_len and key.startswith(dedup_key_prefix)):
                 ts_int = bytes_to_int(ts_key[:ts_bytes_len]) if ts_bytes_len else None
                 value_offset = payload_start + ts_bytes_len + key_len
                 yield key, ts_int, value_offset, value_len
@@ -873,7 +1356,7 @@ def _mmap_iter_locations_region(mm, start, end, ts_bytes_len):
         next_block_pos += init_data_block_len + ts_bytes_len + key_len + value_len
 
 
-def mmap_iter_locations(mm, n_buckets, ts_bytes_len, index_offset=sub_index_init_pos, first_data_block_pos=0):
+def mmap_iter_locations(mm, n_buckets, ts_bytes_len, index_offset=sub_index_init_pos, first_data_block_pos=0, dedup=False):
     """
     Iterate (key, ts_int_or_None, value_offset, value_len) over all live user
     keys using mmap - header-only. Region handling mirrors mmap_iter_keys_values.
@@ -885,17 +1368,19 @@ def mmap_iter_locations(mm, n_buckets, ts_bytes_len, index_offset=sub_index_init
 
     if index_offset != sub_index_init_pos:
         # Relocated index: scan two regions
-        yield from _mmap_iter_locations_region(mm, first_data_block_pos, index_offset, ts_bytes_len)
+        yield from _mmap_iter_locations_region(mm, first_data_block_pos, index_offset, ts_bytes_len, dedup)
         start2 = index_offset + (n_buckets * n_bytes_file)
         if start2 < mm_len:
-            yield from _mmap_iter_locations_region(mm, start2, mm_len, ts_bytes_len)
+            yield from _mmap_iter_locations_region(mm, start2, mm_len, ts_bytes_len, dedup)
     else:
-        yield from _mmap_iter_locations_region(mm, first_data_block_pos, mm_len, ts_bytes_len)
+        yield from _mmap_iter_locations_region(mm, first_data_block_pos, mm_len, ts_bytes_len, dedup)
 
 
 def mmap_get_value_fixed(mm, key_hash, n_buckets, value_len, index_offset=sub_index_init_pos):
     """
     Combined chain traversal and value read for fixed-length values using mmap.
+    Returns None if the chain leads past the end of the map, to blocks
+    written after it was made, so the caller can remap.
     """
     one_extra_index_bytes_len = key_hash_len + n_bytes_file
     header_len = one_extra_index_bytes_len + n_bytes_key
@@ -906,6 +1391,8 @@ def mmap_get_value_fixed(mm, key_hash, n_buckets, value_len, index_offset=sub_in
 
     if data_block_pos > 1:
         while True:
+            if data_block_pos + header_len > len(mm):
+                return None
             header = mm[data_block_pos:data_block_pos + header_len]
             next_data_block_pos = bytes_to_int(header[key_hash_len:one_extra_index_bytes_len])
             if next_data_block_pos:
@@ -968,9 +1455,52 @@ def mmap_iter_keys_values_fixed(mm, n_buckets, include_key, include_value, value
         yield from _mmap_iter_keys_values_fixed_region(mm, first_data_block_pos, mm_len, include_key, include_value, value_len)
 
 
+def _mmap_iter_locations_fixed_region(mm, start, end, value_len):
+    """
+    Header-only region scan for fixed-length locations() using mmap - the
+    mmap twin of _iter_locations_fixed_region.
+    """
+    one_extra_index_bytes_len = key_hash_len + n_bytes_file
+    init_data_block_len = one_extra_index_bytes_len + n_bytes_key
+
+    pos = start
+
+    while pos < end:
+        init_data_block = mm[pos:pos + init_data_block_len]
+        next_data_block_pos = bytes_to_int(init_data_block[key_hash_len:one_extra_index_bytes_len])
+        key_len = bytes_to_int(init_data_block[one_extra_index_bytes_len:])
+        payload_start = pos + init_data_block_len
+
+        if next_data_block_pos:  # A value of 0 means it was deleted
+            yield bytes(mm[payload_start:payload_start + key_len]), None, payload_start + key_len, value_len
+
+        pos += init_data_block_len + key_len + value_len
+
+
+def mmap_iter_locations_fixed(mm, n_buckets, value_len, index_offset=sub_index_init_pos, first_data_block_pos=0):
+    """
+    Iterate (key, None, value_offset, value_len) over all live keys of a
+    fixed-length file using mmap. Region handling mirrors
+    mmap_iter_keys_values_fixed.
+    """
+    mm_len = len(mm)
+
+    if first_data_block_pos == 0:
+        first_data_block_pos = sub_index_init_pos + (n_buckets * n_bytes_file)
+
+    if index_offset != sub_index_init_pos:
+        yield from _mmap_iter_locations_fixed_region(mm, first_data_block_pos, index_offset, value_len)
+        start2 = index_offset + (n_buckets * n_bytes_file)
+        if start2 < mm_len:
+            yield from _mmap_iter_locations_fixed_region(mm, start2, mm_len, value_len)
+    else:
+        yield from _mmap_iter_locations_fixed_region(mm, first_data_block_pos, mm_len, value_len)
+
+
 def assign_delete_flag(file, key_hash, n_buckets, index_offset=sub_index_init_pos):
     """
     Assigns 0 at the key hash index and the key/value data block.
+    Returns the position of the tombstoned block, or False if the key was not found.
     """
     index_len = key_hash_len + n_bytes_file
 
@@ -991,7 +1521,7 @@ def assign_delete_flag(file, key_hash, n_buckets, index_offset=sub_index_init_po
                     file.write(b'\x00\x00\x00\x00\x00\x00')
                     file.seek(previous_data_index_pos)
                     file.write(next_data_block_pos_bytes)
-                    return True
+                    return data_block_pos
 
                 elif next_data_block_pos == 1:
                     return False
@@ -1005,16 +1535,81 @@ def assign_delete_flag(file, key_hash, n_buckets, index_offset=sub_index_init_po
         return False
 
 
-def write_data_blocks(file, key, value, n_buckets, buffer_data, buffer_index, buffer_index_set, write_buffer_size, timestamp=None, ts_bytes_len=0, index_offset=sub_index_init_pos):
+def overwrite_value_variable(file, key_hash, n_buckets, value, timestamp=None, ts_bytes_len=0, index_offset=sub_index_init_pos):
+    """
+    Overwrite the value of an existing key inside its current block when the
+    new value fits. The block keeps its position and chain link; the value is
+    written, any trailing slack is covered by a skip block (a tombstone that
+    prune reclaims as dead space), and value_len and the timestamp are
+    rewritten last. Slack too small to hold a skip block cannot be framed, so
+    that case (like a larger value) returns False and the caller appends as
+    usual. Returns the position of the block on success.
     """
+    one_extra_index_bytes_len = key_hash_len + n_bytes_file
+    header_len = one_extra_index_bytes_len + n_bytes_key + n_bytes_value
+    min_skip_block_len = header_len + ts_bytes_len + 1
+
+    index_bucket = get_index_bucket(key_hash, n_buckets)
+    bucket_index_pos = get_bucket_index_pos(index_bucket, index_offset)
+    data_block_pos = get_first_data_block_pos(file, bucket_index_pos)
+
+    if data_block_pos:
+        while True:
+            file.seek(data_block_pos)
+            header = file.read(header_len)
+            next_data_block_pos = bytes_to_int(header[key_hash_len:one_extra_index_bytes_len])
+            if next_data_block_pos:
+                if header[:key_hash_len] == key_hash:
+                    old_value_len = bytes_to_int(header[one_extra_index_bytes_len + n_bytes_key:])
+                    value_len = len(value)
+                    slack = old_value_len - value_len
+                    if slack < 0 or (0 < slack < min_skip_block_len):
+                        return False
+
+                    write_bytes = bytearray(int_to_bytes(value_len, n_bytes_value))
+                    if ts_bytes_len:
+                        write_bytes.extend(int_to_bytes(make_timestamp_int(timestamp), ts_bytes_len))
+                    key_len = bytes_to_int(header[one_extra_index_bytes_len:one_extra_index_bytes_len + n_bytes_key])
 
+                    ## The value and the skip block over the slack first, then
+                    ## value_len/timestamp, so the block stays framed by the old
+                    ## length until the new one is published
+                    value_pos = file.seek(data_block_pos + header_len + ts_bytes_len + key_len)
+                    file.write(value)
+                    if slack:
+                        write_skip_block_variable(file, value_pos + value_len, slack, ts_bytes_len)
+                    file.seek(data_block_pos + header_len - n_bytes_value)
+                    file.write(write_bytes)
+                    return data_block_pos
+                elif next_data_block_pos == 1:
+                    return False
+            else:
+                return False
+            data_block_pos = next_data_block_pos
+
+    return False
+
+
+def write_data_blocks(file, key, value, n_buckets, buffer_data, buffer_index, buffer_index_set, write_buffer_size, timestamp=None, ts_bytes_len=0, index_offset=sub_index_init_pos, overwrite_in_place=False, in_place_positions=None):
+    """
+    With overwrite_in_place, an existing on-disk key whose new value fits in its
+    current block is rewritten there (overwrite_value_variable) instead of
+    appending a new block. The positions of those blocks are appended to
+    in_place_positions if it is a list.
     """
     n_keys = 0
 
+    key_hash = hash_key(key)
+
+    if overwrite_in_place and key_hash not in buffer_index_set:
+        data_block_pos = overwrite_value_variable(file, key_hash, n_buckets, value, timestamp, ts_bytes_len, index_offset)
+        if data_block_pos:
+            if in_place_positions is not None:
+                in_place_positions.append(data_block_pos)
+            return n_keys
+
     ## Prep data
     file_len = file.seek(0, 2)
-
-    key_hash = hash_key(key)
     key_bytes_len = len(key)
     value_bytes_len = len(value)
 
@@ -1045,6 +1640,290 @@ def write_data_blocks(file, key, value, n_buckets, buffer_data, buffer_index, bu
     return n_keys
 
 
+def read_chunk(fileobj, n):
+    """
+    Read n bytes from fileobj, fewer only at its end.
+    """
+    chunks = []
+    while n > 0:
+        chunk = fileobj.read(n)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        n -= len(chunk)
+
+    return b''.join(chunks)
+
+
+def write_stream(file, first, fileobj, length=None, max_len=None):
+    """
+    Write first, then the rest of fileobj in chunks of stream_chunk_size, at
+    the current position of file. With a length, exactly length bytes are
+    written in total. Returns the number of bytes written.
+    """
+    file.write(first)
+    written = len(first)
+    while length is None or written < length:
+        n = stream_chunk_size if length is None else min(stream_chunk_size, length - written)
+        chunk = read_chunk(fileobj, n)
+        file.write(chunk)
+        written += len(chunk)
+        if max_len is not None and written > max_len:
+            raise ValueError(f'The value is larger than the maximum of {max_len} bytes.')
+        if len(chunk) < n:
+            break
+
+    if length is not None and written < length:
+        raise ValueError(f'The stream ended after {written} of {length} bytes.')
+
+    return written
+
+
+def write_data_block_stream(file, key, first, fileobj, length=None, timestamp=None, ts_bytes_len=0):
+    """
+    Append a data block whose value is first followed by the rest of fileobj,
+    written in chunks straight to the end of file. Without a length the value
+    runs to the end of fileobj, so the header goes in as a deleted block whose
+    value_len runs past the end of the file: a scan after a crash mid-stream
+    skips the partial value instead of parsing it as blocks. The real length
+    is patched in once the value is written, and the block made live last.
+    The block is not linked into the index. Returns (data_block_pos,
+    value_len).
+    """
+    max_len = 256**n_bytes_value - 1
+    if length is not None and length > max_len:
+        raise ValueError(f'The value is larger than the maximum of {max_len} bytes.')
+
+    data_block_pos = file.seek(0, 2)
+    next_bytes = b'\x01\x00\x00\x00\x00\x00' if length is not None else b'\x00' * n_bytes_file
+    write_bytes = hash_key(key) + next_bytes + int_to_bytes(len(key), n_bytes_key) + int_to_bytes(max_len if length is None else length, n_bytes_value)
+    if ts_bytes_len:
+        write_bytes += int_to_bytes(make_timestamp_int(timestamp), ts_bytes_len)
+    file.write(write_bytes + key)
+
+    value_len = write_stream(file, first, fileobj, length, max_len)
+    if length is None:
+        file.seek(data_block_pos + key_hash_len + n_bytes_file + n_bytes_key)
+        file.write(int_to_bytes(value_len, n_bytes_value))
+        file.seek(data_block_pos + key_hash_len)
+        file.write(b'\x01\x00\x00\x00\x00\x00')
+
+    return data_block_pos, value_len
+
+
+def pread(file, n, offset, lock):
+    """
+    Read n bytes at offset of file with os.pread, which leaves the position
+    of file alone. Where os.pread is not available (Windows) the file is read
+    with seek and read while holding lock, as every other user of its
+    position does.
+    """
+    if hasattr(os, 'pread'):
+        return os.pread(file.fileno(), n, offset)
+    with lock:
+        file.seek(offset)
+        return file.read(n)
+
+
+class ValueReader(io.RawIOBase):
+    """
+    A read-only, seekable binary file object over the length bytes at offset
+    of a file, an mmap or a blob file. Reads go through read_at(pos, n), so
+    nothing is read up front.
+    """
+    def __init__(self, read_at, offset, length):
+        self._read_at = read_at
+        self._offset = offset
+        self._length = length
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        self._checkClosed()
+        return self._pos
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        self._checkClosed()
+        if whence == io.SEEK_SET:
+            new_pos = pos
+        elif whence == io.SEEK_CUR:
+            new_pos = self._pos + pos
+        elif whence == io.SEEK_END:
+            new_pos = self._length + pos
+        else:
+            raise ValueError(f'Invalid whence ({whence}).')
+        if new_pos < 0:
+            raise ValueError(f'Negative seek position {new_pos}.')
+        self._pos = new_pos
+        return new_pos
+
+    def read(self, size=-1):
+        self._checkClosed()
+        n = self._length - self._pos
+        if size is not None and 0 <= size < n:
+            n = size
+        if n <= 0:
+            return b''
+        data = self._read_at(self._offset + self._pos, n)
+        self._pos += len(data)
+        return data
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, b):
+        data = self.read(len(memoryview(b).cast('B')))
+        memoryview(b).cast('B')[:len(data)] = data
+        return len(data)
+
+
+def send_file_range(file, out, offset, count, lock):
+    """
+    Send count bytes at offset of file to out (a socket, a file object or a
+    file descriptor) with os.sendfile, which copies in the kernel and leaves
+    the position of file alone. Where sendfile is not available (a BytesIO
+    file, or the platform) the bytes are read and written in chunks, with
+    pread, or with seek and read while holding lock (the lock that guards
+    the position of file). Returns the number of bytes sent.
+    """
+    out_fd = out if isinstance(out, int) else out.fileno()
+    timeout = out.gettimeout() if hasattr(out, 'gettimeout') else None
+    sent = 0
+
+    if hasattr(os, 'sendfile') and not isinstance(file, io.BytesIO):
+        in_fd = file.fileno()
+        while sent < count:
+            try:
+                n = os.sendfile(out_fd, in_fd, offset + sent, count - sent)
+            except BlockingIOError:
+                ## A socket with a timeout: wait until it can take more
+                if not select.select([], [out_fd], [], timeout)[1]:
+                    raise TimeoutError('timed out')
+                continue
+            if n == 0:
+                break
+            sent += n
+
+        return sent
+
+    while sent < count:
+        n = min(stream_chunk_size, count - sent)
+        if isinstance(file, io.BytesIO):
+            with lock:
+                file.seek(offset + sent)
+                chunk = file.read(n)
+        else:
+            chunk = pread(file, n, offset + sent, lock)
+        if not chunk:
+            break
+        if hasattr(out, 'sendall'):
+            out.sendall(chunk)
+        else:
+            view = memoryview(chunk)
+            while view:
+                view = view[os.write(out_fd, view):]
+        sent += len(chunk)
+
+    return sent
+
+
+def _preadv_run(fd, buffers, offset, length):
+    """
+    Fill buffers (memoryviews) with the length bytes at offset of fd, with as
+    few os.preadv calls as the kernel allows.
+    """
+    while length > 0:
+        if hasattr(os, 'preadv'):
+            n = os.preadv(fd, buffers, offset)
+        else:
+            data = os.pread(fd, length, offset)
+            n = len(data)
+            pos = 0
+            for buffer in buffers:
+                buffer[:] = data[pos:pos + len(buffer)]
+                pos += len(buffer)
+                if pos >= n:
+                    break
+        if n == 0:
+            raise ValueError('The locations reach past the end of the file.')
+        offset += n
+        length -= n
+
+        ## A short read: carry on with the unfilled buffers
+        while buffers and n >= len(buffers[0]):
+            n -= len(buffers[0])
+            buffers = buffers[1:]
+        if n:
+            buffers = [buffers[0][n:]] + buffers[1:]
+
+
+def read_locations(fd, locations, into=None, n_threads=None):
+    """
+    Read the value bytes of many (value_offset, value_len) locations, e.g.
+    the tuples of locations() (their last two items are used), from fd (a
+    file descriptor or an object with fileno()).
+
+    The locations are sorted by offset and adjacent ones are coalesced into
+    runs; each run is read with one os.preadv straight into the output
+    buffers (up to iov_max values per call). With n_threads, the runs are
+    read across a pool of that many threads (preadv releases the GIL).
+
+    Without into, returns a list of the values as bytes, in the order of
+    locations. With into (a writable, contiguous buffer such as a bytearray
+    or numpy array), the values are written into it back to back in the
+    order of locations and the number of bytes written is returned.
+    """
+    if not isinstance(fd, int):
+        fd = fd.fileno()
+
+    spans = [tuple(location[-2:]) for location in locations]
+    starts = []
+    total = 0
+    for offset, length in spans:
+        starts.append(total)
+        total += length
+
+    if into is None:
+        view = memoryview(bytearray(total))
+    else:
+        view = memoryview(into).cast('B')
+        if view.readonly:
+            raise ValueError('into must be a writable buffer.')
+        if len(view) < total:
+            raise ValueError(f'into is smaller than the {total} bytes to read.')
+
+    runs = []
+    for i in sorted(range(len(spans)), key=lambda i: spans[i][0]):
+        offset, length = spans[i]
+        buffer = view[starts[i]:starts[i] + length]
+        if runs and runs[-1][0] + runs[-1][1] == offset and len(runs[-1][2]) < iov_max:
+            runs[-1][1] += length
+            runs[-1][2].append(buffer)
+        else:
+            runs.append([offset, length, [buffer]])
+
+    def read_runs(runs):
+        for offset, length, buffers in runs:
+            _preadv_run(fd, buffers, offset, length)
+
+    if n_threads and n_threads > 1 and len(runs) > 1:
+        step = -(-len(runs) // (n_threads * 4))
+        with ThreadPoolExecutor(n_threads) as pool:
+            list(pool.map(read_runs, [runs[i:i + step] for i in range(0, len(runs), step)]))
+    else:
+        read_runs(runs)
+
+    if into is None:
+        return [bytes(view[start:start + length]) for start, (offset, length) in zip(starts, spans)]
+
+    return total
+
+
 def flush_data_buffer(file, buffer_data, write_pos):
     """
 
@@ -1154,7 +2033,38 @@ def clear(file, n_buckets, n_keys_pos, write_buffer_size):
     file.flush()
 
 
-def prune_file(file, timestamp, n_buckets, n_bytes_file, n_bytes_key, n_bytes_value, write_buffer_size, ts_bytes_len, buffer_data, buffer_index, buffer_index_set, index_offset=sub_index_init_pos, first_data_block_pos=0, keep_hashes=frozenset()):
+def pruned_dedup_releases(file, read_regions, timestamp, ts_bytes_len, keep_hashes=frozenset()):
+    """
+    Count the references to dedup content blocks held by the key blocks that
+    prune_file's timestamp filter will drop. Returns {content key hash: count}.
+    """
+    one_extra_index_bytes_len = key_hash_len + n_bytes_file
+    init_data_block_len = one_extra_index_bytes_len + n_bytes_key + n_bytes_value
+
+    releases = {}
+    for region_start, region_end in read_regions:
+        read_pos = region_start
+        while read_pos < region_end:
+            file.seek(read_pos)
+            init_data_block = file.read(init_data_block_len)
+            next_data_block_pos = bytes_to_int(init_data_block[key_hash_len:one_extra_index_bytes_len])
+            key_len = bytes_to_int(init_data_block[one_extra_index_bytes_len:one_extra_index_bytes_len + n_bytes_key])
+            value_len = bytes_to_int(init_data_block[one_extra_index_bytes_len + n_bytes_key:])
+
+            key_hash = init_data_block[:key_hash_len]
+            if next_data_block_pos and value_len == dedup_key_len and key_hash not in reserved_key_hashes and key_hash not in keep_hashes:
+                ts_key_value = file.read(ts_bytes_len + key_len + value_len)
+                value = ts_key_value[ts_bytes_len + key_len:]
+                if bytes_to_int(ts_key_value[:ts_bytes_len]) < timestamp and not is_dedup_key(ts_key_value[ts_bytes_len:ts_bytes_len + key_len]) and is_dedup_key(value):
+                    content_hash = hash_key(value)
+                    releases[content_hash] = releases.get(content_hash, 0) + 1
+
+            read_pos += init_data_block_len + ts_bytes_len + key_len + value_len
+
+    return releases
+
+
+def prune_file(file, timestamp, n_buckets, n_bytes_file, n_bytes_key, n_bytes_value, write_buffer_size, ts_bytes_len, buffer_data, buffer_index, buffer_index_set, index_offset=sub_index_init_pos, first_data_block_pos=0, keep_hashes=frozenset(), dedup=False):
     """
 
     """
@@ -1178,6 +2088,14 @@ def prune_file(file, timestamp, n_buckets, n_bytes_file, n_bytes_key, n_bytes_va
     else:
         read_regions = [(first_data_block_pos, file_len)]
 
+    ## Key blocks dropped by the timestamp filter release their references to
+    ## dedup content blocks. The counts are applied to the compacted copies in
+    ## Pass 1 rather than in place, so a crash before then releases nothing.
+    if dedup and timestamp and ts_bytes_len:
+        releases = pruned_dedup_releases(file, read_regions, timestamp, ts_bytes_len, keep_hashes)
+    else:
+        releases = {}
+
     ## Pass 1: compact the live data blocks in place, streaming toward a write cursor that starts at
     ## byte 200 (over the now-dead old index / already-read data). Because data always begins at
     ## first_data_block_pos > 200 and reindex never lowers it, and because each block is read fully
@@ -1211,6 +2129,18 @@ def prune_file(file, timestamp, n_buckets, n_bytes_file, n_bytes_key, n_bytes_va
                     # Keep reserved keys (metadata + app slots) regardless of the
                     # timestamp filter; subtract them from n_keys later.
                     reserved_keys_added += 1
+                elif dedup and key_len == dedup_key_len and ts_key_value_bytes[ts_bytes_len:ts_bytes_len + len(dedup_key_prefix)] == dedup_key_prefix:
+                    # Dedup content blocks are kept while referenced, whatever
+                    # their age, and dropped once their refcount reaches 0.
+                    refcount_pos = ts_bytes_len + key_len
+                    refcount = bytes_to_int(ts_key_value_bytes[refcount_pos:refcount_pos + dedup_refcount_len])
+                    if key_hash in releases:
+                        refcount = max(refcount - releases[key_hash], 0)
+                        ts_key_value_bytes = ts_key_value_bytes[:refcount_pos] + int_to_bytes(refcount, dedup_refcount_len) + ts_key_value_bytes[refcount_pos + dedup_refcount_len:]
+                    if refcount:
+                        reserved_keys_added += 1
+                    else:
+                        keep = False
                 elif timestamp and ts_bytes_len and key_hash not in keep_hashes:
                     ts_int = bytes_to_int(ts_key_value_bytes[:ts_bytes_len])
                     if ts_int < timestamp:
@@ -1472,7 +2402,8 @@ def init_files_variable(self, file_path, flag, key_serializer, value_serializer,
     
                 ## Lock
                 try:
-                    _acquire_lock(self._file, portalocker.LOCK_SH, timeout, fp)
+                    if self._shared_lock:
+                        _acquire_lock(self._file, portalocker.LOCK_SH, timeout, fp)
                 except BaseException:
                     self._file.close()
                     raise
@@ -1623,6 +2554,25 @@ def copy_file_range(fsrc, fdst, count, offset_src, offset_dst, write_buffer_size
     fdst.flush()
 
 
+def read_file_compactions(file):
+    """
+    The compaction count in the header. file can be an mmap.
+    """
+    file.seek(file_compactions_pos)
+    return bytes_to_int(file.read(file_compactions_len))
+
+
+def bump_file_compactions(file):
+    """
+    Add one to the compaction count in the header. Returns the new count.
+    """
+    count = (read_file_compactions(file) + 1) % 256**file_compactions_len
+    file.seek(file_compactions_pos)
+    file.write(int_to_bytes(count, file_compactions_len))
+
+    return count
+
+
 def read_base_params_variable(self, base_param_bytes, key_serializer, value_serializer):
     """
 
@@ -1756,9 +2706,11 @@ def init_base_params_variable(self, key_serializer, value_serializer, n_buckets,
 ### Fixed value alternative functions
 
 
-def init_files_fixed(self, file_path, flag, key_serializer, value_len, n_buckets, write_buffer_size, init_bytes, timeout=None):
+def init_files_fixed(self, file_path, flag, key_serializer, value_len, n_buckets, write_buffer_size, init_bytes, timeout=None, dense=False):
     """
-
+    dense selects the direct-address layout (DenseFixedLengthValue): header
+    flag set, no bucket index. Opening a file of the other layout raises
+    TypeError.
     """
     if isinstance(file_path, io.BytesIO):
         if file_path.seek(0, 2) > 0:
@@ -1830,7 +2782,8 @@ def init_files_fixed(self, file_path, flag, key_serializer, value_len, n_buckets
 
                 ## Lock
                 try:
-                    _acquire_lock(self._file, portalocker.LOCK_SH, timeout, fp)
+                    if self._shared_lock:
+                        _acquire_lock(self._file, portalocker.LOCK_SH, timeout, fp)
                 except BaseException:
                     self._file.close()
                     raise
@@ -1840,7 +2793,7 @@ def init_files_fixed(self, file_path, flag, key_serializer, value_len, n_buckets
 
         ## system and version check
         sys_uuid = base_param_bytes[:16]
-        if sys_uuid != uuid_fixed_blt:
+        if sys_uuid != (uuid_dense_blt if dense else uuid_fixed_blt):
             if is_file:
                 portalocker.lock(self._file, portalocker.LOCK_UN)
             raise TypeError('This is not the correct file type.')
@@ -1881,9 +2834,13 @@ def init_files_fixed(self, file_path, flag, key_serializer, value_len, n_buckets
         ## If init_bytes are passed, then parse bytes
         if isinstance(init_bytes, (bytes, bytearray)):
             init_bytes = bytearray(init_bytes)
+            if init_bytes[:16] != (uuid_dense_blt if dense else uuid_fixed_blt):
+                raise TypeError('This is not the correct file type.')
             read_base_params_fixed(self, init_bytes, key_serializer)
-            # 0 out the n_keys
+            # 0 out the n_keys and the slot free-list
             init_bytes[n_keys_pos:n_keys_pos+4] = int_to_bytes(0, 4)
+            init_bytes[free_list_pos:free_list_pos + (free_list_n_slots * free_list_slot_len)] = bytes(free_list_n_slots * free_list_slot_len)
+            self._free_slots = {}
 
             # Reset index position so the new file doesn't inherit a large offset
             # from a reindexed source file (which would create an oversized sparse file)
@@ -1899,10 +2856,13 @@ def init_files_fixed(self, file_path, flag, key_serializer, value_len, n_buckets
             uuid8 = uuid.uuid8()
 
             init_bytes = init_base_params_fixed(self, key_serializer, value_len, n_buckets, file_timestamp, uuid8)
+            if dense:
+                init_bytes = uuid_dense_blt + init_bytes[16:dense_flag_pos] + b'\x01' + init_bytes[dense_flag_pos + 1:]
 
             self.uuid = uuid8
             self._n_buckets = n_buckets
             self._value_len = value_len
+            self._free_slots = {}
             self._init_timestamps = 0
             self._ts_bytes_len = 0
 
@@ -1933,7 +2893,8 @@ def init_files_fixed(self, file_path, flag, key_serializer, value_len, n_buckets
         with self._thread_lock:
             self._file.write(init_bytes)
 
-            write_init_bucket_indexes(self._file, self._n_buckets, sub_index_init_pos, write_buffer_size)
+            if not dense:
+                write_init_bucket_indexes(self._file, self._n_buckets, sub_index_init_pos, write_buffer_size)
 
     ## Create mmap for read-only file mode
     if not write and is_file:
@@ -1961,6 +2922,7 @@ def read_base_params_fixed(self, base_param_bytes, key_serializer):
     saved_key_serializer = bytes_to_int(base_param_bytes[31:n_keys_pos])
     self._n_keys = bytes_to_int(base_param_bytes[n_keys_pos:n_keys_pos+4])
     self._value_len = bytes_to_int(base_param_bytes[37:41])
+    self._free_slots = read_free_slots_fixed(base_param_bytes)
     self._init_timestamps = base_param_bytes[41]
     self._ts_bytes_len = 0
     self._file_timestamp = bytes_to_int(base_param_bytes[file_timestamp_pos:file_timestamp_pos + timestamp_bytes_len])
@@ -2128,16 +3090,230 @@ def iter_keys_values_fixed(file, n_buckets, include_key, include_value, value_le
         yield from _iter_keys_values_fixed_region(file, first_data_block_pos, file_end, include_key, include_value, value_len)
 
 
-def write_data_blocks_fixed(file, key, value, n_buckets, buffer_data, buffer_index, buffer_index_set, write_buffer_size, index_offset=sub_index_init_pos):
+def _iter_locations_fixed_region(file, start, end, value_len):
+    """
+    Header-only region scan for fixed-length locations(): yields
+    (key, None, value_offset, value_len) for live blocks, reading only the
+    block headers and keys.
+    """
+    one_extra_index_bytes_len = key_hash_len + n_bytes_file
+    init_data_block_len = one_extra_index_bytes_len + n_bytes_key
+
+    pos = start
+
+    while pos < end:
+        file.seek(pos)
+        init_data_block = file.read(init_data_block_len)
+        next_data_block_pos = bytes_to_int(init_data_block[key_hash_len:one_extra_index_bytes_len])
+        key_len = bytes_to_int(init_data_block[one_extra_index_bytes_len:])
+
+        if next_data_block_pos: # A value of 0 means it was deleted
+            key = file.read(key_len)
+            yield key, None, pos + init_data_block_len + key_len, value_len
+
+        pos += init_data_block_len + key_len + value_len
+
+
+def iter_locations_fixed(file, n_buckets, value_len, index_offset=sub_index_init_pos, first_data_block_pos=0):
+    """
+    Iterate (key, None, value_offset, value_len) over all live keys of a
+    fixed-length file. Region handling mirrors iter_keys_values_fixed.
     """
+    file_end = file.seek(0, 2)
+
+    if first_data_block_pos == 0:
+        first_data_block_pos = sub_index_init_pos + (n_buckets * n_bytes_file)
 
+    if index_offset != sub_index_init_pos:
+        # Relocated index: scan two regions
+        yield from _iter_locations_fixed_region(file, first_data_block_pos, index_offset, value_len)
+        start2 = index_offset + (n_buckets * n_bytes_file)
+        if start2 < file_end:
+            yield from _iter_locations_fixed_region(file, start2, file_end, value_len)
+    else:
+        yield from _iter_locations_fixed_region(file, first_data_block_pos, file_end, value_len)
+
+
+def overwrite_value_fixed(file, key_hash, n_buckets, value, index_offset=sub_index_init_pos):
+    """
+    Overwrite the value bytes of an existing key in place. Every fixed-length
+    block has its value at a fixed offset (header + key_len), so an update
+    needs no new block and no index change. Returns True if the key was found
+    on disk and overwritten, else False.
+    """
+    one_extra_index_bytes_len = key_hash_len + n_bytes_file
+    header_len = one_extra_index_bytes_len + n_bytes_key
+
+    index_bucket = get_index_bucket(key_hash, n_buckets)
+    bucket_index_pos = get_bucket_index_pos(index_bucket, index_offset)
+    data_block_pos = get_first_data_block_pos(file, bucket_index_pos)
+
+    if data_block_pos:
+        while True:
+            file.seek(data_block_pos)
+            header = file.read(header_len)
+            next_data_block_pos = bytes_to_int(header[key_hash_len:one_extra_index_bytes_len])
+            if next_data_block_pos:
+                if header[:key_hash_len] == key_hash:
+                    key_len = bytes_to_int(header[one_extra_index_bytes_len:])
+                    file.seek(key_len, 1)
+                    file.write(value)
+                    return True
+                elif next_data_block_pos == 1:
+                    return False
+            else:
+                return False
+            data_block_pos = next_data_block_pos
+
+    return False
+
+
+def read_free_slots_fixed(base_param_bytes):
+    """
+    Parse the free-list heads from the header into a {key_len: head_pos} dict.
+    """
+    region = bytes(base_param_bytes[free_list_pos:free_list_pos + (free_list_n_slots * free_list_slot_len)])
+    free_slots = {}
+
+    ## Files written before the free-list existed may carry the legacy ascii '0' filler
+    if region.strip(b'0') == b'':
+        return free_slots
+
+    for i in range(free_list_n_slots):
+        start = i * free_list_slot_len
+        key_len = bytes_to_int(region[start:start + n_bytes_key])
+        head = bytes_to_int(region[start + n_bytes_key:start + free_list_slot_len])
+        if key_len and head:
+            free_slots[key_len] = head
+
+    return free_slots
+
+
+def write_free_slots_fixed(file, free_slots):
+    """
+    Write the free-list heads to the header (empty lists are dropped).
+    """
+    region = bytearray()
+    for key_len, head in free_slots.items():
+        if head:
+            region.extend(int_to_bytes(key_len, n_bytes_key) + int_to_bytes(head, n_bytes_file))
+
+    region.extend(b'\x00' * ((free_list_n_slots * free_list_slot_len) - len(region)))
+
+    file.seek(free_list_pos)
+    file.write(region)
+
+
+def push_free_slot_fixed(file, free_slots, data_block_pos):
+    """
+    Add a tombstoned block to the free-list of its key length. The block must
+    already be unlinked from its chain (assign_delete_flag). Returns False when
+    all free-list slots are taken by other key lengths; the block is then left
+    for prune to reclaim.
+    """
+    file.seek(data_block_pos + key_hash_len + n_bytes_file)
+    key_len = bytes_to_int(file.read(n_bytes_key))
+
+    if key_len not in free_slots and len(free_slots) >= free_list_n_slots:
+        return False
+
+    ## Link the block first and publish the head second, so a crash in between only leaks the block
+    file.seek(data_block_pos)
+    file.write(int_to_bytes(free_slots.get(key_len, 0), n_bytes_file) + free_list_magic)
+
+    free_slots[key_len] = data_block_pos
+    write_free_slots_fixed(file, free_slots)
+
+    return True
+
+
+def pop_free_slot_fixed(file, free_slots, key_len):
+    """
+    Take a tombstoned block of key_len off the free-list. Returns its position,
+    or 0 if there is none. A head that no longer points at a listed tombstone
+    (e.g. the file was compacted by a booklet unaware of the free-list) drops
+    that list instead of handing out a live block.
+    """
+    head = free_slots.get(key_len)
+    if not head:
+        return 0
+
+    header_len = key_hash_len + n_bytes_file + n_bytes_key
+
+    file.seek(head)
+    header = file.read(header_len)
+
+    valid = (len(header) == header_len) and (header[n_bytes_file:key_hash_len] == free_list_magic) and (bytes_to_int(header[key_hash_len:key_hash_len + n_bytes_file]) == 0) and (bytes_to_int(header[key_hash_len + n_bytes_file:]) == key_len)
+
+    if valid:
+        next_free = bytes_to_int(header[:n_bytes_file])
+        if next_free:
+            free_slots[key_len] = next_free
+        else:
+            del free_slots[key_len]
+    else:
+        del free_slots[key_len]
+        head = 0
+
+    write_free_slots_fixed(file, free_slots)
+
+    return head
+
+
+def write_recycled_block_fixed(file, data_block_pos, key_hash, key, value, n_buckets, index_offset=sub_index_init_pos):
+    """
+    Write a new key into a recycled slot and link it into its bucket chain.
+    The block is written as a tombstone, linked at the chain tail, and only then
+    marked live, so no scanner or lookup ever sees a half-written block.
+    """
+    one_extra_index_bytes_len = key_hash_len + n_bytes_file
+
+    file.seek(data_block_pos)
+    file.write(key_hash + b'\x00\x00\x00\x00\x00\x00' + int_to_bytes(len(key), n_bytes_key) + key + value)
+
+    data_block_pos_bytes = int_to_bytes(data_block_pos, n_bytes_file)
+
+    index_bucket = get_index_bucket(key_hash, n_buckets)
+    previous_data_index_pos = get_bucket_index_pos(index_bucket, index_offset)
+    next_data_block_pos = get_first_data_block_pos(file, previous_data_index_pos)
+
+    while next_data_block_pos > 1:
+        file.seek(next_data_block_pos)
+        data_index = file.read(one_extra_index_bytes_len)
+        previous_data_index_pos = next_data_block_pos + key_hash_len
+        next_data_block_pos = bytes_to_int(data_index[key_hash_len:])
+
+    file.seek(previous_data_index_pos)
+    file.write(data_block_pos_bytes)
+
+    file.seek(data_block_pos + key_hash_len)
+    file.write(b'\x01\x00\x00\x00\x00\x00')
+
+
+def write_data_blocks_fixed(file, key, value, n_buckets, buffer_data, buffer_index, buffer_index_set, write_buffer_size, index_offset=sub_index_init_pos, free_slots=None):
+    """
+    Existing on-disk keys are overwritten in place (overwrite_value_fixed).
+    New keys take a recycled slot from free_slots when one of their key length
+    is available, else they append a block (as do keys still pending in the
+    write buffer, whose block is not on disk yet).
     """
     n_keys = 0
 
+    key_hash = hash_key(key)
+
+    if key_hash not in buffer_index_set:
+        if overwrite_value_fixed(file, key_hash, n_buckets, value, index_offset):
+            return n_keys
+
+        if free_slots:
+            data_block_pos = pop_free_slot_fixed(file, free_slots, len(key))
+            if data_block_pos:
+                write_recycled_block_fixed(file, data_block_pos, key_hash, key, value, n_buckets, index_offset)
+                return 1
+
     ## Prep data
     file_len = file.seek(0, 2)
 
-    key_hash = hash_key(key)
     key_bytes_len = len(key)
     # value_bytes_len = len(value)
 
@@ -2318,6 +3494,9 @@ def prune_file_fixed(file, n_buckets, n_bytes_file, n_bytes_key, value_len, writ
         file.write(int_to_bytes(0, n_bytes_file))
         n_keys = 0
 
+    ## Every tombstone is gone after compaction, so the slot free-list starts empty.
+    write_free_slots_fixed(file, {})
+
     ## Make the finalized layout header durable together with the already-fsync'd data + index, so a crash
     ## right after prune() can't leave a stale header pointing past the truncated EOF.
     os.fsync(file.fileno())
@@ -2327,6 +3506,111 @@ def prune_file_fixed(file, n_buckets, n_bytes_file, n_bytes_key, value_len, writ
     return n_keys, removed_count, new_index_offset
 
 
+def get_value_dense(file, record_pos, value_len):
+    """
+    Read the value of the record at record_pos. Returns False if the record is
+    absent (never written, deleted, or beyond EOF).
+    """
+    file.seek(record_pos)
+    record = file.read(1 + value_len)
+    if len(record) == 1 + value_len and record[0]:
+        return record[1:]
+    else:
+        return False
+
+
+def mmap_get_value_dense(mm, record_pos, value_len):
+    """
+    mmap version of get_value_dense. Returns None if the record lies past the
+    end of the map.
+    """
+    if record_pos + 1 + value_len > len(mm):
+        return None
+    record = mm[record_pos:record_pos + 1 + value_len]
+    if len(record) == 1 + value_len and record[0]:
+        return record[1:]
+    else:
+        return False
+
+
+def write_value_dense(file, record_pos, value):
+    """
+    Write a record in place (writing past EOF leaves a sparse hole of absent
+    records). Returns 1 if the key was not present before, else 0.
+    """
+    file.seek(record_pos)
+    present = file.read(1)
+    file.seek(record_pos)
+    file.write(b'\x01' + value)
+
+    if present == b'\x01':
+        return 0
+    else:
+        return 1
+
+
+def delete_value_dense(file, record_pos):
+    """
+    Clear the presence byte of a record. Returns True if it was present.
+    """
+    file.seek(record_pos)
+    if file.read(1) == b'\x01':
+        file.seek(record_pos)
+        file.write(b'\x00')
+        return True
+    else:
+        return False
+
+
+def iter_keys_values_dense(file, value_len, include_key, include_value, write_buffer_size):
+    """
+    Iterate over the present records in key order, reading write_buffer_size
+    chunks. Keys are yielded as ints. The cursor is kept locally and re-seeked
+    every chunk (same contract as _iter_keys_values_fixed_region).
+    """
+    record_len = 1 + value_len
+    chunk_len = max(write_buffer_size // record_len, 1) * record_len
+
+    key = 0
+    while True:
+        file.seek(sub_index_init_pos + key * record_len)
+        chunk = file.read(chunk_len)
+        n = len(chunk) // record_len
+        if n == 0:
+            return
+
+        for i, present in enumerate(chunk[:n * record_len:record_len]):
+            if present:
+                if include_key and include_value:
+                    start = i * record_len + 1
+                    yield key + i, chunk[start:start + value_len]
+                elif include_key:
+                    yield key + i
+                else:
+                    start = i * record_len + 1
+                    yield chunk[start:start + value_len]
+
+        key += n
+
+
+def mmap_iter_keys_values_dense(mm, value_len, include_key, include_value):
+    """
+    mmap version of iter_keys_values_dense.
+    """
+    record_len = 1 + value_len
+    n = (len(mm) - sub_index_init_pos) // record_len
+
+    for key in range(n):
+        pos = sub_index_init_pos + key * record_len
+        if mm[pos]:
+            if include_key and include_value:
+                yield key, mm[pos + 1:pos + record_len]
+            elif include_key:
+                yield key
+            else:
+                yield mm[pos + 1:pos + record_len]
+
+
 
 
 